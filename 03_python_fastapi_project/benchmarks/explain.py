@@ -0,0 +1,114 @@
+"""
+Check that the common product listing filters are answered through an index, not a full table scan.
+
+Runs `EXPLAIN QUERY PLAN` on the statements the repository builds for every case below, against a seeded
+SQLite database, prints the plans and exits with code 1 if a filtered or later page scans `products` (even
+through an index) instead of seeking, or an unfiltered first page scans the whole table. `tests/test_query_plans.py`
+runs the same check:
+```bash
+    python -m benchmarks.explain --size 100k
+```
+"""
+from decimal import Decimal
+from pathlib import Path
+from typing import List, Optional, Tuple
+import argparse
+import asyncio
+import re
+import sys
+import tempfile
+
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.python_fastapi_project.domain.pagination import Cursor
+from src.python_fastapi_project.domain.product_query import ProductQuery
+from src.python_fastapi_project.repository.product.product_repository_impl import build_product_queries
+from src.python_fastapi_project.service.product_service import DEFAULT_PAGE_SIZE
+
+from .run import parse_size
+from .seed import prepare_database
+
+# (name, criteria, cursor of a later page or None)
+CASES: List[Tuple[str, ProductQuery, Optional[Cursor]]] = [
+    ("price range by price", ProductQuery(min_price=Decimal("10"), max_price=Decimal("20"), sort="price"), None),
+    ("price range by price, next page", ProductQuery(min_price=Decimal("10"), max_price=Decimal("20"), sort="price"),
+     Cursor("price", "15.00", 500)),
+    ("price range by id", ProductQuery(min_price=Decimal("10"), max_price=Decimal("20")), None),
+    ("min price by price desc", ProductQuery(min_price=Decimal("900"), sort="price", descending=True), None),
+    ("low stock", ProductQuery(stock_below=5), None),
+    ("low stock, next page", ProductQuery(stock_below=5), Cursor("id", 500, 500)),
+    ("low stock by price", ProductQuery(stock_below=5, sort="price"), None),
+    ("low stock by price, next page", ProductQuery(stock_below=5, sort="price"), Cursor("price", "500.00", 500)),
+    ("by name", ProductQuery(sort="name"), None),
+    ("by name, next page", ProductQuery(sort="name"), Cursor("name", "Eco lamp 500", 500)),
+    ("recently updated", ProductQuery(sort="updated_at", descending=True), None),
+    ("recently updated, next page", ProductQuery(sort="updated_at", descending=True),
+     Cursor("-updated_at", "2024-01-01T12:00:00", 43200)),
+    ("recently updated, after a NULL", ProductQuery(sort="updated_at", descending=True),
+     Cursor("-updated_at", None, 500)),
+    ("least recently updated, after a NULL", ProductQuery(sort="updated_at"), Cursor("updated_at", None, 500)),
+]
+
+# SCAN walks the whole table, or a whole index with USING (COVERING) INDEX; SEARCH seeks a range of an index
+_SCAN = re.compile(r"\bSCAN products\b")
+_FULL_SCAN = re.compile(r"\bSCAN products\b(?! USING)")
+_SEARCH = re.compile(r"\bSEARCH products\b")
+
+
+def plan_problems(criteria: ProductQuery, cursor: Optional[Cursor], plans: List[List[str]]) -> List[str]:
+    """What is wrong with the plans of the statements of a case; an unfiltered first page may walk an index in order"""
+    filtered = any(value is not None for value in (criteria.min_price, criteria.max_price, criteria.stock_below))
+    pattern = _SCAN if filtered or cursor is not None else _FULL_SCAN
+    problems = [f"scans: {step}" for plan in plans for step in plan if pattern.search(step)]
+    if cursor is not None:
+        problems.extend(
+            f"no index seek: {' / '.join(plan)}" for plan in plans if not any(_SEARCH.search(step) for step in plan)
+        )
+    return problems
+
+
+async def query_plans(database_path: Path, criteria: ProductQuery, cursor: Optional[Cursor]) -> List[List[str]]:
+    """The plan of every statement the repository runs for a listing page"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{database_path}")
+    plans = []
+    try:
+        async with engine.connect() as conn:
+            for statement in build_product_queries(criteria, cursor):
+                # Literal values: the typed bind processing (Decimal, datetime) is skipped by a raw statement
+                sql = statement.limit(DEFAULT_PAGE_SIZE + 1).compile(
+                    engine.sync_engine, compile_kwargs={"literal_binds": True}
+                )
+                result = await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")
+                plans.append([row[-1] for row in result])
+    finally:
+        await engine.dispose()
+    return plans
+
+
+async def explain(database_path: Path) -> List[str]:
+    """Print the plan of every case and return its problems, prefixed with the case name"""
+    problems = []
+    for name, criteria, cursor in CASES:
+        plans = await query_plans(database_path, criteria, cursor)
+        print(f"{name}:")
+        for step in (step for plan in plans for step in plan):
+            print(f"    {step}")
+        problems.extend(f"{name}: {problem}" for problem in plan_problems(criteria, cursor, plans))
+    return problems
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=parse_size, default=100_000, help="catalog size, e.g. 100k")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="explain-") as workdir:
+        database_path = asyncio.run(prepare_database(args.size, Path(workdir)))
+        problems = asyncio.run(explain(database_path))
+    for problem in problems:
+        print(f"FAILED {problem}", file=sys.stderr)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,266 @@
+"""
+Load/latency benchmarks for the product API.
+
+Seeds a SQLite database per catalog size, drives the app in-process through an ASGI client (`asgi`)
+and/or through a real uvicorn worker over TCP (`uvicorn`), and reports throughput and p50/p95/p99
+latency per endpoint scenario. Results are written as JSON; with `--baseline` the run fails
+(exit code 1) when a scenario regresses by more than `--max-regression`.
+
+Run from the project root:
+
+    python -m benchmarks.run --sizes 1k 100k --modes asgi uvicorn --output benchmarks/results/latest.json
+"""
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from .scenarios import SCENARIOS, Scenario
+from .seed import prepare_database
+
+DEFAULT_SCENARIOS = ["list", "list_overview", "get", "batch_get", "search", "create", "bulk_create", "update", "reserve", "stock_adjust", "mixed", "delete"]
+SIZE_SUFFIXES = {"k": 1_000, "m": 1_000_000}
+# Database profiles to compare: environment each one runs with
+PROFILES = {
+    "default": {"DATABASE_SQLITE_PRODUCTION": "false", "STOCK_WRITE_BEHIND_ENABLED": "false"},
+    "sqlite-production": {"DATABASE_SQLITE_PRODUCTION": "true", "STOCK_WRITE_BEHIND_ENABLED": "false"},
+    "stock-write-behind": {"DATABASE_SQLITE_PRODUCTION": "false", "STOCK_WRITE_BEHIND_ENABLED": "true"},
+}
+SERVER_START_TIMEOUT = 30.0
+
+
+def parse_size(value: str) -> int:
+    value = value.strip().lower()
+    if value and value[-1] in SIZE_SUFFIXES:
+        return int(float(value[:-1]) * SIZE_SUFFIXES[value[-1]])
+    return int(value)
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+@asynccontextmanager
+async def asgi_client(database_path: Path) -> AsyncIterator[httpx.AsyncClient]:
+    """Run the app in this process, including its lifespan, against the given database"""
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{database_path}"
+    from src.python_fastapi_project.main import app
+
+    # Shutting the lifespan down drops the engines, so the next size gets engines for its own database
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            yield client
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@asynccontextmanager
+async def uvicorn_client(database_path: Path) -> AsyncIterator[httpx.AsyncClient]:
+    """Start one uvicorn worker serving the app and talk to it over TCP"""
+    port = _free_port()
+    env = {**os.environ, "DATABASE_URL": f"sqlite+aiosqlite:///{database_path}"}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.python_fastapi_project.main:app",
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning", "--no-access-log"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=30.0) as client:
+            deadline = time.monotonic() + SERVER_START_TIMEOUT
+            while True:
+                try:
+                    if (await client.get("/health")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if server.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError("uvicorn worker did not become healthy")
+                await asyncio.sleep(0.1)
+            yield client
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+CLIENTS = {"asgi": asgi_client, "uvicorn": uvicorn_client}
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    scenario: Scenario,
+    size: int,
+    requests: int,
+    concurrency: int,
+    warmup: int,
+    seed: int,
+) -> dict:
+    rng = random.Random(seed)
+    for i in range(warmup):
+        if scenario.name != "delete":
+            await scenario.request(client, rng, i, size)
+
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            started = time.perf_counter()
+            try:
+                response = await scenario.request(client, rng, i, size)
+                ok = response.status_code in scenario.expected_status
+            except httpx.HTTPError:
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            if not ok:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "scenario": scenario.name,
+        "requests": requests,
+        "errors": errors,
+        "throughput_rps": round(requests / elapsed, 2),
+        "rows_per_sec": round(requests * scenario.rows / elapsed, 2),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+async def run_benchmarks(args: argparse.Namespace) -> List[dict]:
+    results = []
+    with tempfile.TemporaryDirectory(prefix="product-bench-") as workdir:
+        for size, mode, profile in itertools.product(args.sizes, args.modes, args.profiles):
+            os.environ.update(PROFILES[profile])
+            database_path = await prepare_database(size, Path(workdir) / mode / profile)
+            if args.read_replica:
+                # A point-in-time copy stands in for a replica: reads hit it, writes only the primary
+                replica_path = database_path.with_name(f"{database_path.stem}-replica{database_path.suffix}")
+                shutil.copyfile(database_path, replica_path)
+                os.environ["DATABASE_READ_URL"] = f"sqlite+aiosqlite:///{replica_path}"
+            async with CLIENTS[mode](database_path) as client:
+                for name in args.scenarios:
+                    result = await run_scenario(
+                        client, SCENARIOS[name], size, args.requests, args.concurrency, args.warmup, args.seed
+                    )
+                    result = {"mode": mode, "profile": profile, "size": size, **result}
+                    results.append(result)
+                    print(
+                        f"{mode:8} {profile:17} {size:>9} {name:14} {result['throughput_rps']:>10.1f} req/s  "
+                        f"p50 {result['p50_ms']:>8.2f} ms  p95 {result['p95_ms']:>8.2f} ms  "
+                        f"p99 {result['p99_ms']:>8.2f} ms  errors {result['errors']}",
+                        flush=True,
+                    )
+    return results
+
+
+def find_regressions(results: List[dict], baseline: List[dict], max_regression: float) -> List[str]:
+    """Compare p95 latency and throughput of every scenario also present in the baseline"""
+    def key(r: dict) -> tuple:
+        # Results written before profiles existed ran with the default profile
+        return r["mode"], r.get("profile", "default"), r["size"], r["scenario"]
+
+    previous: Dict[tuple, dict] = {key(r): r for r in baseline}
+    regressions = []
+    for result in results:
+        before = previous.get(key(result))
+        if before is None:
+            continue
+        label = "/".join(str(part) for part in key(result))
+        if before["p95_ms"] and result["p95_ms"] > before["p95_ms"] * (1 + max_regression):
+            regressions.append(f"{label}: p95 {before['p95_ms']} ms -> {result['p95_ms']} ms")
+        if result["throughput_rps"] < before["throughput_rps"] * (1 - max_regression):
+            regressions.append(f"{label}: throughput {before['throughput_rps']} -> {result['throughput_rps']} req/s")
+        if result["errors"] > before["errors"]:
+            regressions.append(f"{label}: errors {before['errors']} -> {result['errors']}")
+    return regressions
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", type=parse_size, default=[1_000], help="catalog sizes, e.g. 1k 100k 1m")
+    parser.add_argument("--modes", nargs="+", choices=sorted(CLIENTS), default=["asgi"])
+    parser.add_argument("--profiles", nargs="+", choices=list(PROFILES), default=["default"],
+                        help="database profiles to compare, e.g. default sqlite-production")
+    parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS), default=DEFAULT_SCENARIOS)
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=10, help="unmeasured requests before each scenario")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--read-replica", action="store_true", help="route reads to a copy of the seeded database")
+    parser.add_argument("--output", type=Path, help="write results as JSON to this file")
+    parser.add_argument("--baseline", type=Path, help="JSON results of a previous run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="allowed relative slowdown (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+    if "delete" in args.scenarios and args.requests >= min(args.sizes):
+        parser.error("--requests must be smaller than every size when running the delete scenario")
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    results = asyncio.run(run_benchmarks(args))
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "read_replica": args.read_replica,
+        },
+        "results": results,
+    }
+
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(report, indent=2))
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())["results"]
+        regressions = find_regressions(results, baseline, args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
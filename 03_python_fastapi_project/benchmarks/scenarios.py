@@ -0,0 +1,114 @@
+"""
+One request factory per endpoint scenario.
+
+Each scenario receives the HTTP client, the request number and the seeded catalog size,
+and returns the response; `rows` is how many products one request moves (for rows/sec).
+"""
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Tuple
+import random
+
+import httpx
+
+from .seed import SEARCH_TERMS
+
+BULK_BATCH_SIZE = 100
+BATCH_GET_SIZE = 50
+MIXED_WRITE_RATIO = 0.2
+HOT_PRODUCTS = 20
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    request: Callable[[httpx.AsyncClient, random.Random, int, int], Awaitable[httpx.Response]]
+    expected_status: Tuple[int, ...] = (200,)
+    rows: int = 1
+
+
+def _new_product(rng: random.Random, i: int) -> dict:
+    return {"name": f"Bench product {i}", "description": "benchmark", "stock": rng.randint(0, 100), "price": 9.99}
+
+
+async def _list(client, rng, i, size):
+    return await client.get("/api/products/", params={"limit": 100})
+
+
+async def _list_overview(client, rng, i, size):
+    return await client.get("/api/products/", params={"limit": 1000, "view": "overview"})
+
+
+async def _get(client, rng, i, size):
+    return await client.get(f"/api/products/{rng.randint(1, size)}")
+
+
+async def _batch_get(client, rng, i, size):
+    return await client.post("/api/products/batch-get", json=[rng.randint(1, size) for _ in range(BATCH_GET_SIZE)])
+
+
+async def _changes(client, rng, i, size):
+    return await client.get("/api/products/changes", params={"limit": 100})
+
+
+async def _stats(client, rng, i, size):
+    return await client.get("/api/products/stats")
+
+
+async def _search(client, rng, i, size):
+    return await client.get(f"/api/products/search/{rng.choice(SEARCH_TERMS)}")
+
+
+async def _create(client, rng, i, size):
+    return await client.post("/api/products/", json=_new_product(rng, i))
+
+
+async def _bulk_create(client, rng, i, size):
+    return await client.post("/api/products/bulk", json=[_new_product(rng, i) for _ in range(BULK_BATCH_SIZE)])
+
+
+async def _update(client, rng, i, size):
+    return await client.put(f"/api/products/{rng.randint(1, size)}", json={"price": round(rng.uniform(1, 999), 2)})
+
+
+async def _reserve(client, rng, i, size):
+    return await client.post(f"/api/products/{rng.randint(1, size)}/stock/reserve", json={"quantity": 1})
+
+
+async def _stock_adjust(client, rng, i, size):
+    # Scanner traffic: small adjustments concentrated on a few hot products
+    product_id = rng.randint(1, min(size, HOT_PRODUCTS))
+    return await client.post(f"/api/products/{product_id}/stock/adjust", json={"delta": rng.choice((-1, 1, 2))})
+
+
+async def _mixed(client, rng, i, size):
+    # Read-mostly traffic with concurrent writers, where SQLite's single-writer lock shows up
+    if rng.random() < MIXED_WRITE_RATIO:
+        return await _update(client, rng, i, size)
+    return await _get(client, rng, i, size)
+
+
+async def _delete(client, rng, i, size):
+    # Ids are deleted from the top of the range down so every request removes an existing product
+    return await client.delete(f"/api/products/{size - i}")
+
+
+SCENARIOS = {
+    scenario.name: scenario
+    for scenario in [
+        Scenario("list", _list, rows=100),
+        Scenario("list_overview", _list_overview, rows=1000),
+        Scenario("get", _get),
+        Scenario("batch_get", _batch_get, rows=BATCH_GET_SIZE),
+        Scenario("search", _search),
+        Scenario("changes", _changes, rows=100),
+        Scenario("stats", _stats),
+        Scenario("create", _create, expected_status=(201,)),
+        Scenario("bulk_create", _bulk_create, expected_status=(201,), rows=BULK_BATCH_SIZE),
+        Scenario("update", _update),
+        # Running out of stock is a valid outcome of a reservation, not a failed request
+        Scenario("reserve", _reserve, expected_status=(200, 409)),
+        Scenario("stock_adjust", _stock_adjust, expected_status=(200, 409)),
+        Scenario("mixed", _mixed),
+        Scenario("delete", _delete, expected_status=(204,)),
+    ]
+}
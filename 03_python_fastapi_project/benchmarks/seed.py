@@ -0,0 +1,84 @@
+"""
+Seed SQLite databases with synthetic products for the benchmarks.
+
+Seeded files are cached in `benchmarks/.data/` by size and schema, and every benchmark run works on a fresh copy,
+so write scenarios never leak into the next run.
+"""
+from datetime import datetime, timedelta
+from pathlib import Path
+import random
+import shutil
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.python_fastapi_project.domain.models import Product
+from src.python_fastapi_project.repository.product.product_search import setup_search_index
+from src.python_fastapi_project.repository.schema import ensure_schema, schema_fingerprint
+
+DATA_DIR = Path(__file__).parent / ".data"
+SEED_CHUNK_SIZE = 5000
+
+ADJECTIVES = ["red", "blue", "green", "black", "white", "large", "small", "organic", "classic", "premium",
+              "wireless", "vintage", "compact", "heavy", "light", "smart", "eco", "deluxe", "basic", "pro"]
+NOUNS = ["shirt", "chair", "lamp", "kettle", "phone", "table", "mug", "backpack", "speaker", "notebook",
+         "jacket", "bottle", "monitor", "keyboard", "blanket", "charger", "camera", "guitar", "bicycle", "watch"]
+
+# Search terms that hit the generated names in different proportions (word, prefix, rare, miss)
+SEARCH_TERMS = ["shirt", "chair", "wireless lamp", "prem", "eco kettle", "watch 77", "nothing-matches"]
+
+
+def product_name(rng: random.Random, index: int) -> str:
+    return f"{rng.choice(ADJECTIVES).title()} {rng.choice(NOUNS)} {index}"
+
+
+def product_rows(size: int, seed: int = 42):
+    """Yield chunks of column/value mappings for `size` products, deterministic for a given seed"""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    chunk = []
+    for index in range(1, size + 1):
+        timestamp = start + timedelta(seconds=index)
+        chunk.append({
+            "name": product_name(rng, index),
+            "description": " ".join(rng.choices(ADJECTIVES + NOUNS, k=rng.randint(10, 60)))[:500],
+            "stock": rng.randint(0, 500),
+            "price": round(rng.uniform(1, 999), 2),
+            "created_by": "seed",
+            "created_at": timestamp,
+            "updated_by": "seed",
+            "updated_at": timestamp,
+        })
+        if len(chunk) == SEED_CHUNK_SIZE:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+async def seed_database(path: Path, size: int) -> None:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    try:
+        await ensure_schema(engine)
+        await setup_search_index(engine)
+        async with engine.begin() as conn:
+            for chunk in product_rows(size):
+                await conn.execute(insert(Product), chunk)
+    finally:
+        await engine.dispose()
+
+
+async def prepare_database(size: int, workdir: Path) -> Path:
+    """Return the path of a fresh copy of a database seeded with `size` products"""
+    DATA_DIR.mkdir(exist_ok=True)
+    seeded = DATA_DIR / f"products_{size}_{schema_fingerprint()}.db"
+    if not seeded.exists():
+        partial = seeded.with_suffix(".partial")
+        partial.unlink(missing_ok=True)
+        await seed_database(partial, size)
+        partial.rename(seeded)
+
+    workdir.mkdir(parents=True, exist_ok=True)
+    copy = workdir / f"products_{size}.db"
+    shutil.copyfile(seeded, copy)
+    return copy
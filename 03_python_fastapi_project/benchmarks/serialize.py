@@ -0,0 +1,89 @@
+"""
+Serialization cost of a product list response, before and after building the DTOs without validation.
+
+`validated` is the previous path: a DTO validated per row by the assembler, validated again against the
+route's `response_model`, converted to JSON-compatible values and dumped with `json.dumps`, as FastAPI's
+`JSONResponse` does. `constructed` is the current one: `ProductAssembler` builds the DTOs with `model_construct`
+and the route dumps them with a module-level `TypeAdapter`. Both must produce the same JSON, including NULL audit
+columns. Prints the best rows/sec of `--repeat` runs for each:
+
+    python -m benchmarks.serialize --rows 1000 10000
+"""
+from typing import List, Optional
+import argparse
+import json
+import sys
+import time
+
+from pydantic import TypeAdapter
+
+from src.python_fastapi_project.domain.assembler.product_assembler import ProductAssembler
+from src.python_fastapi_project.domain.dtos import ProductDetailDTO
+from src.python_fastapi_project.domain.models import Product
+
+from .seed import product_rows
+
+_response_adapter = TypeAdapter(List[ProductDetailDTO])
+
+
+def products(count: int) -> List[Product]:
+    """Transient products like the rows of a page; every tenth one has NULL audit columns"""
+    rows = [row for chunk in product_rows(count) for row in chunk]
+    built = [Product(id=index, **row) for index, row in enumerate(rows, start=1)]
+    for product in built[::10]:
+        product.created_by = product.updated_by = product.updated_at = None
+    return built
+
+
+def validated(page: List[Product]) -> bytes:
+    dtos = [
+        ProductDetailDTO(
+            id=product.id,
+            created_by=product.created_by,
+            created_at=product.created_at,
+            updated_by=product.updated_by,
+            updated_at=product.updated_at,
+            name=product.name,
+            description=product.description,
+            stock=product.stock,
+            price=float(product.price),
+        )
+        for product in page
+    ]
+    content = _response_adapter.dump_python(_response_adapter.validate_python(dtos, from_attributes=True), mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+
+def constructed(page: List[Product]) -> bytes:
+    return _response_adapter.dump_json(ProductAssembler.to_detail_dtos(page))
+
+
+def rows_per_second(serialize, page: List[Product], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        serialize(page)
+        best = min(best, time.perf_counter() - started)
+    return len(page) / best
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 1000, 10000], help="products per response")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per path; the best one counts")
+    args = parser.parse_args(argv)
+
+    print(f"{'rows':>7}  {'validated rows/s':>16}  {'constructed rows/s':>18}  {'speedup':>7}", flush=True)
+    for count in args.rows:
+        page = products(count)
+        if json.loads(validated(page)) != json.loads(constructed(page)):
+            print(f"The two paths serialize {count} products differently", file=sys.stderr)
+            return 1
+        before = rows_per_second(validated, page, args.repeat)
+        after = rows_per_second(constructed, page, args.repeat)
+        print(f"{count:>7}  {before:>16.0f}  {after:>18.0f}  {after / before:>6.1f}x", flush=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+"""
+Time until the production entrypoint serves its first page, on a seeded and an empty SQLite database, and how
+long its graceful shutdown takes while an export is streaming (exits with code 1 if the export is cut off):
+
+    python -m benchmarks.startup --size 100k --workers 1 2 4 --runs 5
+"""
+from pathlib import Path
+from typing import List, Optional
+import argparse
+import asyncio
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from .run import SERVER_START_TIMEOUT, _free_port, parse_size
+from .seed import prepare_database
+
+SHUTDOWN_TIMEOUT = 60.0
+
+
+async def measure_once(database_path: Path, workers: int) -> dict:
+    port = _free_port()
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite+aiosqlite:///{database_path}",
+        "SERVER_WORKERS": str(workers),
+        "SERVER_HOST": "127.0.0.1",
+        "SERVER_PORT": str(port),
+    }
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "src.python_fastapi_project.server"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=30.0) as client:
+            while True:
+                try:
+                    if (await client.get("/api/products/", params={"limit": 1})).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if server.poll() is not None or time.perf_counter() - started > SERVER_START_TIMEOUT:
+                    raise RuntimeError("server did not start")
+                await asyncio.sleep(0.01)
+            ready = time.perf_counter() - started
+
+            export = asyncio.create_task(client.get("/api/products/export"))
+            await asyncio.sleep(0.05)
+            stopping = time.perf_counter()
+            server.send_signal(signal.SIGTERM)
+            try:
+                drained = (await export).status_code == 200
+            except httpx.HTTPError:
+                drained = False
+            await asyncio.to_thread(server.wait, SHUTDOWN_TIMEOUT)
+            shutdown = time.perf_counter() - stopping
+    finally:
+        if server.poll() is None:
+            server.kill()
+            server.wait()
+    return {"ready_s": ready, "shutdown_s": shutdown, "drained": drained}
+
+
+async def run_startup_benchmarks(args: argparse.Namespace) -> List[dict]:
+    results = []
+    with tempfile.TemporaryDirectory(prefix="startup-bench-") as workdir:
+        for workers in args.workers:
+            for database in ("seeded", "empty"):
+                runs = []
+                for run in range(args.runs):
+                    if database == "seeded":
+                        database_path = await prepare_database(args.size, Path(workdir) / str(run))
+                    else:
+                        database_path = Path(workdir) / f"empty-{workers}-{run}.db"
+                    runs.append(await measure_once(database_path, workers))
+                result = {
+                    "workers": workers,
+                    "database": database,
+                    "size": args.size if database == "seeded" else 0,
+                    "ready_s": round(statistics.median(r["ready_s"] for r in runs), 3),
+                    "shutdown_s": round(statistics.median(r["shutdown_s"] for r in runs), 3),
+                    "drained": all(r["drained"] for r in runs),
+                }
+                results.append(result)
+                print(
+                    f"workers {workers:>2}  {database:6}  ready {result['ready_s']:>7.3f} s  "
+                    f"shutdown {result['shutdown_s']:>7.3f} s  in-flight export completed: {result['drained']}",
+                    flush=True,
+                )
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=parse_size, default=100_000, help="catalog size of the seeded database")
+    parser.add_argument("--workers", nargs="+", type=int, default=[1, os.cpu_count() or 1])
+    parser.add_argument("--runs", type=int, default=3, help="runs per case; the median is reported")
+    parser.add_argument("--output", type=Path, help="write results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(run_startup_benchmarks(args))
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps({"results": results}, indent=2))
+    return 0 if all(result["drained"] for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+"""
+Admission control for database-bound routes (opt-in with ADMISSION_CONTROL_ENABLED=true).
+
+Every route admits at most `max_concurrency` requests at a time; up to `max_queue` more wait, first come
+first served, for a free slot. A request that finds the queue full, or is still waiting when its deadline
+passes, is shed at once with 503 and Retry-After instead of piling up on the connection pool and timing out
+seconds later. Admitted requests keep their deadline: their SQL statements are bounded by the time left
+(see repository/deadline.py).
+"""
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict
+import asyncio
+import time
+
+import sqlalchemy.exc
+from fastapi import Request, status
+from fastapi.responses import JSONResponse
+
+from ..monitoring.instrumentation import route_template
+from ..monitoring.metrics import registry
+from ..repository.deadline import DeadlineExceededError, reset_deadline, set_deadline
+from ..settings import env_int
+
+admission_in_flight = registry.gauge("admission_in_flight", "Requests admitted and running", ("route",))
+admission_queue_depth = registry.gauge("admission_queue_depth", "Requests waiting for admission", ("route",))
+admission_queue_wait_seconds = registry.histogram(
+    "admission_queue_wait_seconds", "Time admitted requests waited in the queue", ("route",)
+)
+admission_shed_total = registry.counter(
+    "admission_shed_total", "Requests rejected with 503 because of overload", ("route", "reason")
+)
+
+
+class ServiceOverloadedError(Exception):
+    """A request was not admitted: the route's queue was full or its deadline passed while queued"""
+
+    def __init__(self, route: str, reason: str):
+        self.route = route
+        self.reason = reason
+        super().__init__(f"Too many concurrent requests on {route} ({reason})")
+
+
+# Errors that mean "overloaded, retry later", never a fault of the request. Endpoints re-raise them
+# from their catch-all handlers so that `overload_exception_handler` can answer 503.
+OVERLOAD_ERRORS = (ServiceOverloadedError, DeadlineExceededError, sqlalchemy.exc.TimeoutError)
+
+
+class RouteLimiter:
+    """A FIFO semaphore with a bounded number of waiters"""
+
+    def __init__(self, route: str, max_concurrency: int, max_queue: int):
+        self.route = route
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self._active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    async def acquire(self, timeout: float) -> None:
+        if self._active < self.max_concurrency and not self._waiters:
+            self._active += 1
+            admission_in_flight.set(self._active, route=self.route)
+            return
+        if len(self._waiters) >= self.max_queue:
+            raise ServiceOverloadedError(self.route, "queue_full")
+        if timeout <= 0:
+            raise ServiceOverloadedError(self.route, "deadline")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        admission_queue_depth.set(len(self._waiters), route=self.route)
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we gave up: pass it on
+                self.release()
+            else:
+                waiter.cancel()
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+                admission_queue_depth.set(len(self._waiters), route=self.route)
+            if isinstance(e, asyncio.TimeoutError):
+                raise ServiceOverloadedError(self.route, "deadline") from None
+            raise
+        admission_queue_wait_seconds.observe(time.monotonic() - started, route=self.route)
+
+    def release(self) -> None:
+        # Hand the slot straight to the oldest waiter, so newcomers cannot overtake the queue
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            admission_queue_depth.set(len(self._waiters), route=self.route)
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._active -= 1
+        admission_in_flight.set(self._active, route=self.route)
+
+
+class AdmissionController:
+    def __init__(self, max_concurrency: int, max_queue: int, deadline: float):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.deadline = deadline
+        self._limiters: Dict[str, RouteLimiter] = {}
+
+    @asynccontextmanager
+    async def admit(self, route: str) -> AsyncIterator[None]:
+        """Hold one of the route's slots, under a deadline of `deadline` seconds from now, for the block"""
+        limiter = self._limiters.get(route)
+        if limiter is None:
+            limiter = self._limiters[route] = RouteLimiter(route, self.max_concurrency, self.max_queue)
+        deadline = time.monotonic() + self.deadline
+        try:
+            await limiter.acquire(deadline - time.monotonic())
+        except ServiceOverloadedError as e:
+            admission_shed_total.inc(route=route, reason=e.reason)
+            raise
+        token = set_deadline(deadline)
+        try:
+            yield
+        finally:
+            reset_deadline(token)
+            limiter.release()
+
+
+async def overload_exception_handler(request: Request, exc: Exception) -> JSONResponse:
+    """503 with Retry-After for every error in OVERLOAD_ERRORS"""
+    if not isinstance(exc, ServiceOverloadedError):
+        # Requests that were not admitted are counted by `admit`
+        reason = "statement_deadline" if isinstance(exc, DeadlineExceededError) else "pool_timeout"
+        admission_shed_total.inc(route=route_template(request.scope), reason=reason)
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Service overloaded, please retry later"},
+        headers={"Retry-After": str(env_int("ADMISSION_RETRY_AFTER_SECONDS", 1))},
+    )
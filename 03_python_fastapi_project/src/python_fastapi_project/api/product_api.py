@@ -1,19 +1,137 @@
-from typing import List
-from fastapi import APIRouter, HTTPException, Depends, status
+from decimal import Decimal
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from fastapi import APIRouter, HTTPException, Body, Depends, Header, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter, ValidationError
 
 from ..domain.dtos.product_dto import (
     ProductCreateDTO,
     ProductUpdateDTO,
     ProductOverviewDTO,
     ProductDetailDTO,
+    ProductSortField,
+    ProductSortOrder,
+    ProductView,
+    ProductExportFormat,
+    ProductBulkUpdateDTO,
+    ProductBulkErrorDTO,
+    ProductBulkResultDTO,
+    ProductBulkDeleteResultDTO,
+    StockQuantityDTO,
+    StockAdjustmentDTO,
+    StockSetDTO,
+    StockReservationDTO,
+    StockLevelDTO,
+    StockReservationResultDTO,
+    ProductChangesDTO,
+    ProductStatsDTO,
 )
-from ..service.product_service import ProductService
-from ..dependencies import get_product_service
+from ..domain.pagination import InvalidCursorError
+from .http_cache import make_etag, validator_headers, is_not_modified, not_modified_response
+from ..service.exceptions import InsufficientStockError, InvalidFieldSelectionError
+from ..service.product_service import (
+    ProductService,
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    DEFAULT_SEARCH_LIMIT,
+    MAX_BULK_SIZE,
+    CHANGES_POLL_INTERVAL,
+)
+from .admission import OVERLOAD_ERRORS
+from ..dependencies import admission_control, get_product_service
 
 # Create router
 router = APIRouter(prefix="/products", tags=["products"])
 
-@router.post("/", response_model=ProductDetailDTO, status_code=status.HTTP_201_CREATED)
+# Product responses are built once by the assembler and serialized straight to JSON bytes by pydantic-core.
+# Returning a Response skips FastAPI's second validation pass against `response_model`, which stays for the docs.
+_detail_adapter = TypeAdapter(ProductDetailDTO)
+_detail_list_adapter = TypeAdapter(List[ProductDetailDTO])
+_overview_list_adapter = TypeAdapter(List[ProductOverviewDTO])
+_changes_adapter = TypeAdapter(ProductChangesDTO)
+_bulk_result_adapter = TypeAdapter(ProductBulkResultDTO)
+_bulk_delete_result_adapter = TypeAdapter(ProductBulkDeleteResultDTO)
+_bulk_update_item_adapter = TypeAdapter(ProductBulkUpdateDTO)
+
+# Database-bound routes wait for a slot of their own (or are shed with 503) before touching the pool.
+# The streaming routes run for as long as the client reads, so they are not admitted.
+_ADMITTED = [Depends(admission_control)]
+
+def _json_response(
+    adapter: TypeAdapter,
+    content,
+    status_code: int = status.HTTP_200_OK,
+    headers=None,
+    include=None,
+) -> Response:
+    return Response(
+        content=adapter.dump_json(content, include=include),
+        status_code=status_code,
+        headers=headers,
+        media_type="application/json",
+    )
+
+def _list_response(items, view: ProductView, fields: Optional[List[str]], headers=None) -> Response:
+    """Serialize a product list in the requested view, keeping only `fields` if given"""
+    if fields:
+        return _json_response(_detail_list_adapter, items, headers=headers, include={"__all__": set(fields)})
+    if view == ProductView.OVERVIEW:
+        return _json_response(_overview_list_adapter, items, headers=headers)
+    return _json_response(_detail_list_adapter, items, headers=headers)
+
+async def _catalog_validators(request: Request, product_service: ProductService) -> dict:
+    """
+    Validators for a list representation: the catalog version (the change feed sequence, which every write moves)
+    plus the query that shaped the list. No Last-Modified: finding the latest write time would scan an index.
+    """
+    version = await product_service.get_catalog_version()
+    etag = make_etag("products", request.url.path, request.url.query, version.change_seq)
+    return validator_headers(etag)
+
+def _parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    if not fields:
+        return None
+    return [field.strip() for field in fields.split(",") if field.strip()] or None
+
+def _parse_ids(ids: Optional[str]) -> Optional[List[int]]:
+    if ids is None:
+        return None
+    try:
+        product_ids = [int(product_id) for product_id in ids.split(",") if product_id.strip()]
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="ids must be a comma-separated list of integers"
+        )
+    if not product_ids or len(product_ids) > MAX_BULK_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"ids must contain between 1 and {MAX_BULK_SIZE} product IDs"
+        )
+    return product_ids
+
+def _validate_bulk_items(
+    adapter: TypeAdapter, items: List[Dict[str, Any]]
+) -> Tuple[List[Tuple[int, Any]], List[ProductBulkErrorDTO]]:
+    """Validate every item on its own: the valid ones with their index in the request, and an error per invalid one"""
+    valid, errors = [], []
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, adapter.validate_python(item)))
+        except ValidationError as e:
+            item_id = item.get("id")
+            detail = "; ".join(f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in e.errors())
+            errors.append(ProductBulkErrorDTO(
+                index=index, id=item_id if isinstance(item_id, int) else None, detail=detail
+            ))
+    return valid, errors
+
+_EXPORT_MEDIA_TYPES = {
+    ProductExportFormat.NDJSON: "application/x-ndjson",
+    ProductExportFormat.CSV: "text/csv",
+}
+
+@router.post("/", response_model=ProductDetailDTO, status_code=status.HTTP_201_CREATED, dependencies=_ADMITTED)
 async def create_product(
     product_data: ProductCreateDTO,
     product_service: ProductService = Depends(get_product_service)
@@ -28,56 +146,356 @@ async def create_product(
     """
     try:
         created_product = await product_service.create_product(product_data)
-        return created_product
+        return _json_response(_detail_adapter, created_product, status_code=status.HTTP_201_CREATED)
+    except OVERLOAD_ERRORS:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Failed to create product: {str(e)}"
         )
 
-@router.get("/", response_model=List[ProductDetailDTO])
+@router.post("/bulk", response_model=ProductBulkResultDTO, status_code=status.HTTP_201_CREATED, dependencies=_ADMITTED)
+async def create_products(
+    products_data: List[ProductCreateDTO] = Body(..., min_length=1, max_length=MAX_BULK_SIZE),
+    product_service: ProductService = Depends(get_product_service)
+) -> ProductBulkResultDTO:
+    """
+    Create many products in one transaction (all or nothing).
+
+    - **body**: Array of products, same fields as for a single create
+    """
+    try:
+        result = await product_service.create_products(products_data)
+        return _json_response(_bulk_result_adapter, result, status_code=status.HTTP_201_CREATED)
+    except OVERLOAD_ERRORS:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Failed to create products: {str(e)}"
+        )
+
+@router.put("/bulk", response_model=ProductBulkResultDTO, dependencies=_ADMITTED)
+async def update_products(
+    products_data: List[Dict[str, Any]] = Body(..., min_length=1, max_length=MAX_BULK_SIZE),
+    product_service: ProductService = Depends(get_product_service)
+) -> ProductBulkResultDTO:
+    """
+    Update many products in one transaction.
+
+    - **body**: Array of updates, each with the product **id** and the fields to change (as for a single update)
+    - Updates that fail validation and ids that do not exist are reported in **errors** by their index in the
+      request; the other updates are applied
+    """
+    try:
+        valid, errors = _validate_bulk_items(_bulk_update_item_adapter, products_data)
+        result = ProductBulkResultDTO()
+        if valid:
+            result = await product_service.update_products([update for _, update in valid])
+        # The service numbers its errors among the valid updates only
+        errors.extend(error.model_copy(update={"index": valid[error.index][0]}) for error in result.errors)
+        result.errors = sorted(errors, key=lambda error: error.index)
+        return _json_response(_bulk_result_adapter, result)
+    except OVERLOAD_ERRORS:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Failed to update products: {str(e)}"
+        )
+
+@router.delete("/bulk", response_model=ProductBulkDeleteResultDTO, dependencies=_ADMITTED)
+async def delete_products(
+    product_ids: List[int] = Body(..., min_length=1, max_length=MAX_BULK_SIZE),
+    product_service: ProductService = Depends(get_product_service)
+) -> ProductBulkDeleteResultDTO:
+    """
+    Delete many products in one transaction.
+
+    - **body**: Array of product IDs
+    - Ids that do not exist are reported in **errors** by their index in the request
+    """
+    try:
+        return _json_response(_bulk_delete_result_adapter, await product_service.delete_products(product_ids))
+    except OVERLOAD_ERRORS:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to delete products: {str(e)}"
+        )
+
+@router.post("/stock/reserve", response_model=StockReservationResultDTO, dependencies=_ADMITTED)
+async def reserve_order_stock(
+    reservation: StockReservationDTO,
+    response: Response,
+    product_service: ProductService = Depends(get_product_service)
+) -> StockReservationResultDTO:
+    """
+    Reserve stock for every line of an order, all or nothing.
+
+    - **items**: Order lines with **product_id** and **quantity**
+    - Responds with 409 and per-line **errors** if any product is missing or short
+    """
+    try:
+        result = await product_service.reserve_order(reservation.items)
+        if not result.reserved:
+            response.status_code = status.HTTP_409_CONFLICT
+        return result
+    except OVERLOAD_ERRORS:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to reserve stock: {str(e)}"
+        )
+
+@router.post("/batch-get", response_model=ProductBulkResultDTO, dependencies=_ADMITTED)
+async def get_products_by_ids(
+    product_ids: List[int] = Body(..., min_length=1, max_length=MAX_BULK_SIZE),
+    product_service: ProductService = Depends(get_product_service)
+) -> ProductBulkResultDTO:
+    """
+    Retrieve many products by ID with one query per chunk of ids.
+
+    - **body**: Array of product IDs; **items** come back in the same order
+    - Ids that do not exist are reported in **errors** by their index in the request
+    """
+    try:
+        items, errors = await product_service.get_products_by_ids(product_ids)
+        return _json_response(_bulk_result_adapter, ProductBulkResultDTO(items=items, errors=errors))
+    except OVERLOAD_ERRORS:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to retrieve products: {str(e)}"
+        )
+
+@router.get("/", response_model=List[ProductDetailDTO], dependencies=_ADMITTED)
 async def get_all_products(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = Query(None),
+    sort: ProductSortField = Query(ProductSortField.ID),
+    order: ProductSortOrder = Query(ProductSortOrder.ASC),
+    min_price: Optional[Decimal] = Query(None, ge=0),
+    max_price: Optional[Decimal] = Query(None, ge=0),
+    stock_below: Optional[int] = Query(None, ge=0),
+    view: ProductView = Query(ProductView.DETAIL),
+    fields: Optional[str] = Query(None),
+    ids: Optional[str] = Query(None),
     product_service: ProductService = Depends(get_product_service)
-) -> List[ProductOverviewDTO]:
+) -> List[ProductDetailDTO]:
     """
-    Retrieve all products as overview (basic information).
+    Retrieve one page of products, optionally filtered.
+
+    - **limit**: Maximum number of products to return
+    - **after**: Cursor returned in the `X-Next-Cursor` header of the previous page
+    - **sort**: Column to order by (ties are broken by id)
+    - **order**: `asc` or `desc`
+    - **min_price** / **max_price**: Only products in this price range (inclusive)
+    - **stock_below**: Only products with less stock than this, e.g. for low-stock reports
+    - **view**: `detail` (all fields) or `overview` (without description)
+    - **fields**: Comma-separated list of fields to return, overrides **view**
+    - **ids**: Comma-separated product IDs to fetch instead of a page, returned in that order;
+      ids that do not exist are listed in the `X-Missing-Ids` header
     """
+    product_ids = _parse_ids(ids)
     try:
-        products = await product_service.get_all_products()
-        return products
+        headers = await _catalog_validators(request, product_service)
+        if is_not_modified(request, headers["ETag"]):
+            return not_modified_response(headers)
+
+        selected_fields = _parse_fields(fields)
+        if product_ids is not None:
+            items, errors = await product_service.get_products_by_ids(
+                product_ids, view=view, fields=selected_fields
+            )
+            if errors:
+                headers["X-Missing-Ids"] = ",".join(str(error.id) for error in errors)
+            return _list_response(items, view, selected_fields, headers=headers)
+
+        page = await product_service.get_all_products(
+            limit=limit,
+            after=after,
+            sort=sort,
+            view=view,
+            fields=selected_fields,
+            order=order,
+            min_price=min_price,
+            max_price=max_price,
+            stock_below=stock_below,
+        )
+        if page.next_cursor is not None:
+            headers["X-Next-Cursor"] = page.next_cursor
+        return _list_response(page.items, view, selected_fields, headers=headers)
+    except (InvalidCursorError, InvalidFieldSelectionError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except OVERLOAD_ERRORS:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to retrieve products: {str(e)}"
         )
 
-@router.get("/{product_id}", response_model=ProductDetailDTO)
+@router.get("/export", response_class=StreamingResponse)
+async def export_products(
+    export_format: ProductExportFormat = Query(ProductExportFormat.NDJSON, alias="format"),
+    product_service: ProductService = Depends(get_product_service)
+) -> StreamingResponse:
+    """
+    Stream the whole catalog, reading and serializing it in batches.
+
+    - **format**: `ndjson` (one product per line) or `csv`
+    """
+    return StreamingResponse(
+        product_service.export_products(export_format),
+        media_type=_EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="products.{export_format.value}"'},
+    )
+
+@router.get("/stats", response_model=ProductStatsDTO, dependencies=_ADMITTED)
+async def get_product_stats(
+    product_service: ProductService = Depends(get_product_service)
+) -> ProductStatsDTO:
+    """
+    Retrieve inventory aggregates of the whole catalog: product count, total stock, inventory value
+    (sum of price * stock) and the number of products low on / out of stock.
+    """
+    try:
+        return await product_service.get_stats()
+    except OVERLOAD_ERRORS:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to retrieve product stats: {str(e)}"
+        )
+
+@router.get("/changes", response_model=ProductChangesDTO, dependencies=_ADMITTED)
+async def get_product_changes(
+    since: Optional[str] = Query(None),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    product_service: ProductService = Depends(get_product_service)
+) -> ProductChangesDTO:
+    """
+    Retrieve the products created, updated or deleted since a cursor, oldest change first.
+
+    - **since**: `next_cursor` of the previous response; omit it for a full initial sync
+    - **limit**: Maximum number of changes to return; **has_more** tells whether to ask again right away
+    - Deleted products are reported as `delete` changes without a **product**
+    """
+    try:
+        return _json_response(_changes_adapter, await product_service.get_changes(since, limit))
+    except InvalidCursorError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except OVERLOAD_ERRORS:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to retrieve product changes: {str(e)}"
+        )
+
+@router.get("/changes/stream", response_class=StreamingResponse)
+async def stream_product_changes(
+    since: Optional[str] = Query(None),
+    last_event_id: Optional[str] = Header(None),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    product_service: ProductService = Depends(get_product_service)
+) -> StreamingResponse:
+    """
+    Push product changes as Server-Sent Events while the connection is open.
+
+    - **since**: Cursor to start after; a reconnecting EventSource resumes from its **Last-Event-ID** instead
+    - Every event is a `changes` batch (same body as `GET /changes`) whose id is the batch's `next_cursor`
+    """
+    changes = product_service.watch_changes(last_event_id or since, limit)
+    try:
+        # Fail with 400 before the stream starts if the cursor is bad
+        first = await anext(changes)
+    except InvalidCursorError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except OVERLOAD_ERRORS:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to stream product changes: {str(e)}"
+        )
+
+    async def events() -> AsyncIterator[str]:
+        # Tell EventSource clients how long to wait before reconnecting
+        yield f"retry: {int(CHANGES_POLL_INTERVAL * 1000)}\n\n"
+        page = first
+        try:
+            while True:
+                if page.changes:
+                    data = _changes_adapter.dump_json(page).decode()
+                    yield f"id: {page.next_cursor}\nevent: changes\ndata: {data}\n\n"
+                else:
+                    yield ": keep-alive\n\n"
+                page = await anext(changes)
+        finally:
+            await changes.aclose()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/{product_id}", response_model=ProductDetailDTO, dependencies=_ADMITTED)
 async def get_product_by_id(
     product_id: int,
+    request: Request,
     product_service: ProductService = Depends(get_product_service)
 ) -> ProductDetailDTO:
     """
     Retrieve a specific product by ID with full details.
 
     - **product_id**: The ID of the product to retrieve
+    - Honours **If-None-Match** / **If-Modified-Since** with 304, checked before the product is loaded
     """
     try:
-        product = await product_service.get_product_by_id(product_id)
+        version = await product_service.get_product_version(product_id)
+        product = None
+        if version is not None:
+            headers = validator_headers(make_etag("product", version.id, version.updated_at), version.updated_at)
+            if is_not_modified(request, headers["ETag"], version.updated_at):
+                return not_modified_response(headers)
+            product = await product_service.get_product_by_id(product_id)
         if product is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Product with ID {product_id} not found"
             )
-        return product
+        # Validators from the row actually returned, in case it changed since the version check
+        headers = validator_headers(make_etag("product", product.id, product.updated_at), product.updated_at)
+        return _json_response(_detail_adapter, product, headers=headers)
     except HTTPException:
         raise
+    except OVERLOAD_ERRORS:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to retrieve product: {str(e)}"
         )
 
-@router.put("/{product_id}", response_model=ProductDetailDTO)
+@router.put("/{product_id}", response_model=ProductDetailDTO, dependencies=_ADMITTED)
 async def update_product(
     product_id: int,
     product_data: ProductUpdateDTO,
@@ -99,16 +517,178 @@ async def update_product(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Product with ID {product_id} not found"
             )
-        return updated_product
+        return _json_response(_detail_adapter, updated_product)
     except HTTPException:
         raise
+    except OVERLOAD_ERRORS:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Failed to update product: {str(e)}"
         )
 
-@router.delete("/{product_id}", status_code=status.HTTP_204_NO_CONTENT)
+@router.post("/{product_id}/stock/reserve", response_model=StockLevelDTO, dependencies=_ADMITTED)
+async def reserve_product_stock(
+    product_id: int,
+    reservation: StockQuantityDTO,
+    product_service: ProductService = Depends(get_product_service)
+) -> StockLevelDTO:
+    """
+    Take units out of a product's stock atomically.
+
+    - **product_id**: The ID of the product to reserve
+    - **quantity**: Number of units to reserve; responds with 409 if not enough are in stock
+    """
+    try:
+        stock_level = await product_service.reserve_stock(product_id, reservation.quantity)
+        if stock_level is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Product with ID {product_id} not found"
+            )
+        return stock_level
+    except HTTPException:
+        raise
+    except InsufficientStockError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
+    except OVERLOAD_ERRORS:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to reserve stock: {str(e)}"
+        )
+
+@router.post("/{product_id}/stock/release", response_model=StockLevelDTO, dependencies=_ADMITTED)
+async def release_product_stock(
+    product_id: int,
+    release: StockQuantityDTO,
+    product_service: ProductService = Depends(get_product_service)
+) -> StockLevelDTO:
+    """
+    Put previously reserved units back into a product's stock.
+
+    - **product_id**: The ID of the product
+    - **quantity**: Number of units to release
+    """
+    try:
+        stock_level = await product_service.release_stock(product_id, release.quantity)
+        if stock_level is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Product with ID {product_id} not found"
+            )
+        return stock_level
+    except HTTPException:
+        raise
+    except OVERLOAD_ERRORS:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to release stock: {str(e)}"
+        )
+
+@router.post("/{product_id}/stock/adjust", response_model=StockLevelDTO, dependencies=_ADMITTED)
+async def adjust_product_stock(
+    product_id: int,
+    adjustment: StockAdjustmentDTO,
+    product_service: ProductService = Depends(get_product_service)
+) -> StockLevelDTO:
+    """
+    Add units to a product's stock, or remove them. With STOCK_WRITE_BEHIND_ENABLED the change is buffered
+    and written with the next flush; the response holds the stock expected after it.
+
+    - **product_id**: The ID of the product
+    - **delta**: Units to add, or to remove if negative; responds with 409 if not enough are in stock
+    """
+    try:
+        stock_level = await product_service.adjust_stock(product_id, adjustment.delta)
+        if stock_level is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Product with ID {product_id} not found"
+            )
+        return stock_level
+    except HTTPException:
+        raise
+    except InsufficientStockError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
+    except OVERLOAD_ERRORS:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to adjust stock: {str(e)}"
+        )
+
+@router.put("/{product_id}/stock", response_model=ProductDetailDTO, dependencies=_ADMITTED)
+async def set_product_stock(
+    product_id: int,
+    stock: StockSetDTO,
+    product_service: ProductService = Depends(get_product_service)
+) -> ProductDetailDTO:
+    """
+    Set a product's stock and return the product. With STOCK_WRITE_BEHIND_ENABLED the change is buffered and
+    written with the next flush.
+
+    - **product_id**: The ID of the product
+    - **stock**: New stock quantity
+    """
+    try:
+        updated_product = await product_service.update_product_stock(product_id, stock.stock)
+        if updated_product is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Product with ID {product_id} not found"
+            )
+        return _json_response(_detail_adapter, updated_product)
+    except HTTPException:
+        raise
+    except OVERLOAD_ERRORS:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Failed to set stock: {str(e)}"
+        )
+
+@router.get("/{product_id}/stock", response_model=StockLevelDTO, dependencies=_ADMITTED)
+async def get_product_stock(
+    product_id: int,
+    product_service: ProductService = Depends(get_product_service)
+) -> StockLevelDTO:
+    """
+    Get a product's current stock, including buffered changes not written yet.
+
+    - **product_id**: The ID of the product
+    """
+    try:
+        stock_level = await product_service.get_stock_level(product_id)
+        if stock_level is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Product with ID {product_id} not found"
+            )
+        return stock_level
+    except HTTPException:
+        raise
+    except OVERLOAD_ERRORS:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to get stock: {str(e)}"
+        )
+
+@router.delete("/{product_id}", status_code=status.HTTP_204_NO_CONTENT, dependencies=_ADMITTED)
 async def delete_product(
     product_id: int,
     product_service: ProductService = Depends(get_product_service)
@@ -123,25 +703,46 @@ async def delete_product(
         return None
     except HTTPException:
         raise
+    except OVERLOAD_ERRORS:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to delete product: {str(e)}"
         )
 
-@router.get("/search/{name}", response_model=List[ProductOverviewDTO])
+@router.get("/search/{name}", response_model=List[ProductOverviewDTO], dependencies=_ADMITTED)
 async def search_products_by_name(
     name: str,
+    request: Request,
+    limit: int = Query(DEFAULT_SEARCH_LIMIT, ge=1, le=MAX_PAGE_SIZE),
+    view: ProductView = Query(ProductView.OVERVIEW),
+    fields: Optional[str] = Query(None),
     product_service: ProductService = Depends(get_product_service)
 ) -> List[ProductOverviewDTO]:
     """
-    Search products by name.
+    Search products by name, best matches first.
 
     - **name**: The name or partial name to search for
+    - **limit**: Maximum number of products to return
+    - **view**: `overview` (without description) or `detail` (all fields)
+    - **fields**: Comma-separated list of fields to return, overrides **view**
     """
     try:
-        products = await product_service.get_products_by_name(name)
-        return products
+        headers = await _catalog_validators(request, product_service)
+        if is_not_modified(request, headers["ETag"]):
+            return not_modified_response(headers)
+
+        selected_fields = _parse_fields(fields)
+        products = await product_service.get_products_by_name(name, limit, view=view, fields=selected_fields)
+        return _list_response(products, view, selected_fields, headers=headers)
+    except InvalidFieldSelectionError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except OVERLOAD_ERRORS:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -0,0 +1,47 @@
+from typing import List, Optional
+import hmac
+
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi.responses import PlainTextResponse
+
+from ..dependencies import get_profile_store
+from ..monitoring.profiling import ProfileStore
+from ..settings import env_str
+
+router = APIRouter(prefix="/admin/profiles", tags=["admin"])
+
+
+def authorized_profile_store(x_profile_token: Optional[str] = Header(None)) -> ProfileStore:
+    """The profile store, for callers that send PROFILING_TOKEN in X-Profile-Token"""
+    store = get_profile_store()
+    # Profiling is only enabled with a token (see get_profile_store)
+    token = env_str("PROFILING_TOKEN")
+    if store is None or not token:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profiling is disabled")
+    if not hmac.compare_digest((x_profile_token or "").encode(), token.encode()):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid profiling token")
+    return store
+
+
+@router.get("")
+async def list_profiles(store: ProfileStore = Depends(authorized_profile_store)) -> List[dict]:
+    """
+    List the profiled requests still kept, newest first: route, status, trigger, duration, profiled CPU time,
+    SQL statements and DB time of each.
+    """
+    return [profile.summary() for profile in store.list()]
+
+
+@router.get("/{profile_id}", response_class=PlainTextResponse)
+async def get_profile(profile_id: int, store: ProfileStore = Depends(authorized_profile_store)) -> PlainTextResponse:
+    """
+    Retrieve one profile as collapsed stacks (`frame;frame;frame microseconds`), e.g. for
+    `flamegraph.pl profile.txt > profile.svg` or speedscope.
+    """
+    profile = store.get(profile_id)
+    if profile is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Profile with ID {profile_id} not found"
+        )
+    return PlainTextResponse(profile.profiler.collapsed())
@@ -4,19 +4,161 @@ This module centralizes the creation and management of service and repository in
 
 TODO: use a lib to do this, as this is not scalable
 """
-from fastapi import Depends
+from typing import AsyncGenerator, List, Optional
+import logging
+
+from fastapi import Depends, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.python_fastapi_project.repository.database import create_db_session
+from src.python_fastapi_project.api.admission import AdmissionController
+from src.python_fastapi_project.monitoring.instrumentation import route_template
+from src.python_fastapi_project.monitoring.profiling import ProfileStore
+from src.python_fastapi_project.repository.cache import CacheBackend, InMemoryLRUCache
+from src.python_fastapi_project.repository.database import (
+    create_db_session,
+    create_read_db_session,
+    get_product_stats,
+    get_stock_buffer,
+    get_write_queue,
+)
+from src.python_fastapi_project.repository.product.batching_product_repository import BatchingProductRepository
+from src.python_fastapi_project.repository.product.cached_product_repository import CachedProductRepository
 from src.python_fastapi_project.repository.product.product_repository_impl import ProductRepositoryImpl
 from src.python_fastapi_project.repository.product.product_repository import ProductRepository
+from src.python_fastapi_project.repository.product.stock_write_behind import StockWriteBehind
+from src.python_fastapi_project.service.change_notifier import ChangeNotifier
 from src.python_fastapi_project.service.product_service import ProductService
+from src.python_fastapi_project.service.single_flight import SingleFlight
+from src.python_fastapi_project.settings import env_flag, env_float, env_int, env_str
+
+logger = logging.getLogger(__name__)
+
+
+# Shared product cache (opt-in with PRODUCT_CACHE_ENABLED=true)
+_product_cache: Optional[CacheBackend] = None
+_product_cache_configured = False
+
+
+def configure_product_cache(cache: Optional[CacheBackend]) -> None:
+    """Install a cache backend for products (e.g. a shared store), or disable caching with None"""
+    global _product_cache, _product_cache_configured
+    _product_cache = cache
+    _product_cache_configured = True
+
+
+def get_product_cache() -> Optional[CacheBackend]:
+    """Get the product cache, building the in-process LRU from the environment on first use"""
+    if not _product_cache_configured:
+        configure_product_cache(InMemoryLRUCache(
+            max_size=env_int("PRODUCT_CACHE_MAX_SIZE", 10000),
+            ttl=env_float("PRODUCT_CACHE_TTL_SECONDS", 60.0),
+        ) if env_flag("PRODUCT_CACHE_ENABLED") else None)
+    return _product_cache
+
+
+# Coalescing of concurrent identical reads (off by default, PRODUCT_REQUEST_COALESCING=true enables it)
+_product_single_flight: Optional[SingleFlight] = None
+_product_single_flight_configured = False
+
+
+def get_product_single_flight() -> Optional[SingleFlight]:
+    """Get the process-wide single-flight group for product reads, or None when coalescing is disabled"""
+    global _product_single_flight, _product_single_flight_configured
+    if not _product_single_flight_configured:
+        _product_single_flight = SingleFlight() if env_flag("PRODUCT_REQUEST_COALESCING") else None
+        _product_single_flight_configured = True
+    return _product_single_flight
+
+
+# Wakes change feed streams after writes made by this process
+_product_change_notifier = ChangeNotifier()
+
+
+def get_product_change_notifier() -> ChangeNotifier:
+    return _product_change_notifier
+
+
+async def _forget_flushed_products(product_ids: List[int]) -> None:
+    """After a stock write-behind flush: drop the cached products and in-flight reads that predate it"""
+    cache = get_product_cache()
+    if cache is not None:
+        await cache.delete(*product_ids)
+    single_flight = get_product_single_flight()
+    if single_flight is not None:
+        single_flight.forget_all()
+    _product_change_notifier.notify()
+
+
+def _get_stock_buffer() -> Optional[StockWriteBehind]:
+    """The stock write-behind buffer, if enabled, with its flushes invalidating what this process holds"""
+    stock_buffer = get_stock_buffer()
+    if stock_buffer is not None:
+        stock_buffer.after_flush = _forget_flushed_products
+    return stock_buffer
+
+
+# Per-route concurrency caps and request deadlines (opt-in with ADMISSION_CONTROL_ENABLED=true)
+_admission_controller: Optional[AdmissionController] = None
+_admission_controller_configured = False
+
+
+def get_admission_controller() -> Optional[AdmissionController]:
+    """Get the process-wide admission controller, or None when admission control is disabled"""
+    global _admission_controller, _admission_controller_configured
+    if not _admission_controller_configured:
+        _admission_controller = AdmissionController(
+            max_concurrency=env_int("ADMISSION_MAX_CONCURRENCY", 10),
+            max_queue=env_int("ADMISSION_MAX_QUEUE", 50),
+            deadline=env_float("ADMISSION_DEADLINE_SECONDS", 2.0),
+        ) if env_flag("ADMISSION_CONTROL_ENABLED") else None
+        _admission_controller_configured = True
+    return _admission_controller
+
+
+async def admission_control(request: Request) -> AsyncGenerator[None, None]:
+    """Route dependency: hold a slot of the route (or get a 503) before the request touches the database"""
+    controller = get_admission_controller()
+    if controller is None:
+        yield
+        return
+    async with controller.admit(route_template(request.scope)):
+        yield
+
+
+# Recent request profiles (opt-in with PROFILING_ENABLED=true and a PROFILING_TOKEN)
+_profile_store: Optional[ProfileStore] = None
+_profile_store_configured = False
+
+
+def get_profile_store() -> Optional[ProfileStore]:
+    """
+    Get the process-wide store of request profiles, or None when profiling is disabled. Profiles expose the
+    code's call stacks, so profiling stays disabled unless a PROFILING_TOKEN guards them.
+    """
+    global _profile_store, _profile_store_configured
+    if not _profile_store_configured:
+        _profile_store = None
+        if env_flag("PROFILING_ENABLED"):
+            if env_str("PROFILING_TOKEN"):
+                _profile_store = ProfileStore(max_profiles=env_int("PROFILING_MAX_PROFILES", 50))
+            else:
+                logger.warning("PROFILING_ENABLED is set without a PROFILING_TOKEN; request profiling stays disabled")
+        _profile_store_configured = True
+    return _profile_store
 
 
 # Repository Layer Dependencies
-async def get_product_repository(db: AsyncSession = Depends(create_db_session)) -> ProductRepository:
-    """Create and return a ProductRepository instance with database session"""
-    return ProductRepositoryImpl(db)
+async def get_product_repository(
+    db: AsyncSession = Depends(create_db_session),
+    read_db: Optional[AsyncSession] = Depends(create_read_db_session),
+) -> ProductRepository:
+    """Create and return a ProductRepository instance with database session (and read replica session, if any)"""
+    repository = ProductRepositoryImpl(db, read_db, get_write_queue(), get_product_stats())
+    cache = get_product_cache()
+    if cache is not None:
+        repository = CachedProductRepository(repository, cache, db)
+    # Lookups by id issued concurrently within the request share one query (and never overlap on the session)
+    return BatchingProductRepository(repository)
 
 
 # Service Layer Dependencies
@@ -24,4 +166,10 @@ async def get_product_service(
     product_repository: ProductRepository = Depends(get_product_repository)
 ) -> ProductService:
     """Create and return a ProductService instance with injected repository"""
-    return ProductService(product_repository)
+    return ProductService(
+        product_repository,
+        get_product_single_flight(),
+        get_product_change_notifier(),
+        _get_stock_buffer(),
+        get_product_stats(),
+    )
@@ -1,18 +1,25 @@
 from datetime import datetime
-from ..models import Product
+from decimal import Decimal
+from typing import Union
+from ..models import Product, ProductTombstone
 from ..dtos import (
     ProductCreateDTO,
     ProductUpdateDTO,
     ProductOverviewDTO,
     ProductDetailDTO,
+    ProductChangeType,
+    ProductChangeDTO,
 )
 
 class ProductAssembler:
 
+    # The DTOs are built with model_construct: the values come from typed database columns,
+    # so running pydantic validation on every row would only cost CPU on large lists.
+
     @staticmethod
     def to_overview_dto(product: Product) -> ProductOverviewDTO:
         """Convert Product model to ProductOverviewDTO"""
-        return ProductOverviewDTO(
+        return ProductOverviewDTO.model_construct(
             id=product.id,
             created_by=product.created_by,
             created_at=product.created_at,
@@ -26,7 +33,7 @@ class ProductAssembler:
     @staticmethod
     def to_detail_dto(product: Product) -> ProductDetailDTO:
         """Convert Product model to ProductDetailDTO"""
-        return ProductDetailDTO(
+        return ProductDetailDTO.model_construct(
             id=product.id,
             created_by=product.created_by,
             created_at=product.created_at,
@@ -38,11 +45,50 @@ class ProductAssembler:
             price=float(product.price)
         )
 
+    @staticmethod
+    def to_overview_dtos(products: list[Product]) -> list[ProductOverviewDTO]:
+        """Convert list of Product models to list of ProductOverviewDTO"""
+        return [ProductAssembler.to_overview_dto(product) for product in products]
+
+    @staticmethod
+    def to_partial_detail_dto(product: Product, fields: set[str]) -> ProductDetailDTO:
+        """Convert only the given (loaded) columns of a Product model to a sparse ProductDetailDTO"""
+        values = {field: getattr(product, field) for field in fields}
+        if "price" in values:
+            values["price"] = float(values["price"])
+        return ProductDetailDTO.model_construct(**values)
+
     @staticmethod
     def to_detail_dtos(products: list[Product]) -> list[ProductDetailDTO]:
         """Convert list of Product models to list of ProductDetailDTO"""
         return [ProductAssembler.to_detail_dto(product) for product in products]
 
+    @staticmethod
+    def from_detail_dto(detail_dto: ProductDetailDTO) -> Product:
+        """Rebuild a (transient) Product model from ProductDetailDTO"""
+        product = Product(**detail_dto.model_dump(exclude={"price"}))
+        product.price = Decimal(str(detail_dto.price))
+        return product
+
+    @staticmethod
+    def to_change_dto(change: Union[Product, ProductTombstone]) -> ProductChangeDTO:
+        """Convert a written product or a tombstone to a change feed entry"""
+        if isinstance(change, ProductTombstone):
+            return ProductChangeDTO.model_construct(
+                type=ProductChangeType.DELETE,
+                id=change.product_id,
+                change_seq=change.change_seq,
+                product=None,
+                deleted_at=change.deleted_at,
+            )
+        return ProductChangeDTO.model_construct(
+            type=ProductChangeType.UPSERT,
+            id=change.id,
+            change_seq=change.change_seq,
+            product=ProductAssembler.to_detail_dto(change),
+            deleted_at=None,
+        )
+
     @staticmethod
     def from_create_dto(create_dto: ProductCreateDTO, created_by: str) -> Product:
         """Convert ProductCreateDTO to Product model"""
@@ -58,6 +104,31 @@ class ProductAssembler:
         product.updated_at = now
         return product
 
+    @staticmethod
+    def to_insert_values(create_dto: ProductCreateDTO, created_by: str) -> dict:
+        """Convert ProductCreateDTO to a column/value mapping for a bulk INSERT"""
+        now = datetime.now()
+        return {
+            "name": create_dto.name,
+            "description": create_dto.description,
+            "stock": create_dto.stock,
+            "price": create_dto.price,
+            "created_by": created_by,
+            "created_at": now,
+            "updated_by": created_by,
+            "updated_at": now,
+        }
+
+    @staticmethod
+    def to_update_values(update_dto: ProductUpdateDTO, updated_by: str) -> dict:
+        """Convert the fields set on ProductUpdateDTO to a column/value mapping for an UPDATE"""
+        values = update_dto.model_dump(
+            include=set(ProductUpdateDTO.model_fields), exclude_unset=True, exclude_none=True
+        )
+        values["updated_by"] = updated_by
+        values["updated_at"] = datetime.now()
+        return values
+
     @staticmethod
     def update_from_dto(product: Product, update_dto: ProductUpdateDTO, updated_by: str) -> Product:
         """Update Product model from ProductUpdateDTO"""
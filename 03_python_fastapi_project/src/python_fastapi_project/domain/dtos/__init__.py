@@ -5,6 +5,28 @@ from .product_dto import (
     ProductUpdateDTO,
     ProductOverviewDTO,
     ProductDetailDTO,
+    ProductPageDTO,
+    ProductSortField,
+    ProductSortOrder,
+    ProductView,
+    ProductExportFormat,
+    ProductBulkUpdateDTO,
+    ProductBulkErrorDTO,
+    ProductBulkResultDTO,
+    ProductBulkDeleteResultDTO,
+    StockQuantityDTO,
+    StockAdjustmentDTO,
+    StockSetDTO,
+    StockReservationItemDTO,
+    StockReservationDTO,
+    StockLevelDTO,
+    StockReservationResultDTO,
+    ProductVersionDTO,
+    CatalogVersionDTO,
+    ProductStatsDTO,
+    ProductChangeType,
+    ProductChangeDTO,
+    ProductChangesDTO,
 )
 
 __all__ = [
@@ -14,4 +36,26 @@ __all__ = [
     "ProductUpdateDTO",
     "ProductOverviewDTO",
     "ProductDetailDTO",
+    "ProductPageDTO",
+    "ProductSortField",
+    "ProductSortOrder",
+    "ProductView",
+    "ProductExportFormat",
+    "ProductBulkUpdateDTO",
+    "ProductBulkErrorDTO",
+    "ProductBulkResultDTO",
+    "ProductBulkDeleteResultDTO",
+    "StockQuantityDTO",
+    "StockAdjustmentDTO",
+    "StockSetDTO",
+    "StockReservationItemDTO",
+    "StockReservationDTO",
+    "StockLevelDTO",
+    "StockReservationResultDTO",
+    "ProductVersionDTO",
+    "CatalogVersionDTO",
+    "ProductStatsDTO",
+    "ProductChangeType",
+    "ProductChangeDTO",
+    "ProductChangesDTO",
 ]
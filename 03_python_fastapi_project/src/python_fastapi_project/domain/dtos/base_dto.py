@@ -1,5 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
+from typing import Optional
 
 class BaseDTO(BaseModel):
     id: int
@@ -8,7 +9,8 @@ class BaseDTO(BaseModel):
         from_attributes = True  # Allows conversion from SQLAlchemy models
 
 class BaseAuditDTO(BaseDTO):
-    created_by: str
-    created_at: datetime
-    updated_by: str
-    updated_at: datetime
+    # Nullable columns: the assembler builds DTOs without validation, so the types must admit what the rows hold
+    created_by: Optional[str]
+    created_at: Optional[datetime]
+    updated_by: Optional[str]
+    updated_at: Optional[datetime]
@@ -1,5 +1,7 @@
+from datetime import datetime
+from enum import Enum
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional, Union
 from .base_dto import BaseAuditDTO
 
 class ProductCreateDTO(BaseModel):
@@ -14,6 +16,9 @@ class ProductUpdateDTO(BaseModel):
     stock: Optional[int] = Field(None, ge=0, description="Available stock quantity")
     price: Optional[float] = Field(None, gt=0, description="Product price")
 
+class ProductBulkUpdateDTO(ProductUpdateDTO):
+    id: int = Field(..., description="ID of the product to update")
+
 class ProductOverviewDTO(BaseAuditDTO):
     name: str
     price: float
@@ -24,3 +29,93 @@ class ProductDetailDTO(BaseAuditDTO):
     description: Optional[str]
     stock: int
     price: float
+
+class ProductSortField(str, Enum):
+    ID = "id"
+    NAME = "name"
+    PRICE = "price"
+    UPDATED_AT = "updated_at"
+
+class ProductSortOrder(str, Enum):
+    ASC = "asc"
+    DESC = "desc"
+
+class ProductView(str, Enum):
+    OVERVIEW = "overview"
+    DETAIL = "detail"
+
+class ProductExportFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+class ProductChangeType(str, Enum):
+    UPSERT = "upsert"
+    DELETE = "delete"
+
+class ProductPageDTO(BaseModel):
+    items: List[Union[ProductDetailDTO, ProductOverviewDTO]]
+    next_cursor: Optional[str] = None
+
+class ProductBulkErrorDTO(BaseModel):
+    index: int
+    id: Optional[int] = None
+    detail: str
+
+class ProductBulkResultDTO(BaseModel):
+    items: List[ProductDetailDTO] = []
+    errors: List[ProductBulkErrorDTO] = []
+
+class ProductBulkDeleteResultDTO(BaseModel):
+    deleted_ids: List[int] = []
+    errors: List[ProductBulkErrorDTO] = []
+
+class StockQuantityDTO(BaseModel):
+    quantity: int = Field(..., gt=0, description="Number of units to reserve or release")
+
+class StockAdjustmentDTO(BaseModel):
+    delta: int = Field(..., description="Units to add to the stock, or to remove if negative")
+
+class StockSetDTO(BaseModel):
+    stock: int = Field(..., ge=0, description="New stock quantity")
+
+class StockReservationItemDTO(StockQuantityDTO):
+    product_id: int = Field(..., description="ID of the product to reserve")
+
+class StockReservationDTO(BaseModel):
+    items: List[StockReservationItemDTO] = Field(..., min_length=1, description="Order lines to reserve together")
+
+class StockLevelDTO(BaseModel):
+    product_id: int
+    stock: int
+
+class StockReservationResultDTO(BaseModel):
+    reserved: bool
+    items: List[StockLevelDTO] = []
+    errors: List[ProductBulkErrorDTO] = []
+
+class ProductVersionDTO(BaseModel):
+    id: int
+    updated_at: Optional[datetime]
+
+class CatalogVersionDTO(BaseModel):
+    change_seq: int
+
+class ProductStatsDTO(BaseModel):
+    product_count: int
+    total_stock: int
+    inventory_value: float = Field(..., description="Sum of price * stock over all products")
+    low_stock_count: int = Field(..., description="Products with less stock than low_stock_threshold")
+    out_of_stock_count: int
+    low_stock_threshold: int
+
+class ProductChangeDTO(BaseModel):
+    type: ProductChangeType
+    id: int
+    change_seq: int
+    product: Optional[ProductDetailDTO] = None
+    deleted_at: Optional[datetime] = None
+
+class ProductChangesDTO(BaseModel):
+    changes: List[ProductChangeDTO] = []
+    next_cursor: Optional[str] = Field(None, description="Pass as `since` to get the changes after these")
+    has_more: bool = False
@@ -1,5 +1,9 @@
 from .product import Product
+from .change import ChangeSeqLease, ChangeSequence, ProductTombstone
 
 __all__ = [
-    "Product"
+    "Product",
+    "ChangeSequence",
+    "ChangeSeqLease",
+    "ProductTombstone",
 ]
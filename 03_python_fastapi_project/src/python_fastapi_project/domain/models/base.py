@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime
 from sqlalchemy.sql import func
 from sqlalchemy.ext.declarative import declarative_base
 
@@ -15,4 +15,7 @@ class BaseAudit(BaseModel):
     created_by = Column(String(100))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_by = Column(String(100))
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now(), index=True)
+    # Position in the change feed: set from a shared counter by every write (see product_changes.py).
+    # Timestamps can repeat or go backwards; this cannot, and (change_seq, id) orders the feed.
+    change_seq = Column(BigInteger, nullable=False, default=0, server_default="0", index=True)
@@ -0,0 +1,30 @@
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Index
+from sqlalchemy.sql import func
+from .base import Base
+
+class ChangeSequence(Base):
+    """One counter per change feed; every write takes the next value"""
+    __tablename__ = "change_sequences"
+
+    name = Column(String(50), primary_key=True)
+    value = Column(BigInteger, nullable=False)
+
+class ChangeSeqLease(Base):
+    """A sequence number taken by a write that has not committed yet (every database but SQLite)"""
+    __tablename__ = "change_seq_leases"
+
+    seq = Column(BigInteger, primary_key=True, autoincrement=False)
+    taken_at = Column(DateTime, nullable=False)
+
+class ProductTombstone(Base):
+    """Marker left behind by a deleted product, so the change feed can report the removal"""
+    __tablename__ = "product_tombstones"
+    __table_args__ = (
+        # Backs the change feed's keyset scan on (change_seq, product_id)
+        Index("ix_product_tombstones_change_seq_product_id", "change_seq", "product_id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    product_id = Column(Integer, nullable=False)
+    change_seq = Column(BigInteger, nullable=False)
+    deleted_at = Column(DateTime(timezone=True), server_default=func.now())
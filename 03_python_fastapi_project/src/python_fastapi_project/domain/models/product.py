@@ -1,8 +1,16 @@
-from sqlalchemy import Column, Integer, String, Numeric
+from sqlalchemy import Column, Integer, String, Numeric, Index
 from .base import BaseAudit
 
 class Product(BaseAudit):
     __tablename__ = "products"
+    __table_args__ = (
+        # Composite indexes backing keyset pagination on (sort column, id); the price one also serves
+        # price range filters. updated_at has its own index (BaseAudit), which ends with the primary key anyway.
+        Index("ix_products_name_id", "name", "id"),
+        Index("ix_products_price_id", "price", "id"),
+        # Low-stock filters (stock < n)
+        Index("ix_products_stock_id", "stock", "id"),
+    )
 
     name = Column(String(255), nullable=False)
     description = Column(String(500), nullable=True)
@@ -0,0 +1,48 @@
+"""
+Opaque cursors for keyset pagination.
+
+A cursor stores the sort column, the value of that column on the last row of a page
+and the row id (tie-breaker), so the next page can be fetched with an index-backed
+`WHERE (sort_col, id) > (:value, :id) ORDER BY sort_col, id LIMIT n` query.
+"""
+import base64
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Optional
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a client sends a cursor that cannot be decoded"""
+
+
+@dataclass(frozen=True)
+class Cursor:
+    sort: str
+    value: Any
+    id: int
+
+
+def encode_cursor(sort: str, value: Any, row_id: int) -> str:
+    """Encode the position of the last row of a page into an opaque string"""
+    if isinstance(value, (Decimal, datetime)):
+        value = value.isoformat() if isinstance(value, datetime) else str(value)
+    payload = json.dumps({"s": sort, "v": value, "id": row_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], sort: str) -> Optional[Cursor]:
+    """Decode a cursor produced by `encode_cursor`, checking it belongs to the requested sort"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        decoded = Cursor(sort=payload["s"], value=payload["v"], id=int(payload["id"]))
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursorError(f"Invalid cursor: {cursor}") from e
+
+    if decoded.sort != sort:
+        raise InvalidCursorError(f"Cursor was issued for sort '{decoded.sort}', not '{sort}'")
+    return decoded
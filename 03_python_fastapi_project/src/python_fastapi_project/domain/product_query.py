@@ -0,0 +1,23 @@
+"""
+Typed filters and ordering for product listings.
+
+The repository compiles a `ProductQuery` into SQL `WHERE` / `ORDER BY` clauses; every supported filter
+and sort column is backed by an index on `products` (see the model).
+"""
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Optional
+
+
+@dataclass(frozen=True)
+class ProductQuery:
+    min_price: Optional[Decimal] = None  # price >= min_price
+    max_price: Optional[Decimal] = None  # price <= max_price
+    stock_below: Optional[int] = None  # stock < stock_below, e.g. low-stock reports
+    sort: str = "id"  # ties are always broken by id
+    descending: bool = False
+
+    @property
+    def cursor_key(self) -> str:
+        """What a page cursor is issued for: the sort column, prefixed with `-` when descending"""
+        return f"-{self.sort}" if self.descending else self.sort
@@ -1,7 +1,15 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from src.python_fastapi_project.api.product_api import router as product_router
+from src.python_fastapi_project.api.profiling_api import router as profiling_router
+from src.python_fastapi_project.api.admission import OVERLOAD_ERRORS, overload_exception_handler
 from src.python_fastapi_project.repository.database import database_lifespan
+from src.python_fastapi_project.dependencies import get_product_cache, get_profile_store
+from src.python_fastapi_project.monitoring.instrumentation import MetricsMiddleware
+from src.python_fastapi_project.monitoring.metrics import registry
+from src.python_fastapi_project.monitoring.profiling import ProfilingMiddleware
+from src.python_fastapi_project.settings import env_float, env_str
 from dotenv import load_dotenv
 
 # Load environment variables from .env file to os.getenv
@@ -24,10 +32,29 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Missing-Ids", "ETag", "Last-Modified", "Retry-After"],
 )
 
+# Profile requests on demand (inside MetricsMiddleware, to see their SQL statistics); not installed when disabled
+profile_store = get_profile_store()
+if profile_store is not None:
+    app.add_middleware(
+        ProfilingMiddleware,
+        store=profile_store,
+        sample_rate=env_float("PROFILING_SAMPLE_RATE", 0.0),
+        token=env_str("PROFILING_TOKEN"),
+    )
+
+# Record latency and SQL statistics per request (outermost, so it also times CORS handling)
+app.add_middleware(MetricsMiddleware)
+
+# Shed requests (not admitted, out of time, no pool connection in time) get 503 with Retry-After
+for overload_error in OVERLOAD_ERRORS:
+    app.add_exception_handler(overload_error, overload_exception_handler)
+
 # Include routers
 app.include_router(product_router, prefix="/api")
+app.include_router(profiling_router)
 
 @app.get("/")
 async def root():
@@ -37,6 +64,17 @@ async def root():
 async def health_check():
     return {"status": "healthy", "message": "API is running successfully"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/cache/stats")
+async def cache_stats():
+    cache = get_product_cache()
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.stats().to_dict()}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000, reload=True)
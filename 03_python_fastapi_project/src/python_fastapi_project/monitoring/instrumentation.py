@@ -0,0 +1,179 @@
+"""
+Per-request HTTP and SQL instrumentation.
+
+- `MetricsMiddleware` times every request and records it per method and route template
+- `instrument_engine` hooks SQLAlchemy cursor events to count statements and DB time per request,
+  and times connection pool checkouts
+- the pool's size, checked-out connections and overflow are sampled on every /metrics scrape, until
+  `forget_engines` (engine teardown)
+"""
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional
+import time
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .metrics import registry
+
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 4, 5, 10, 20, 50, 100)
+
+http_requests_total = registry.counter(
+    "http_requests_total", "HTTP requests by method, route and status code", ("method", "route", "status")
+)
+http_request_duration_seconds = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency in seconds", ("method", "route")
+)
+db_queries_per_request = registry.histogram(
+    "db_queries_per_request", "SQL statements executed per HTTP request", ("method", "route"), QUERY_COUNT_BUCKETS
+)
+db_time_per_request_seconds = registry.histogram(
+    "db_time_per_request_seconds", "Time spent executing SQL per HTTP request", ("method", "route")
+)
+db_queries_total = registry.counter("db_queries_total", "SQL statements executed", ("engine",))
+db_query_duration_seconds = registry.histogram(
+    "db_query_duration_seconds", "SQL statement execution time in seconds", ("engine",)
+)
+db_pool_checkout_wait_seconds = registry.histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection", ("engine",)
+)
+db_pool_size = registry.gauge("db_pool_size", "Configured connection pool size", ("engine",))
+db_pool_checked_out = registry.gauge("db_pool_checked_out", "Connections currently checked out", ("engine",))
+db_pool_overflow = registry.gauge("db_pool_overflow", "Connections open beyond the pool size", ("engine",))
+db_pool_saturation = registry.gauge(
+    "db_pool_saturation", "Checked-out connections / (pool size + max overflow)", ("engine",)
+)
+
+
+@dataclass
+class RequestStats:
+    queries: int = 0
+    db_time: float = 0.0
+
+
+# Pool samplers of the instrumented engines, by engine name
+_pool_collectors: Dict[str, Callable[[], None]] = {}
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def current_request_stats() -> Optional[RequestStats]:
+    """SQL statistics of the request being handled, or None outside of a request"""
+    return _request_stats.get()
+
+
+def route_template(scope: Scope) -> str:
+    """
+    The matched route's template (/api/products/{product_id}), never the raw path, to bound label cardinality.
+    Depending on the FastAPI version, routes of included routers report their path without the include prefix.
+    """
+    route = scope.get("route")
+    template = getattr(route, "path", None)
+    if template is None:
+        return "unmatched"
+    path = scope.get("path", "")
+    path_regex = getattr(route, "path_regex", None)
+    if path_regex is not None and not path_regex.match(path):
+        for index, char in enumerate(path):
+            if index and char == "/" and path_regex.match(path[index:]):
+                return path[:index] + template
+    return template
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware (no per-request task or body buffering, unlike BaseHTTPMiddleware)"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            _request_stats.reset(token)
+            route_label = route_template(scope)
+            method = scope["method"]
+            http_requests_total.inc(method=method, route=route_label, status=str(status_code))
+            http_request_duration_seconds.observe(elapsed, method=method, route=route_label)
+            db_queries_per_request.observe(stats.queries, method=method, route=route_label)
+            db_time_per_request_seconds.observe(stats.db_time, method=method, route=route_label)
+
+
+def instrument_engine(engine: AsyncEngine, name: str = "primary") -> None:
+    """Attach statement and pool instrumentation to an engine"""
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        db_queries_total.inc(engine=name)
+        db_query_duration_seconds.observe(elapsed, engine=name)
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_time += elapsed
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _handle_error(exception_context):
+        connection = exception_context.connection
+        if connection is not None and connection.info.get("query_started"):
+            connection.info["query_started"].pop()
+
+    pool = sync_engine.pool
+    connect = pool.connect
+
+    # The pool has no "before checkout" event, so time the checkout call itself
+    def timed_connect(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return connect(*args, **kwargs)
+        finally:
+            db_pool_checkout_wait_seconds.observe(time.perf_counter() - started, engine=name)
+
+    pool.connect = timed_connect
+
+    def collect_pool_stats() -> None:
+        # Not every pool class (e.g. StaticPool, NullPool) keeps these counters
+        if not hasattr(pool, "checkedout"):
+            return
+        size = pool.size()
+        checked_out = pool.checkedout()
+        db_pool_size.set(size, engine=name)
+        db_pool_checked_out.set(checked_out, engine=name)
+        db_pool_overflow.set(max(pool.overflow(), 0), engine=name)
+        capacity = size + max(getattr(pool, "_max_overflow", 0), 0)
+        db_pool_saturation.set(checked_out / capacity if capacity else 0.0, engine=name)
+
+    # An engine instrumented again under the same name (app restarted) replaces the previous one
+    registry.remove_collector(_pool_collectors.get(name))
+    _pool_collectors[name] = collect_pool_stats
+    registry.add_collector(collect_pool_stats)
+
+
+def forget_engines() -> None:
+    """Stop sampling the pools of the instrumented engines; call when they are disposed"""
+    for collector in _pool_collectors.values():
+        registry.remove_collector(collector)
+    _pool_collectors.clear()
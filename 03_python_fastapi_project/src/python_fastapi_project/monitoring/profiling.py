@@ -0,0 +1,272 @@
+"""
+On-demand request profiling (opt-in with PROFILING_ENABLED=true; without it the middleware is not installed).
+
+`ProfilingMiddleware` profiles a request when it carries `X-Profile: <PROFILING_TOKEN>`, or at random for a
+PROFILING_SAMPLE_RATE fraction of requests. The profiler only runs while the request's own coroutine runs, so
+requests interleaved with it on the event loop do not end up in its profile, and time spent waiting (for the
+database, the client) is left out: a profile shows where the request spends CPU time, e.g. ORM hydration,
+DTO assembly, validation or JSON encoding.
+
+Like cProfile, every call is recorded, but with its whole call stack, so a profile renders as collapsed stacks
+("frame;frame;frame microseconds", one line per stack) that flamegraph.pl or speedscope read as they are.
+The last PROFILING_MAX_PROFILES profiles are kept in memory. One request is profiled at a time: another one
+asking for a profile with the header meanwhile gets 409, a sampled one runs unprofiled.
+"""
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Deque, Dict, Generator, List, Optional
+import hmac
+import itertools
+import random
+import sys
+import time
+
+import greenlet
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from .instrumentation import current_request_stats, route_template
+
+PROFILE_HEADER = b"x-profile"
+
+
+@dataclass
+class _Node:
+    self_ns: int = 0
+    children: Dict[str, "_Node"] = field(default_factory=dict)
+
+
+def _function_name(frame) -> str:
+    code = frame.f_code
+    return f"{frame.f_globals.get('__name__', '?')}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+def _builtin_name(function) -> str:
+    return f"{getattr(function, '__module__', None) or 'builtins'}:{getattr(function, '__qualname__', repr(function))}"
+
+
+class StackProfiler:
+    """
+    Deterministic profiler, like cProfile, that keeps whole call stacks instead of caller/callee pairs.
+    SQLAlchemy's asyncio layer runs the ORM in greenlets: every greenlet gets its own stack (nested under the
+    frame that started it), and time a greenlet spends switched out is not counted in its open frames.
+    """
+
+    def __init__(self):
+        self.root = _Node()
+        self._stack: List[list] = []  # of the running greenlet: [node, started, time spent in callees]
+        self._switched_out: Dict[greenlet.greenlet, tuple] = {}  # greenlet -> (its stack, when it was left)
+        self._previous_switch_trace = None
+        self._previous_profile = None
+
+    def _event(self, frame, event: str, arg) -> None:
+        now = time.perf_counter_ns()
+        if event == "call" or event == "c_call":
+            parent = self._stack[-1][0] if self._stack else self._spawning_node()
+            name = _function_name(frame) if event == "call" else _builtin_name(arg)
+            node = parent.children.get(name)
+            if node is None:
+                node = parent.children[name] = _Node()
+            self._stack.append([node, now, 0])
+        elif self._stack:
+            # return, c_return, c_exception; a coroutine that suspends also "returns"
+            node, started, callees = self._stack.pop()
+            elapsed = now - started
+            node.self_ns += elapsed - callees
+            if self._stack:
+                self._stack[-1][2] += elapsed
+
+    def _spawning_node(self) -> _Node:
+        """Where the frames of a greenlet with no open frames go: under the frame that switched to it"""
+        parent = greenlet.getcurrent().parent
+        if parent is not None and parent in self._switched_out:
+            stack, _ = self._switched_out[parent]
+            if stack:
+                return stack[-1][0]
+        return self.root
+
+    def _switch(self, event: str, args) -> None:
+        now = time.perf_counter_ns()
+        origin, target = args
+        self._switched_out[origin] = (self._stack, now)
+        self._stack, left = self._switched_out.pop(target, ([], now))
+        for entry in self._stack:
+            entry[1] += now - left
+
+    def resume(self) -> None:
+        self._previous_switch_trace = greenlet.settrace(self._switch)
+        # Another profiler (cProfile, a debugger, coverage) may be installed; it gets its hook back on pause
+        self._previous_profile = sys.getprofile()
+        sys.setprofile(self._event)
+
+    def pause(self) -> None:
+        sys.setprofile(self._previous_profile)
+        self._previous_profile = None
+        greenlet.settrace(self._previous_switch_trace)
+        # Frames still open here are the ones that switched the profiler off
+        self._stack.clear()
+
+    @property
+    def total_ns(self) -> int:
+        def total(node: _Node) -> int:
+            return node.self_ns + sum(total(child) for child in node.children.values())
+        return total(self.root)
+
+    def collapsed(self) -> str:
+        """One `frame;frame;frame microseconds` line per stack that spent time in its last frame"""
+        lines = []
+
+        def walk(node: _Node, path: List[str]) -> None:
+            for name, child in node.children.items():
+                path.append(name)
+                if child.self_ns >= 1000:
+                    lines.append(f"{';'.join(path)} {child.self_ns // 1000}")
+                walk(child, path)
+                path.pop()
+
+        walk(self.root, [])
+        return "\n".join(lines) + "\n"
+
+
+class _Profiled:
+    """Await a coroutine, profiling each of its steps (from one resumption to the next suspension) only"""
+
+    def __init__(self, coroutine, profiler: StackProfiler):
+        self._coroutine = coroutine
+        self._profiler = profiler
+
+    def __await__(self) -> Generator:
+        send_value, error = None, None
+        while True:
+            self._profiler.resume()
+            try:
+                if error is None:
+                    suspended_on = self._coroutine.send(send_value)
+                else:
+                    suspended_on = self._coroutine.throw(error)
+            except StopIteration as stop:
+                return stop.value
+            finally:
+                self._profiler.pause()
+            try:
+                send_value, error = (yield suspended_on), None
+            except BaseException as e:
+                # E.g. cancellation: deliver it to the coroutine on its next step
+                send_value, error = None, e
+
+
+@dataclass
+class RequestProfile:
+    id: int
+    started_at: datetime
+    method: str
+    path: str
+    route: str
+    status: int
+    trigger: str  # "header" or "sample"
+    duration: float  # wall-clock seconds
+    queries: int
+    db_time: float
+    profiler: StackProfiler
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "started_at": self.started_at.isoformat(),
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "status": self.status,
+            "trigger": self.trigger,
+            "duration_ms": round(self.duration * 1000, 3),
+            "profiled_cpu_ms": round(self.profiler.total_ns / 1e6, 3),
+            "queries": self.queries,
+            "db_time_ms": round(self.db_time * 1000, 3),
+        }
+
+
+class ProfileStore:
+    """The last `max_profiles` request profiles"""
+
+    def __init__(self, max_profiles: int = 50):
+        self._profiles: Deque[RequestProfile] = deque(maxlen=max_profiles)
+        self._ids = itertools.count(1)
+
+    def next_id(self) -> int:
+        return next(self._ids)
+
+    def add(self, profile: RequestProfile) -> None:
+        self._profiles.append(profile)
+
+    def list(self) -> List[RequestProfile]:
+        """Newest first"""
+        return list(reversed(self._profiles))
+
+    def get(self, profile_id: int) -> Optional[RequestProfile]:
+        return next((profile for profile in self._profiles if profile.id == profile_id), None)
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware; install it inside MetricsMiddleware, which counts the request's SQL statements"""
+
+    def __init__(self, app: ASGIApp, store: ProfileStore, sample_rate: float = 0.0, token: Optional[str] = None):
+        self.app = app
+        self.store = store
+        self.sample_rate = sample_rate
+        self.token = token.encode() if token else None
+        self._profiling = False
+
+    def _trigger(self, scope: Scope) -> Optional[str]:
+        if self.token is not None:
+            for name, value in scope["headers"]:
+                if name == PROFILE_HEADER and hmac.compare_digest(value, self.token):
+                    return "header"
+        if self.sample_rate and random.random() < self.sample_rate:
+            return "sample"
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        trigger = self._trigger(scope) if scope["type"] == "http" else None
+        if trigger is not None and self._profiling:
+            if trigger == "header":
+                response = JSONResponse({"detail": "Another request is being profiled"}, status_code=409)
+                await response(scope, receive, send)
+                return
+            trigger = None
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        profiler = StackProfiler()
+        started_at = datetime.now()
+        started = time.perf_counter()
+        stats = current_request_stats()
+        queries_before = stats.queries if stats is not None else 0
+        db_time_before = stats.db_time if stats is not None else 0.0
+        self._profiling = True
+        try:
+            await _Profiled(self.app(scope, receive, send_wrapper), profiler)
+        finally:
+            self._profiling = False
+            self.store.add(RequestProfile(
+                id=self.store.next_id(),
+                started_at=started_at,
+                method=scope["method"],
+                path=scope["path"],
+                route=route_template(scope),
+                status=status_code,
+                trigger=trigger,
+                duration=time.perf_counter() - started,
+                queries=stats.queries - queries_before if stats is not None else 0,
+                db_time=stats.db_time - db_time_before if stats is not None else 0.0,
+                profiler=profiler,
+            ))
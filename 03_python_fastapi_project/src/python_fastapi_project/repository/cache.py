@@ -0,0 +1,109 @@
+"""
+Cache backends used by the cached repositories.
+
+`CacheBackend` is the extension point: the in-process `InMemoryLRUCache` is the default,
+a shared store (e.g. Redis) can be plugged in by implementing the same five methods.
+
+A value read from the source while an invalidation of its key runs can be older than that invalidation: readers
+take a `generation()` before reading and pass it to `set`, which refuses the value if the key was deleted since.
+"""
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from typing import Any, Hashable, Optional
+import time
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    size: int = 0
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+class CacheBackend(ABC):
+    @abstractmethod
+    async def get(self, key: Hashable, count: bool = True) -> Optional[Any]:
+        """Return the cached value, or None on a miss; with `count=False` the lookup is left out of the hit/miss stats"""
+        pass
+
+    @abstractmethod
+    async def generation(self) -> int:
+        """Take before reading a value from the source, and pass to `set`"""
+        pass
+
+    @abstractmethod
+    async def set(self, key: Hashable, value: Any, generation: Optional[int] = None) -> None:
+        """Store the value, unless the key was deleted after `generation` was taken"""
+        pass
+
+    @abstractmethod
+    async def delete(self, *keys: Hashable) -> None:
+        pass
+
+    @abstractmethod
+    def stats(self) -> CacheStats:
+        pass
+
+
+class InMemoryLRUCache(CacheBackend):
+    """Bounded in-process cache: least recently used entries are evicted first, entries expire after `ttl` seconds"""
+
+    def __init__(self, max_size: int = 10000, ttl: float = 60.0):
+        if max_size <= 0:
+            raise ValueError("max_size must be positive")
+        self._max_size = max_size
+        self._ttl = ttl
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._stats = CacheStats()
+        # Generation of the last delete of each key, the oldest forgotten first; `_forgotten` is the latest forgotten
+        self._generation = 0
+        self._deleted: OrderedDict[Hashable, int] = OrderedDict()
+        self._forgotten = 0
+
+    async def get(self, key: Hashable, count: bool = True) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] <= time.monotonic():
+            del self._entries[key]
+            self._stats.expirations += 1
+            entry = None
+
+        if count:
+            if entry is None:
+                self._stats.misses += 1
+            else:
+                self._stats.hits += 1
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    async def generation(self) -> int:
+        return self._generation
+
+    async def set(self, key: Hashable, value: Any, generation: Optional[int] = None) -> None:
+        if generation is not None and self._deleted.get(key, self._forgotten) > generation:
+            return
+        self._entries[key] = (time.monotonic() + self._ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+            self._stats.evictions += 1
+
+    async def delete(self, *keys: Hashable) -> None:
+        self._generation += 1
+        for key in keys:
+            self._entries.pop(key, None)
+            self._deleted[key] = self._generation
+            self._deleted.move_to_end(key)
+        while len(self._deleted) > self._max_size:
+            _, self._forgotten = self._deleted.popitem(last=False)
+
+    def stats(self) -> CacheStats:
+        self._stats.size = len(self._entries)
+        return self._stats
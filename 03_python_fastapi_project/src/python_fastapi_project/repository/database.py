@@ -1,25 +1,163 @@
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker, AsyncEngine
+from sqlalchemy.orm import Session
 from contextlib import asynccontextmanager
+import asyncio
 from fastapi import FastAPI
-from src.python_fastapi_project.domain.models.base import Base
+from src.python_fastapi_project.repository.product.product_search import setup_search_index
+from src.python_fastapi_project.repository.product.product_changes import (
+    SEQUENCE_ENGINE,
+    setup_change_sequence,
+    uses_leases,
+)
+from src.python_fastapi_project.repository.product.stock_write_behind import StockWriteBehind
+from src.python_fastapi_project.repository.product.product_stats import ProductStats, low_stock_threshold
+from src.python_fastapi_project.repository.sqlite import SQLiteWriter, apply_pragmas, use_immediate_transactions
+from src.python_fastapi_project.monitoring.instrumentation import forget_engines, instrument_engine
+from src.python_fastapi_project.repository.deadline import apply_statement_timeouts
+from src.python_fastapi_project.repository.schema import ensure_schema
+from src.python_fastapi_project.settings import env_flag, env_float, env_int, env_str
 from typing import Optional, AsyncGenerator
 import os
 
 # Global variables for engine and session maker
-engine: Optional[AsyncEngine] = None  # Connection manager
+engine: Optional[AsyncEngine] = None  # Connection manager (primary, takes every write)
 AsyncSessionLocal: Optional[async_sessionmaker[AsyncSession]] = None  # Session factory
+read_engine: Optional[AsyncEngine] = None  # Read replica, only when DATABASE_READ_URL is set
+AsyncReadSessionLocal: Optional[async_sessionmaker[AsyncSession]] = None
+write_queue: Optional[SQLiteWriter] = None  # Single writer of the SQLite production profile
+sequence_engine: Optional[AsyncEngine] = None  # Takes change feed sequence numbers (every database but SQLite)
+stock_buffer: Optional[StockWriteBehind] = None  # Write-behind stock changes, when STOCK_WRITE_BEHIND_ENABLED is set
+product_stats: Optional[ProductStats] = None  # In-memory inventory aggregates, when PRODUCT_STATS_ENABLED is set
+
+# Pool keyword -> (environment suffix, parser). Unset settings keep SQLAlchemy's defaults, which also
+# keeps pools that do not take them (e.g. the StaticPool of an in-memory SQLite database) working.
+_POOL_SETTINGS = {
+    "pool_size": ("POOL_SIZE", int),
+    "max_overflow": ("MAX_OVERFLOW", int),
+    "pool_timeout": ("POOL_TIMEOUT", float),
+    "pool_recycle": ("POOL_RECYCLE", int),
+}
+
+_WROTE = "wrote"
+
+
+class PrimarySession(Session):
+    """Session on the primary that remembers whether it has written, so later reads can avoid the replica"""
+
+
+@event.listens_for(PrimarySession, "after_flush")
+def _after_flush(session, flush_context):
+    session.info[_WROTE] = True
+
+
+@event.listens_for(PrimarySession, "do_orm_execute")
+def _do_orm_execute(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info[_WROTE] = True
+
+
+def has_written(session: AsyncSession) -> bool:
+    """Whether this (request's) session has sent a write to the primary"""
+    return session.info.get(_WROTE, False)
+
+
+def mark_written(session: AsyncSession) -> None:
+    """Record a write made on this request's behalf elsewhere (e.g. by the SQLite writer)"""
+    session.info[_WROTE] = True
+
+
+def _engine_options(*prefixes: str) -> dict:
+    """Engine settings from the environment; `<prefix>_POOL_SIZE` etc. are looked up for each prefix in turn"""
+    def setting(suffix: str) -> Optional[str]:
+        # Name of the first variable that is set, if any
+        return next((f"{prefix}_{suffix}" for prefix in prefixes if env_str(f"{prefix}_{suffix}")), None)
+
+    # Statement logging is a throughput tax; enable it only for local debugging
+    options = {"echo": env_flag("DATABASE_ECHO")}
+    pre_ping = setting("POOL_PRE_PING")
+    if pre_ping is not None:
+        options["pool_pre_ping"] = env_flag(pre_ping)
+    for option, (suffix, parse) in _POOL_SETTINGS.items():
+        name = setting(suffix)
+        if name is not None:
+            options[option] = parse(env_str(name))
+    return options
+
+def get_database_url() -> str:
+    """The primary's URL from DATABASE_URL, which must be set"""
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        raise ValueError("DATABASE_URL environment variable is not set")
+    return database_url
 
 def setup_database_engine():
-    """Initialize the database connection manager and session factory"""
-    global engine, AsyncSessionLocal
+    """Initialize the database connection managers and session factories"""
+    global engine, AsyncSessionLocal, read_engine, AsyncReadSessionLocal, write_queue, sequence_engine
+    global stock_buffer, product_stats
 
     if engine is None:
-        database_url = os.getenv("DATABASE_URL")
-        if not database_url:
-            raise ValueError("DATABASE_URL environment variable is not set")
+        database_url = get_database_url()
+
+        engine = create_async_engine(database_url, **_engine_options("DATABASE"))
+        instrument_engine(engine, "primary")
+        # Deadlines are only set by admission control; without it the hooks would be pure overhead
+        statement_timeouts = env_flag("ADMISSION_CONTROL_ENABLED")
+        if statement_timeouts:
+            apply_statement_timeouts(engine)
+        session_info = {}
+        if uses_leases(engine.dialect):
+            # A small pool of its own: a write waiting for its sequence number never waits for a connection
+            # held by other writes
+            sequence_engine = create_async_engine(
+                database_url,
+                echo=env_flag("DATABASE_ECHO"),
+                pool_size=env_int("DATABASE_SEQUENCE_POOL_SIZE", 2),
+                max_overflow=0,
+            )
+            instrument_engine(sequence_engine, "sequence")
+            session_info[SEQUENCE_ENGINE] = sequence_engine
+        AsyncSessionLocal = async_sessionmaker(
+            engine, class_=AsyncSession, sync_session_class=PrimarySession, expire_on_commit=False, info=session_info
+        )
+
+        if engine.dialect.name == "sqlite" and env_flag("DATABASE_SQLITE_PRODUCTION"):
+            # `engine` becomes the reader pool; writes get a dedicated single-connection engine
+            apply_pragmas(engine)
+            writer_engine = create_async_engine(
+                database_url, echo=env_flag("DATABASE_ECHO"), pool_size=1, max_overflow=0
+            )
+            apply_pragmas(writer_engine)
+            use_immediate_transactions(writer_engine)
+            instrument_engine(writer_engine, "writer")
+            write_queue = SQLiteWriter(writer_engine, max_batch_size=env_int("SQLITE_WRITE_BATCH_SIZE", 64))
+
+        if env_flag("STOCK_WRITE_BEHIND_ENABLED"):
+            stock_buffer = StockWriteBehind(
+                AsyncSessionLocal,
+                write_queue,
+                interval=env_float("STOCK_WRITE_BEHIND_INTERVAL_MS", 100.0) / 1000,
+                max_pending=env_int("STOCK_WRITE_BEHIND_MAX_PENDING", 1000),
+            )
 
-        engine = create_async_engine(database_url, echo=True)
-        AsyncSessionLocal = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        if env_flag("PRODUCT_STATS_ENABLED"):
+            product_stats = ProductStats(
+                AsyncSessionLocal,
+                stock_buffer,
+                threshold=low_stock_threshold(),
+                reconcile_interval=env_float("PRODUCT_STATS_RECONCILE_SECONDS", 60.0),
+            )
+            if stock_buffer is not None:
+                stock_buffer.stock_written = product_stats.stock_changed
+
+        read_url = env_str("DATABASE_READ_URL")
+        if read_url:
+            # The replica gets its own pool; DATABASE_READ_POOL_* override the primary's pool settings
+            read_engine = create_async_engine(read_url, **_engine_options("DATABASE_READ", "DATABASE"))
+            instrument_engine(read_engine, "replica")
+            if statement_timeouts:
+                apply_statement_timeouts(read_engine)
+            AsyncReadSessionLocal = async_sessionmaker(read_engine, class_=AsyncSession, expire_on_commit=False)
 
 def get_session_factory() -> async_sessionmaker[AsyncSession]:
     """Get the session factory (ensures database is initialized first)"""
@@ -37,18 +175,104 @@ async def create_db_session() -> AsyncGenerator[AsyncSession, None]:
     async with session_factory() as session:
         yield session
 
+def get_write_queue() -> Optional[SQLiteWriter]:
+    """The SQLite writer when the production profile is on, otherwise None (sessions write themselves)"""
+    get_session_factory()
+    return write_queue
+
+def get_stock_buffer() -> Optional[StockWriteBehind]:
+    """The write-behind buffer for stock changes when it is enabled, otherwise None (stock is written at once)"""
+    get_session_factory()
+    return stock_buffer
+
+def get_product_stats() -> Optional[ProductStats]:
+    """The in-memory inventory aggregates when they are enabled, otherwise None (computed by a query on demand)"""
+    get_session_factory()
+    return product_stats
+
+async def create_read_db_session() -> AsyncGenerator[Optional[AsyncSession], None]:
+    """Create a session on the read replica, or yield None when no replica is configured"""
+    get_session_factory()
+    if AsyncReadSessionLocal is None:
+        yield None
+        return
+    # No connection is checked out until the first query, so requests that only write cost nothing here
+    async with AsyncReadSessionLocal() as session:
+        yield session
+
+async def prewarm_pool(pool_engine: AsyncEngine) -> None:
+    """Open as many connections as the pool keeps (none for pools that do not keep any) and return them to it"""
+    size = getattr(pool_engine.pool, "size", None)
+    count = size() if callable(size) else 0
+    if count <= 0:
+        return
+    results = await asyncio.gather(*(pool_engine.connect().start() for _ in range(count)), return_exceptions=True)
+    for result in results:
+        if not isinstance(result, BaseException):
+            await result.close()
+    errors = [result for result in results if isinstance(result, BaseException)]
+    if errors:
+        raise errors[0]
+
+def _forget_engines_after_fork() -> None:
+    """
+    In a child forked from a process that already had engines (e.g. a pre-loading process manager): drop them
+    without closing the parent's connections, so the child creates its own engines and pools
+    """
+    global engine, AsyncSessionLocal, read_engine, AsyncReadSessionLocal, write_queue, sequence_engine
+    global stock_buffer, product_stats
+    for inherited in (engine, read_engine, sequence_engine):
+        if inherited is not None:
+            inherited.sync_engine.dispose(close=False)
+    forget_engines()
+    engine = AsyncSessionLocal = read_engine = AsyncReadSessionLocal = write_queue = sequence_engine = None
+    stock_buffer = product_stats = None
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_engines_after_fork)
+
+async def setup_schema(schema_engine: AsyncEngine) -> None:
+    """Set up the tables, the full-text index and the change sequence; every step is idempotent"""
+    await ensure_schema(schema_engine)
+    await setup_search_index(schema_engine)
+    await setup_change_sequence(schema_engine)
+
 @asynccontextmanager
 async def database_lifespan(app: FastAPI):
     """Manage database lifecycle: setup on startup, cleanup on shutdown"""
+    global engine, AsyncSessionLocal, read_engine, AsyncReadSessionLocal, write_queue, sequence_engine
+    global stock_buffer, product_stats
+
     # Startup: Initialize database and create tables
     setup_database_engine()
     assert engine is not None
 
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    # Only the primary: a replica receives the schema through replication
+    await setup_schema(engine)
+    if env_flag("DATABASE_POOL_PREWARM"):
+        # Before the app accepts requests, so the first ones do not wait for connections to be opened
+        await prewarm_pool(engine)
+        if read_engine:
+            await prewarm_pool(read_engine)
+    if product_stats:
+        await product_stats.start()
 
     yield  # FastAPI runs here
 
-    # Shutdown: Clean up database connections
+    # Shutdown: write the buffered stock changes (through the writer, so before it closes), then clean up connections
+    if product_stats:
+        await product_stats.close()
+    if stock_buffer:
+        await stock_buffer.close()
+    if write_queue:
+        await write_queue.close()
     if engine:
         await engine.dispose()
+    if read_engine:
+        await read_engine.dispose()
+    if sequence_engine:
+        await sequence_engine.dispose()
+    forget_engines()
+    # A restarted app (benchmarks, tests) builds its engines from the environment again
+    engine = AsyncSessionLocal = read_engine = AsyncReadSessionLocal = write_queue = sequence_engine = None
+    stock_buffer = product_stats = None
@@ -0,0 +1,92 @@
+"""
+Request deadlines for SQL statements.
+
+The API sets a deadline (a `time.monotonic()` instant) for each admitted request; `apply_statement_timeouts`
+makes every statement the request runs give up once it passes, instead of holding a connection for a client
+that has already been told to retry:
+- SQLite: a progress handler interrupts the running statement
+- MySQL: SELECTs get a `MAX_EXECUTION_TIME` hint from the remaining time (the server cannot bound writes)
+- any dialect: no statement is started after the deadline
+
+Statements that fail past the deadline raise `DeadlineExceededError`.
+"""
+from contextvars import ContextVar, Token
+from typing import Optional
+import re
+import time
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+# SQLite VM instructions between two deadline checks
+_PROGRESS_INTERVAL = 10000
+_SELECT = re.compile(r"^\s*SELECT\b", re.IGNORECASE)
+_DEADLINE = "statement_deadline"
+
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceededError(Exception):
+    """The request ran out of time while (or before) talking to the database"""
+
+
+def set_deadline(deadline: Optional[float]) -> Token:
+    return _deadline.set(deadline)
+
+
+def reset_deadline(token: Token) -> None:
+    _deadline.reset(token)
+
+
+def remaining_time() -> Optional[float]:
+    """Seconds left until the current request's deadline, or None when it has none"""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def apply_statement_timeouts(engine: AsyncEngine) -> None:
+    """Bound the statements run on the engine by the deadline of the request that runs them"""
+    sync_engine = engine.sync_engine
+    dialect = engine.dialect.name
+
+    if dialect == "sqlite":
+        @event.listens_for(sync_engine, "connect")
+        def _install_progress_handler(dbapi_connection, connection_record):
+            # Mutable, per connection: set before each statement, read by the driver thread while it runs
+            holder = connection_record.info[_DEADLINE] = [None]
+
+            def interrupt_after_deadline() -> int:
+                deadline = holder[0]
+                return 1 if deadline is not None and time.monotonic() > deadline else 0
+
+            dbapi_connection.run_async(
+                lambda connection: connection.set_progress_handler(interrupt_after_deadline, _PROGRESS_INTERVAL)
+            )
+
+    @event.listens_for(sync_engine, "before_cursor_execute", retval=True)
+    def _bound_statement(conn, cursor, statement, parameters, context, executemany):
+        deadline = _deadline.get()
+        holder = conn.info.get(_DEADLINE)
+        if holder is not None:
+            holder[0] = deadline
+        if deadline is None:
+            return statement, parameters
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceededError("Request deadline exceeded before the statement was sent")
+        if dialect == "mysql" and _SELECT.match(statement):
+            statement = _SELECT.sub(f"SELECT /*+ MAX_EXECUTION_TIME({max(int(remaining * 1000), 1)}) */", statement, 1)
+        return statement, parameters
+
+    # Chained (returns the replacement) so that the other error handlers, e.g. the instrumentation's, still run
+    @event.listens_for(sync_engine, "handle_error", retval=True)
+    def _deadline_error(exception_context):
+        # Interrupted (SQLite) or killed (MySQL 3024) statements surface as driver errors
+        if isinstance(exception_context.original_exception, DeadlineExceededError):
+            return None
+        deadline = _deadline.get()
+        if deadline is not None and time.monotonic() > deadline:
+            error = DeadlineExceededError("Request deadline exceeded")
+            error.__cause__ = exception_context.original_exception
+            return error
+        return None
@@ -0,0 +1,120 @@
+import asyncio
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple, Union
+
+from .product_repository import ProductRepository
+from ...domain.models import Product, ProductTombstone
+from ...domain.pagination import Cursor
+from ...domain.product_query import ProductQuery
+from .product_stats import InventoryTotals
+
+
+class BatchingProductRepository(ProductRepository):
+    """
+    DataLoader-style batching of `get_by_id` in front of another ProductRepository.
+
+    `get_by_id` calls made in the same event-loop tick (e.g. from `asyncio.gather`) are merged into one
+    `get_many` query, dispatched once the tick's other callbacks have run. As a bonus, concurrent lookups
+    no longer use the session concurrently, which AsyncSession does not allow.
+    Every other method is passed through unchanged.
+    """
+
+    def __init__(self, repository: ProductRepository):
+        self._repository = repository
+        self._pending: Dict[int, List[asyncio.Future]] = {}
+        # The loop only keeps weak references to tasks
+        self._loading = set()
+
+    def reads_from_replica(self) -> bool:
+        return self._repository.reads_from_replica()
+
+    async def create(self, product: Product) -> Product:
+        return await self._repository.create(product)
+
+    async def create_many(self, rows: List[dict]) -> List[Product]:
+        return await self._repository.create_many(rows)
+
+    async def get_by_id(self, product_id: int) -> Optional[Product]:
+        loop = asyncio.get_running_loop()
+        if not self._pending:
+            loop.call_soon(self._dispatch)
+        future = loop.create_future()
+        self._pending.setdefault(product_id, []).append(future)
+        return await future
+
+    def _dispatch(self) -> None:
+        batch, self._pending = self._pending, {}
+        task = asyncio.get_running_loop().create_task(self._load(batch))
+        self._loading.add(task)
+        task.add_done_callback(self._loading.discard)
+
+    async def _load(self, batch: Dict[int, List[asyncio.Future]]) -> None:
+        try:
+            products = {product.id: product for product in await self._repository.get_many(list(batch))}
+        except BaseException as e:
+            for futures in batch.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+            return
+        for product_id, futures in batch.items():
+            for future in futures:
+                # A caller may have been cancelled while the batch was loading
+                if not future.done():
+                    future.set_result(products.get(product_id))
+
+    async def get_many(self, product_ids: List[int], columns: Optional[Sequence[str]] = None) -> List[Product]:
+        return await self._repository.get_many(product_ids, columns)
+
+    async def get_versions(self, product_ids: List[int]) -> Dict[int, Optional[datetime]]:
+        return await self._repository.get_versions(product_ids)
+
+    async def get_catalog_version(self) -> int:
+        return await self._repository.get_catalog_version()
+
+    async def get_inventory_totals(self, low_stock_threshold: int) -> InventoryTotals:
+        return await self._repository.get_inventory_totals(low_stock_threshold)
+
+    async def get_all(self) -> List[Product]:
+        return await self._repository.get_all()
+
+    async def query(
+        self,
+        criteria: ProductQuery,
+        limit: int,
+        after: Optional[Cursor] = None,
+        columns: Optional[Sequence[str]] = None,
+    ) -> List[Product]:
+        return await self._repository.query(criteria, limit, after, columns)
+
+    async def search_by_name(self, name: str, limit: int, columns: Optional[Sequence[str]] = None) -> List[Product]:
+        return await self._repository.search_by_name(name, limit, columns)
+
+    def stream_all(self, batch_size: int) -> AsyncIterator[List[Product]]:
+        return self._repository.stream_all(batch_size)
+
+    async def get_changes(self, after: Optional[Cursor], limit: int) -> List[Union[Product, ProductTombstone]]:
+        return await self._repository.get_changes(after, limit)
+
+    async def update(self, product: Product) -> Product:
+        return await self._repository.update(product)
+
+    async def update_fields(self, product_id: int, values: dict) -> Optional[Product]:
+        return await self._repository.update_fields(product_id, values)
+
+    async def update_many(self, rows: List[dict]) -> List[Product]:
+        return await self._repository.update_many(rows)
+
+    async def adjust_stock(self, deltas: Dict[int, int], updated_by: str) -> Optional[Dict[int, int]]:
+        return await self._repository.adjust_stock(deltas, updated_by)
+
+    async def get_stock_levels(self, product_ids: List[int]) -> Dict[int, int]:
+        return await self._repository.get_stock_levels(product_ids)
+
+    async def delete(self, product_id: int) -> bool:
+        return await self._repository.delete(product_id)
+
+    async def delete_many(self, product_ids: List[int]) -> List[int]:
+        return await self._repository.delete_many(product_ids)
@@ -0,0 +1,155 @@
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple, Union
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+
+from .product_repository import ProductRepository
+from ..cache import CacheBackend
+from ...domain.assembler.product_assembler import ProductAssembler
+from ...domain.dtos import ProductDetailDTO
+from ...domain.models import Product, ProductTombstone
+from ...domain.pagination import Cursor
+from ...domain.product_query import ProductQuery
+from .product_stats import InventoryTotals
+
+
+class CachedProductRepository(ProductRepository):
+    """
+    Read-through cache for `get_by_id` in front of another ProductRepository.
+
+    Entries are stored as ProductDetailDTO, so any backend (including a shared, serializing one) can hold them.
+    Every write invalidates the ids it touched once the inner repository has committed; a row read before that
+    is not cached afterwards. The in-process backend only sees the writes of its own process, so with several
+    workers use a shared one (the production entrypoint turns PRODUCT_CACHE_ENABLED off for several workers).
+    """
+
+    def __init__(self, repository: ProductRepository, cache: CacheBackend, db: AsyncSession):
+        self._repository = repository
+        self._cache = cache
+        self.db = db
+
+    def reads_from_replica(self) -> bool:
+        return self._repository.reads_from_replica()
+
+    async def create(self, product: Product) -> Product:
+        return await self._repository.create(product)
+
+    async def create_many(self, rows: List[dict]) -> List[Product]:
+        return await self._repository.create_many(rows)
+
+    async def get_by_id(self, product_id: int) -> Optional[Product]:
+        cached = await self._cache.get(product_id)
+        if cached is not None:
+            return await self._attach(cached)
+
+        generation = await self._cache.generation()
+        product = await self._repository.get_by_id(product_id)
+        if product is not None:
+            await self._cache.set(product_id, ProductAssembler.to_detail_dto(product), generation)
+        return product
+
+    async def get_many(self, product_ids: List[int], columns: Optional[Sequence[str]] = None) -> List[Product]:
+        products: List[Product] = []
+        missing = []
+        for product_id in dict.fromkeys(product_ids):
+            cached = await self._cache.get(product_id)
+            if cached is not None:
+                products.append(await self._attach(cached))
+            else:
+                missing.append(product_id)
+        if missing:
+            generation = await self._cache.generation()
+            loaded = await self._repository.get_many(missing, columns)
+            # Partially loaded rows cannot be cached as a ProductDetailDTO
+            if columns is None:
+                for product in loaded:
+                    await self._cache.set(product.id, ProductAssembler.to_detail_dto(product), generation)
+            products.extend(loaded)
+        return products
+
+    async def _attach(self, cached: ProductDetailDTO) -> Product:
+        # Attach the cached state to the session without a SELECT, so callers can still modify and save it
+        product = ProductAssembler.from_detail_dto(cached)
+        make_transient_to_detached(product)
+        return await self.db.merge(product, load=False)
+
+    async def get_versions(self, product_ids: List[int]) -> Dict[int, Optional[datetime]]:
+        # Cached entries carry updated_at, so conditional GETs of hot products never reach the database.
+        # Not counted in the cache stats: the product itself is looked up next unless it was not modified
+        versions: Dict[int, Optional[datetime]] = {}
+        missing = []
+        for product_id in product_ids:
+            cached = await self._cache.get(product_id, count=False)
+            if cached is not None:
+                versions[product_id] = cached.updated_at
+            else:
+                missing.append(product_id)
+        if missing:
+            versions.update(await self._repository.get_versions(missing))
+        return versions
+
+    async def get_catalog_version(self) -> int:
+        return await self._repository.get_catalog_version()
+
+    async def get_inventory_totals(self, low_stock_threshold: int) -> InventoryTotals:
+        return await self._repository.get_inventory_totals(low_stock_threshold)
+
+    async def get_all(self) -> List[Product]:
+        return await self._repository.get_all()
+
+    async def query(
+        self,
+        criteria: ProductQuery,
+        limit: int,
+        after: Optional[Cursor] = None,
+        columns: Optional[Sequence[str]] = None,
+    ) -> List[Product]:
+        return await self._repository.query(criteria, limit, after, columns)
+
+    async def search_by_name(self, name: str, limit: int, columns: Optional[Sequence[str]] = None) -> List[Product]:
+        return await self._repository.search_by_name(name, limit, columns)
+
+    def stream_all(self, batch_size: int) -> AsyncIterator[List[Product]]:
+        return self._repository.stream_all(batch_size)
+
+    async def get_changes(self, after: Optional[Cursor], limit: int) -> List[Union[Product, ProductTombstone]]:
+        return await self._repository.get_changes(after, limit)
+
+    async def update(self, product: Product) -> Product:
+        try:
+            return await self._repository.update(product)
+        finally:
+            await self._cache.delete(product.id)
+
+    async def update_fields(self, product_id: int, values: dict) -> Optional[Product]:
+        try:
+            return await self._repository.update_fields(product_id, values)
+        finally:
+            await self._cache.delete(product_id)
+
+    async def update_many(self, rows: List[dict]) -> List[Product]:
+        try:
+            return await self._repository.update_many(rows)
+        finally:
+            await self._cache.delete(*(row["id"] for row in rows))
+
+    async def adjust_stock(self, deltas: Dict[int, int], updated_by: str) -> Optional[Dict[int, int]]:
+        try:
+            return await self._repository.adjust_stock(deltas, updated_by)
+        finally:
+            await self._cache.delete(*deltas)
+
+    async def get_stock_levels(self, product_ids: List[int]) -> Dict[int, int]:
+        return await self._repository.get_stock_levels(product_ids)
+
+    async def delete(self, product_id: int) -> bool:
+        try:
+            return await self._repository.delete(product_id)
+        finally:
+            await self._cache.delete(product_id)
+
+    async def delete_many(self, product_ids: List[int]) -> List[int]:
+        try:
+            return await self._repository.delete_many(product_ids)
+        finally:
+            await self._cache.delete(*product_ids)
@@ -0,0 +1,147 @@
+"""
+Sequence numbers for the product change feed.
+
+Every write stamps the next value of the `products` counter in `change_sequences` on the rows it inserts or
+updates (`change_seq`) and on the tombstones of the rows it deletes. A consumer that has read up to N must
+never miss a later commit with a number <= N:
+
+- SQLite runs one write at a time anyway: the write takes the number in its own transaction, which keeps the
+  counter row locked until it ends, so numbers become visible in commit order.
+- Other databases run writes side by side, and holding the counter row for a whole write would serialize them.
+  The number is taken in a short transaction of its own, which also records it as an open lease in
+  `change_seq_leases`; the write deletes its lease when it commits. Readers stop before the oldest open lease
+  (`change_horizon`).
+"""
+from datetime import datetime, timedelta
+from typing import Optional, Union
+import logging
+
+from sqlalchemy import select, insert, update, delete, func
+from sqlalchemy.engine import Dialect
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession
+
+from ...domain.models import ChangeSeqLease, ChangeSequence, Product, ProductTombstone
+from ...settings import env_float
+
+logger = logging.getLogger(__name__)
+
+PRODUCT_SEQUENCE = "products"
+# Session info key of the engine that takes leases; without it they are taken on the session's engine
+SEQUENCE_ENGINE = "change_seq_engine"
+# Every this many numbers, the lease transaction also deletes the leases that timed out
+LEASE_PRUNE_INTERVAL = 1000
+
+_LEASES = "change_seq_leases"
+
+
+def uses_leases(dialect: Dialect) -> bool:
+    """Whether writes on this database take their sequence number outside their own transaction"""
+    return dialect.name != "sqlite"
+
+
+def lease_timeout() -> timedelta:
+    """How long an open lease holds readers back; consumers can miss a write that takes longer to commit"""
+    return timedelta(seconds=env_float("CHANGE_FEED_LEASE_SECONDS", 60.0))
+
+
+async def setup_change_sequence(engine: AsyncEngine) -> None:
+    """
+    Create the counter row if it does not exist yet, starting after any sequence number already used.
+    Safe to run from several processes at once: one that loses the race finds the row created by the winner.
+    """
+    try:
+        async with engine.begin() as conn:
+            if await _sequence_exists(conn):
+                return
+            used = await conn.scalar(select(func.max(Product.change_seq)))
+            deleted = await conn.scalar(select(func.max(ProductTombstone.change_seq)))
+            await conn.execute(insert(ChangeSequence).values(name=PRODUCT_SEQUENCE, value=max(used or 0, deleted or 0)))
+    except DBAPIError:
+        # Duplicate key, or a lock conflict (SQLite), when another process created it at the same time
+        async with engine.connect() as conn:
+            if not await _sequence_exists(conn):
+                raise
+        logger.debug("Change sequence %s already created", PRODUCT_SEQUENCE)
+
+
+async def _sequence_exists(conn: AsyncConnection) -> bool:
+    value = await conn.scalar(select(ChangeSequence.value).where(ChangeSequence.name == PRODUCT_SEQUENCE))
+    return value is not None
+
+
+async def current_change_seq(session: AsyncSession) -> int:
+    """The last sequence number readers may see: it moves with every committed write of a product, in any process"""
+    horizon = await change_horizon(session)
+    return horizon if horizon is not None else await _counter_value(session)
+
+
+async def change_horizon(session: AsyncSession) -> Optional[int]:
+    """
+    The highest sequence number readers may return: every write with a number up to it has committed or
+    rolled back. None on SQLite, where numbers never become visible out of order
+    """
+    if not uses_leases(session.bind.dialect):
+        return None
+    # The counter first: a lease up to the value read was recorded before it, so the next query sees it if open
+    taken = await _counter_value(session)
+    oldest = await session.scalar(
+        select(func.min(ChangeSeqLease.seq)).where(ChangeSeqLease.taken_at > datetime.now() - lease_timeout())
+    )
+    return taken if oldest is None else min(taken, oldest - 1)
+
+
+async def _counter_value(session: AsyncSession) -> int:
+    value = await session.scalar(select(ChangeSequence.value).where(ChangeSequence.name == PRODUCT_SEQUENCE))
+    return value or 0
+
+
+async def next_change_seq(session: AsyncSession) -> int:
+    """Take the next sequence number for the write in the session's transaction"""
+    if not uses_leases(session.bind.dialect):
+        return await _take(session, session.bind.dialect)
+
+    # On a connection of its own and committed at once, so the counter row is locked only for this short
+    # transaction; leases therefore become visible in the order of their numbers
+    async with session.info.get(SEQUENCE_ENGINE, session.bind).begin() as conn:
+        seq = await _take(conn, conn.dialect)
+        taken_at = datetime.now()
+        await conn.execute(insert(ChangeSeqLease).values(seq=seq, taken_at=taken_at))
+        if seq % LEASE_PRUNE_INTERVAL == 0:
+            # Left behind by processes that died in the middle of a write
+            await conn.execute(delete(ChangeSeqLease).where(ChangeSeqLease.taken_at < taken_at - lease_timeout()))
+    session.info.setdefault(_LEASES, []).append(seq)
+    # Locks only this lease, and is committed together with the write
+    await session.execute(
+        delete(ChangeSeqLease).where(ChangeSeqLease.seq == seq).execution_options(synchronize_session=False)
+    )
+    return seq
+
+
+async def _take(executor: Union[AsyncSession, AsyncConnection], dialect: Dialect) -> int:
+    """Increment the counter in the transaction of `executor` and return the new value"""
+    statement = (
+        update(ChangeSequence)
+        .where(ChangeSequence.name == PRODUCT_SEQUENCE)
+        .values(value=ChangeSequence.value + 1)
+        .execution_options(synchronize_session=False)
+    )
+    if dialect.update_returning:
+        return await executor.scalar(statement.returning(ChangeSequence.value))
+    # No RETURNING (MySQL): the row is locked by our UPDATE, so reading it back is consistent
+    await executor.execute(statement)
+    return await executor.scalar(select(ChangeSequence.value).where(ChangeSequence.name == PRODUCT_SEQUENCE))
+
+
+async def release_change_seqs(session: AsyncSession) -> None:
+    """After the session's transaction rolled back: delete the leases it took, so readers stop waiting for them"""
+    leases = session.info.pop(_LEASES, None)
+    if not leases:
+        return
+    async with session.info.get(SEQUENCE_ENGINE, session.bind).begin() as conn:
+        await conn.execute(delete(ChangeSeqLease).where(ChangeSeqLease.seq.in_(leases)))
+
+
+def forget_change_seqs(session: AsyncSession) -> None:
+    """After the session's transaction committed: its leases were deleted with it"""
+    session.info.pop(_LEASES, None)
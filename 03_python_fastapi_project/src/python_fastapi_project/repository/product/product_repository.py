@@ -1,26 +1,123 @@
 from abc import ABC, abstractmethod
-from typing import List, Optional
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple, Union
 
-from src.python_fastapi_project.domain.models import Product
+from src.python_fastapi_project.domain.models import Product, ProductTombstone
+from src.python_fastapi_project.domain.pagination import Cursor
+from src.python_fastapi_project.domain.product_query import ProductQuery
+from src.python_fastapi_project.repository.product.product_stats import InventoryTotals
 
 
 class ProductRepository(ABC):
+    @abstractmethod
+    def reads_from_replica(self) -> bool:
+        """Whether plain reads go to the read replica now (never once the request has written)"""
+        pass
+
     @abstractmethod
     async def create(self, product: Product) -> Product:
         pass
 
+    @abstractmethod
+    async def create_many(self, rows: List[dict]) -> List[Product]:
+        """Insert all rows in one transaction and return the created products in input order"""
+        pass
+
     @abstractmethod
     async def get_by_id(self, product_id: int) -> Optional[Product]:
         pass
 
+    @abstractmethod
+    async def get_many(self, product_ids: List[int], columns: Optional[Sequence[str]] = None) -> List[Product]:
+        """
+        Return the given products that exist, in no particular order, with one `IN` query per chunk of ids.
+        If `columns` is given only those columns are loaded.
+        """
+        pass
+
+    @abstractmethod
+    async def get_versions(self, product_ids: List[int]) -> Dict[int, Optional[datetime]]:
+        """Return `updated_at` of the given products that exist, without loading the rows"""
+        pass
+
+    @abstractmethod
+    async def get_catalog_version(self) -> int:
+        """Return a number that changes with every committed product write (one primary key lookup)"""
+        pass
+
+    @abstractmethod
+    async def get_inventory_totals(self, low_stock_threshold: int) -> InventoryTotals:
+        """Return the inventory aggregates of the whole catalog in one aggregate query"""
+        pass
+
     @abstractmethod
     async def get_all(self) -> List[Product]:
         pass
 
+    @abstractmethod
+    async def query(
+        self,
+        criteria: ProductQuery,
+        limit: int,
+        after: Optional[Cursor] = None,
+        columns: Optional[Sequence[str]] = None,
+    ) -> List[Product]:
+        """
+        Return up to `limit` products matching `criteria`, ordered by its sort column and id, starting after
+        the given cursor. If `columns` is given only those columns are loaded; reading any other attribute is an error.
+        """
+        pass
+
+    @abstractmethod
+    async def search_by_name(self, name: str, limit: int, columns: Optional[Sequence[str]] = None) -> List[Product]:
+        """Return up to `limit` products whose name contains `name`, best matches first, loading only `columns` if given"""
+        pass
+
+    @abstractmethod
+    def stream_all(self, batch_size: int) -> AsyncIterator[List[Product]]:
+        """Yield all products ordered by id, `batch_size` rows at a time, without loading the whole table"""
+        pass
+
+    @abstractmethod
+    async def get_changes(self, after: Optional[Cursor], limit: int) -> List[Union[Product, ProductTombstone]]:
+        """
+        Return up to `limit` products written and tombstones of products deleted after the cursor,
+        ordered by (change_seq, product id). Every call sees the latest commits, so it can be polled.
+        """
+        pass
+
     @abstractmethod
     async def update(self, product: Product) -> Product:
         pass
 
+    @abstractmethod
+    async def update_fields(self, product_id: int, values: dict) -> Optional[Product]:
+        """Write only the given columns in a single UPDATE and return the updated product, or None if not found"""
+        pass
+
+    @abstractmethod
+    async def update_many(self, rows: List[dict]) -> List[Product]:
+        """Apply each row (which must contain `id`) in one transaction; return the products that existed"""
+        pass
+
+    @abstractmethod
+    async def adjust_stock(self, deltas: Dict[int, int], updated_by: str) -> Optional[Dict[int, int]]:
+        """
+        Atomically add each delta to the product's stock, all or nothing, never letting stock go below zero.
+        Return the new stock per product id, or None (and change nothing) if any product is missing or short.
+        """
+        pass
+
+    @abstractmethod
+    async def get_stock_levels(self, product_ids: List[int]) -> Dict[int, int]:
+        """Return the current stock of the given products that exist"""
+        pass
+
     @abstractmethod
     async def delete(self, product_id: int) -> bool:
         pass
+
+    @abstractmethod
+    async def delete_many(self, product_ids: List[int]) -> List[int]:
+        """Delete the given products in one transaction and return the ids that existed"""
+        pass
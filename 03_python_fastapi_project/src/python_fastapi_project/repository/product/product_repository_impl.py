@@ -1,37 +1,596 @@
-from typing import List, Optional
+from decimal import Decimal
+from datetime import datetime
+from itertools import islice
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple, TypeVar, Union
+import heapq
+import operator
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy.orm import load_only
+from sqlalchemy import Select, inspect, select, insert, update, delete, and_, or_, asc, desc, case, func, literal_column, text, column, table
 
 from .product_repository import ProductRepository
-from ...domain.models.product import Product
+from ..database import has_written, mark_written
+from ..sqlite import SQLiteWriter
+from . import product_search
+from .product_changes import (
+    change_horizon,
+    current_change_seq,
+    forget_change_seqs,
+    next_change_seq,
+    release_change_seqs,
+)
+from .product_stats import InventoryTotals, ProductStats, inventory_totals
+from ...domain.models import Product, ProductTombstone
+from ...domain.pagination import Cursor, InvalidCursorError
+from ...domain.product_query import ProductQuery
+
+# Rows per multi-row statement in the bulk methods; keeps bound parameters well below driver limits
+BULK_CHUNK_SIZE = 500
+
+T = TypeVar("T")
+
+_SORT_COLUMNS = {
+    "id": Product.id,
+    "name": Product.name,
+    "price": Product.price,
+    "updated_at": Product.updated_at,
+}
+
+class _StockShortage(Exception):
+    """Raised inside a stock write to roll it back when a product is missing or short"""
+
 
 class ProductRepositoryImpl(ProductRepository):
-    def __init__(self, db: AsyncSession):
+    def __init__(
+        self,
+        db: AsyncSession,
+        read_db: Optional[AsyncSession] = None,
+        write_queue: Optional[SQLiteWriter] = None,
+        product_stats: Optional[ProductStats] = None,
+    ):
         self.db = db
+        self.read_db = read_db
+        self.write_queue = write_queue
+        # Updated after every committed write, from the values the write read or returned in its transaction
+        self.product_stats = product_stats
+
+    @property
+    def _reader(self) -> AsyncSession:
+        """
+        Session for plain reads: the read replica if there is one, unless this request has already written
+        through the primary (then reads stay there, so they see their own writes).
+        Writes, and reads that decide a write, always use `self.db`.
+        """
+        if self.read_db is None or has_written(self.db):
+            return self.db
+        return self.read_db
+
+    def reads_from_replica(self) -> bool:
+        return self._reader is not self.db
+
+    async def _write(self, work: Callable[[AsyncSession], Awaitable[T]]) -> T:
+        """
+        Run `work(session)` as one transaction: on the request session, or through the SQLite writer's
+        group commit when the SQLite production profile is on. `work` never commits itself.
+        """
+        if self.write_queue is not None:
+            try:
+                result = await self.write_queue.submit(work)
+            finally:
+                mark_written(self.db)
+            await self._end_read_transaction()
+            return result
+        try:
+            result = await work(self.db)
+            await self.db.commit()
+        except Exception:
+            await self.db.rollback()
+            await release_change_seqs(self.db)
+            raise
+        forget_change_seqs(self.db)
+        return result
+
+    async def _end_read_transaction(self) -> None:
+        """
+        After a write committed by the SQLite writer: end the request session's transaction, so its next read
+        starts a new snapshot that includes the write. Its objects are detached first, keeping their values
+        (rolling back would expire them, and any change to them was carried over to the writer's session).
+        """
+        if self.db.in_transaction():
+            self.db.expunge_all()
+            await self.db.rollback()
 
     async def create(self, product: Product) -> Product:
-        self.db.add(product)
-        await self.db.commit()
-        await self.db.refresh(product)
-        return product
+        async def work(session: AsyncSession) -> Product:
+            product.change_seq = await next_change_seq(session)
+            session.add(product)
+            await session.flush()
+            await session.refresh(product)
+            return product
+
+        created = await self._write(work)
+        if self.product_stats is not None:
+            self.product_stats.added(created.price, created.stock)
+        return created
+
+    async def create_many(self, rows: List[dict]) -> List[Product]:
+        async def work(session: AsyncSession) -> List[Product]:
+            created: List[Product] = []
+            change_seq = await next_change_seq(session)
+            rows_with_seq = [{**row, "change_seq": change_seq} for row in rows]
+            if session.bind.dialect.insert_executemany_returning:
+                for chunk in _chunks(rows_with_seq):
+                    result = await session.scalars(
+                        insert(Product).returning(Product, sort_by_parameter_order=True), chunk
+                    )
+                    created.extend(result.all())
+            else:
+                # No multi-row RETURNING (e.g. MySQL): let the unit of work batch the INSERTs
+                for chunk in _chunks(rows_with_seq):
+                    products = [Product(**row) for row in chunk]
+                    session.add_all(products)
+                    await session.flush()
+                    created.extend(products)
+            return created
+
+        created = await self._write(work)
+        if self.product_stats is not None:
+            for product in created:
+                self.product_stats.added(product.price, product.stock)
+        return created
 
     async def get_by_id(self, product_id: int) -> Optional[Product]:
-        result = await self.db.execute(select(Product).where(Product.id == product_id))
+        result = await self._reader.execute(select(Product).where(Product.id == product_id))
         return result.scalar_one_or_none()
 
+    async def get_many(self, product_ids: List[int], columns: Optional[Sequence[str]] = None) -> List[Product]:
+        products: List[Product] = []
+        for chunk in _chunks(list(dict.fromkeys(product_ids))):
+            query = self._project(select(Product).where(Product.id.in_(chunk)), columns)
+            result = await self._reader.scalars(query)
+            products.extend(result.all())
+        return products
+
+    async def get_versions(self, product_ids: List[int]) -> Dict[int, Optional[datetime]]:
+        result = await self._reader.execute(select(Product.id, Product.updated_at).where(Product.id.in_(product_ids)))
+        return {row.id: row.updated_at for row in result}
+
+    async def get_catalog_version(self) -> int:
+        return await current_change_seq(self._reader)
+
+    async def get_inventory_totals(self, low_stock_threshold: int) -> InventoryTotals:
+        return await inventory_totals(self._reader, low_stock_threshold)
+
     async def get_all(self) -> List[Product]:
-        result = await self.db.execute(select(Product))
+        result = await self._reader.execute(select(Product))
         return result.scalars().all()
 
+    async def query(
+        self,
+        criteria: ProductQuery,
+        limit: int,
+        after: Optional[Cursor] = None,
+        columns: Optional[Sequence[str]] = None,
+    ) -> List[Product]:
+        products: List[Product] = []
+        for statement in build_product_queries(criteria, after):
+            result = await self._reader.execute(self._project(statement, columns).limit(limit - len(products)))
+            products.extend(result.scalars().all())
+            if len(products) >= limit:
+                break
+        return products
+
+    async def search_by_name(self, name: str, limit: int, columns: Optional[Sequence[str]] = None) -> List[Product]:
+        term = name.strip()
+        if not term:
+            return []
+
+        dialect = self._reader.bind.dialect.name
+        if len(term) >= product_search.MIN_FULLTEXT_TERM_LENGTH and product_search.fulltext_enabled(dialect):
+            if dialect == "sqlite":
+                query = self._sqlite_fulltext_query(term)
+            else:
+                query = self._mysql_fulltext_query(term)
+        else:
+            query = self._like_query(term)
+
+        result = await self._reader.execute(self._project(query, columns).limit(limit))
+        return result.scalars().all()
+
+    async def stream_all(self, batch_size: int) -> AsyncIterator[List[Product]]:
+        # yield_per makes the driver use a server-side cursor and fetch rows in batches
+        query = select(Product).order_by(Product.id).execution_options(yield_per=batch_size)
+        session = self._reader
+        result = await session.stream_scalars(query)
+        async for batch in result.partitions(batch_size):
+            yield batch
+            # Drop the batch from the identity map so memory stays flat over the whole export
+            for product in batch:
+                session.expunge(product)
+
+    async def get_changes(self, after: Optional[Cursor], limit: int) -> List[Union[Product, ProductTombstone]]:
+        products_query = select(Product).order_by(Product.change_seq, Product.id).limit(limit)
+        tombstones_query = (
+            select(ProductTombstone).order_by(ProductTombstone.change_seq, ProductTombstone.product_id).limit(limit)
+        )
+        if after is not None:
+            change_seq = self._change_seq(after)
+            products_query = products_query.where(or_(
+                Product.change_seq > change_seq,
+                and_(Product.change_seq == change_seq, Product.id > after.id),
+            ))
+            tombstones_query = tombstones_query.where(or_(
+                ProductTombstone.change_seq > change_seq,
+                and_(ProductTombstone.change_seq == change_seq, ProductTombstone.product_id > after.id),
+            ))
+
+        # A short-lived session of its own: every poll gets a fresh transaction (not a REPEATABLE READ snapshot
+        # from an earlier one), and the caller's session and transaction are left alone
+        async with AsyncSession(self._reader.bind) as session:
+            horizon = await change_horizon(session)
+            if horizon is not None:
+                # Writes with higher numbers may commit before ones with lower numbers that are still running
+                products_query = products_query.where(Product.change_seq <= horizon)
+                tombstones_query = tombstones_query.where(ProductTombstone.change_seq <= horizon)
+            products = (await session.scalars(products_query)).all()
+            tombstones = (await session.scalars(tombstones_query)).all()
+
+        changes = heapq.merge(products, tombstones, key=_change_position)
+        return list(islice(changes, limit))
+
+    @staticmethod
+    def _change_seq(cursor: Cursor) -> int:
+        try:
+            return int(cursor.value)
+        except (TypeError, ValueError) as e:
+            raise InvalidCursorError("Invalid change feed cursor") from e
+
+    @staticmethod
+    def _project(query, columns: Optional[Sequence[str]]):
+        if not columns:
+            return query
+        try:
+            attributes = [getattr(Product, name) for name in columns]
+        except AttributeError as e:
+            raise ValueError(f"Unknown product column: {e.name}") from e
+        return query.options(load_only(*attributes))
+
+    @staticmethod
+    def _sqlite_fulltext_query(term: str):
+        fts = table(product_search.FTS_TABLE, column("rowid"))
+        return (
+            select(Product)
+            .join(fts, fts.c.rowid == Product.id)
+            .where(text(f"{product_search.FTS_TABLE} MATCH :term").bindparams(term=product_search.fts5_phrase(term)))
+            .order_by(literal_column(f"bm25({product_search.FTS_TABLE})"), Product.id)
+        )
+
+    @staticmethod
+    def _mysql_fulltext_query(term: str):
+        score = text("MATCH (products.name) AGAINST (:term IN BOOLEAN MODE)").bindparams(
+            term=product_search.mysql_boolean_phrase(term)
+        )
+        return select(Product).where(score).order_by(score.desc(), Product.id)
+
+    @staticmethod
+    def _like_query(term: str):
+        # Rank exact matches first, then prefix matches, then shorter names
+        lowered = term.lower()
+        rank = case(
+            (func.lower(Product.name) == lowered, 0),
+            (func.lower(Product.name).startswith(lowered, autoescape=True), 1),
+            else_=2,
+        )
+        return (
+            select(Product)
+            .where(Product.name.ilike(product_search.like_pattern(term), escape="\\"))
+            .order_by(rank, func.length(Product.name), Product.id)
+        )
+
     async def update(self, product: Product) -> Product:
-        await self.db.commit()
-        await self.db.refresh(product)
-        return product
+        async def work(session: AsyncSession) -> Product:
+            # Loaded through another session (read replica, SQLite writer): carry the changes over
+            target = product if product in session else await session.merge(product)
+            before = _loaded_price_and_stock(target) if self.product_stats is not None else None
+            target.change_seq = await next_change_seq(session)
+            await session.flush()
+            await session.refresh(target)
+            return target, before
+
+        updated, before = await self._write(work)
+        if self.product_stats is not None:
+            self.product_stats.changed(*before, updated.price, updated.stock)
+        return updated
+
+    async def update_fields(self, product_id: int, values: dict) -> Optional[Product]:
+        counts_stats = self._counts_stats(values)
+
+        async def work(session: AsyncSession) -> Tuple[Optional[Product], Dict[int, Tuple[Decimal, int]]]:
+            # The old values for the stats, read under the write's lock
+            before = await _price_and_stock(session, [product_id]) if counts_stats else {}
+            statement = (
+                update(Product)
+                .where(Product.id == product_id)
+                .values(**values, change_seq=await next_change_seq(session))
+            )
+            if session.bind.dialect.update_returning:
+                result = await session.scalars(
+                    statement.returning(Product).execution_options(populate_existing=True)
+                )
+                return result.one_or_none(), before
+            # No RETURNING (MySQL): detect "not found" from the rowcount, then read the row back
+            result = await session.execute(statement.execution_options(synchronize_session=False))
+            if not result.rowcount:
+                return None, before
+            updated = await session.scalar(
+                select(Product).where(Product.id == product_id).execution_options(populate_existing=True)
+            )
+            return updated, before
+
+        updated, before = await self._write(work)
+        if updated is not None and product_id in before:
+            self.product_stats.changed(*before[product_id], updated.price, updated.stock)
+        return updated
+
+    async def update_many(self, rows: List[dict]) -> List[Product]:
+        counts_stats = any(self._counts_stats(row) for row in rows)
+
+        async def work(session: AsyncSession) -> Tuple[List[Product], Dict[int, Tuple[Decimal, int]]]:
+            updated: List[Product] = []
+            before: Dict[int, Tuple[Decimal, int]] = {}
+            change_seq = await next_change_seq(session)
+            for chunk in _chunks(rows):
+                ids = list(dict.fromkeys(row["id"] for row in chunk))
+                if counts_stats:
+                    before.update(await _price_and_stock(session, ids))
+                # One UPDATE per chunk, whatever columns each row sets; the rows that do not exist are not returned
+                statement = (
+                    update(Product)
+                    .where(Product.id.in_(ids))
+                    .values(**_values_by_id(chunk), change_seq=change_seq)
+                )
+                if session.bind.dialect.update_returning:
+                    result = await session.scalars(
+                        statement.returning(Product).execution_options(populate_existing=True)
+                    )
+                else:
+                    # No RETURNING (MySQL): the rows are locked by our UPDATE, so reading them back is consistent
+                    await session.execute(statement.execution_options(synchronize_session=False))
+                    result = await session.scalars(
+                        select(Product).where(Product.id.in_(ids)).execution_options(populate_existing=True)
+                    )
+                updated.extend(result.all())
+            return updated, before
+
+        updated, before = await self._write(work)
+        for product in updated:
+            if product.id in before:
+                self.product_stats.changed(*before[product.id], product.price, product.stock)
+        return updated
+
+    async def adjust_stock(self, deltas: Dict[int, int], updated_by: str) -> Optional[Dict[int, int]]:
+        if not deltas:
+            return {}
+
+        # Single conditional UPDATE: the stock check and the write happen atomically in the database
+        if len(deltas) == 1:
+            ((product_id, delta),) = deltas.items()
+        else:
+            delta = case(deltas, value=Product.id)
+        statement = (
+            update(Product)
+            .where(Product.id.in_(list(deltas)), Product.stock + delta >= 0)
+            .values(stock=Product.stock + delta, updated_by=updated_by, updated_at=datetime.now())
+            .execution_options(synchronize_session=False)
+        )
+
+        async def work(session: AsyncSession) -> Dict[int, Tuple[Decimal, int]]:
+            statement_with_seq = statement.values(change_seq=await next_change_seq(session))
+            if session.bind.dialect.update_returning:
+                result = await session.execute(statement_with_seq.returning(Product.id, Product.price, Product.stock))
+                written = {row.id: (row.price, row.stock) for row in result}
+            else:
+                # No RETURNING (MySQL): the rows are locked by our UPDATE, so reading them back is consistent
+                result = await session.execute(statement_with_seq)
+                written = None
+                if result.rowcount == len(deltas):
+                    written = await _price_and_stock(session, list(deltas))
+
+            if written is None or len(written) != len(deltas):
+                # Undo the rows that did have enough stock: all or nothing
+                raise _StockShortage()
+            return written
+
+        try:
+            written = await self._write(work)
+        except _StockShortage:
+            return None
+        if self.product_stats is not None:
+            for product_id, (price, stock) in written.items():
+                self.product_stats.changed(price, stock - deltas[product_id], price, stock)
+        return {product_id: stock for product_id, (_, stock) in written.items()}
+
+    async def get_stock_levels(self, product_ids: List[int]) -> Dict[int, int]:
+        return await _stock_levels(self.db, product_ids)
 
     async def delete(self, product_id: int) -> bool:
-        product = await self.get_by_id(product_id)
-        if product:
-            await self.db.delete(product)
-            await self.db.commit()
-            return True
-        return False
+        async def work(session: AsyncSession) -> Optional[Tuple[Decimal, int]]:
+            product = await session.get(Product, product_id)
+            if product is None:
+                return None
+            before = (product.price, product.stock)
+            await session.delete(product)
+            session.add(ProductTombstone(product_id=product_id, change_seq=await next_change_seq(session)))
+            await session.flush()
+            return before
+
+        before = await self._write(work)
+        if before is None:
+            return False
+        if self.product_stats is not None:
+            self.product_stats.removed(*before)
+        return True
+
+    async def delete_many(self, product_ids: List[int]) -> List[int]:
+        async def work(session: AsyncSession) -> Dict[int, Tuple[Decimal, int]]:
+            deleted: Dict[int, Tuple[Decimal, int]] = {}
+            for chunk in _chunks(list(dict.fromkeys(product_ids))):
+                if session.bind.dialect.delete_returning:
+                    result = await session.execute(
+                        delete(Product).where(Product.id.in_(chunk)).returning(Product.id, Product.price, Product.stock)
+                    )
+                    deleted.update((row.id, (row.price, row.stock)) for row in result)
+                else:
+                    chunk_deleted = await _price_and_stock(session, chunk)
+                    if chunk_deleted:
+                        await session.execute(
+                            delete(Product)
+                            .where(Product.id.in_(list(chunk_deleted)))
+                            .execution_options(synchronize_session=False)
+                        )
+                    deleted.update(chunk_deleted)
+            if deleted:
+                change_seq = await next_change_seq(session)
+                await session.execute(
+                    insert(ProductTombstone),
+                    [{"product_id": product_id, "change_seq": change_seq} for product_id in deleted],
+                )
+            return deleted
+
+        deleted = await self._write(work)
+        if self.product_stats is not None:
+            for before in deleted.values():
+                self.product_stats.removed(*before)
+        return list(deleted)
+
+    def _counts_stats(self, values: dict) -> bool:
+        """Whether an update with these column values changes the inventory stats kept in memory"""
+        return self.product_stats is not None and ("price" in values or "stock" in values)
+
+
+def build_product_queries(criteria: ProductQuery, after: Optional[Cursor] = None) -> List[Select]:
+    """
+    The listing queries for `criteria` (without LIMIT), read in turn until the page is full: filters pushed down
+    as WHERE clauses, and a keyset condition on (sort column, id) for the page after the cursor. Each one is a
+    single index range; after a cursor on a nullable sort column, the rows with a value and the NULLs are two.
+    """
+    sort_column = _SORT_COLUMNS.get(criteria.sort)
+    if sort_column is None:
+        raise ValueError(f"Unsupported sort column: {criteria.sort}")
+
+    query = select(Product)
+    if criteria.min_price is not None:
+        query = query.where(Product.price >= criteria.min_price)
+    if criteria.max_price is not None:
+        query = query.where(Product.price <= criteria.max_price)
+    if criteria.stock_below is not None:
+        query = query.where(Product.stock < criteria.stock_below)
+
+    direction = desc if criteria.descending else asc
+    beyond = operator.lt if criteria.descending else operator.gt
+    if sort_column is Product.id:
+        # `id + 0` keeps SQLite from walking the primary key and skipping most rows: it reads the few
+        # low-stock rows through ix_products_stock_id and sorts them instead
+        key = Product.id + 0 if criteria.stock_below is not None else Product.id
+        if after is not None:
+            query = query.where(beyond(key, after.id))
+        return [query.order_by(direction(key))]
+
+    # Same for the other sort columns: `coalesce(column, column)` sorts and compares alike but matches no index, so
+    # the low-stock rows are sought through ix_products_stock_id rather than filtered out of a walk of the sort index
+    sort_key = func.coalesce(sort_column, sort_column) if criteria.stock_below is not None else sort_column
+
+    def ordered(statement: Select) -> Select:
+        return statement.order_by(direction(sort_key), direction(Product.id))
+
+    if after is None:
+        return [ordered(query)]
+    value = _cursor_value(criteria.sort, after)
+    if not sort_column.nullable or (value is not None and not criteria.descending):
+        return [ordered(query.where(_after_value(criteria, sort_key, value, after)))]
+
+    # NULLs sort first in ascending order and last in descending order (SQLite and MySQL alike). A single
+    # `... OR sort_column IS NULL` condition would make the database filter the whole index instead of seeking.
+    if value is None:
+        nulls_left = ordered(query.where(sort_column.is_(None), beyond(Product.id, after.id)))
+        if criteria.descending:
+            return [nulls_left]
+        return [nulls_left, ordered(query.where(sort_column.is_not(None)))]
+    # Descending, after a row with a value: the rest of the values, then every NULL
+    return [
+        ordered(query.where(_after_value(criteria, sort_key, value, after))),
+        ordered(query.where(sort_column.is_(None))),
+    ]
+
+
+def _after_value(criteria: ProductQuery, sort_column, value, cursor: Cursor):
+    """Rows after the cursor among those with a (non-NULL) sort value"""
+    beyond = operator.lt if criteria.descending else operator.gt
+    # The redundant `>=` / `<=` bound lets the database seek into the index instead of filtering from its start
+    not_before = operator.le if criteria.descending else operator.ge
+    return and_(
+        not_before(sort_column, value),
+        or_(beyond(sort_column, value), and_(sort_column == value, beyond(Product.id, cursor.id))),
+    )
+
+
+def _cursor_value(sort: str, cursor: Cursor):
+    if cursor.value is None:
+        return None
+    try:
+        if sort == "price":
+            return Decimal(str(cursor.value))
+        if sort == "updated_at":
+            return datetime.fromisoformat(str(cursor.value))
+        return str(cursor.value)
+    except (ArithmeticError, ValueError) as e:
+        raise InvalidCursorError(f"Invalid cursor value for sort '{sort}'") from e
+
+
+def _change_position(change: Union[Product, ProductTombstone]) -> Tuple[int, int]:
+    if isinstance(change, ProductTombstone):
+        return change.change_seq, change.product_id
+    return change.change_seq, change.id
+
+
+async def _stock_levels(session: AsyncSession, product_ids: List[int]) -> Dict[int, int]:
+    result = await session.execute(select(Product.id, Product.stock).where(Product.id.in_(product_ids)))
+    return {row.id: row.stock for row in result}
+
+
+def _values_by_id(rows: List[dict]) -> dict:
+    """
+    The SET clause applying every row (by `id`) in one UPDATE: per column, a CASE on the id with the value of each
+    row that sets it, leaving the other rows' value as it is. A later row for the same id wins, as in a loop.
+    """
+    columns: Dict[str, Dict[int, object]] = {}
+    for row in rows:
+        for name, value in row.items():
+            if name != "id":
+                columns.setdefault(name, {})[row["id"]] = value
+    return {
+        name: case(values, value=Product.id, else_=getattr(Product, name))
+        for name, values in columns.items()
+    }
+
+
+async def _price_and_stock(session: AsyncSession, product_ids: List[int]) -> Dict[int, Tuple[Decimal, int]]:
+    """(price, stock) of the products that exist, locked until the write's transaction ends (MySQL)"""
+    result = await session.execute(
+        select(Product.id, Product.price, Product.stock).where(Product.id.in_(product_ids)).with_for_update()
+    )
+    return {row.id: (row.price, row.stock) for row in result}
+
+
+def _loaded_price_and_stock(product: Product) -> Tuple[Decimal, int]:
+    """(price, stock) of a product as loaded from the database, before changes made to it in memory"""
+    attributes = inspect(product).attrs
+    return tuple(
+        (history.deleted or history.unchanged or history.added)[0]
+        for history in (attributes.price.history, attributes.stock.history)
+    )
+
+
+def _chunks(items: list, size: int = BULK_CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
@@ -0,0 +1,117 @@
+"""
+Database-side full-text search index for product names.
+
+- SQLite: an external-content FTS5 table using the trigram tokenizer (substring matches, ranked by bm25)
+- MySQL: a FULLTEXT index on `products.name` using the ngram parser (ranked by MATCH ... AGAINST score)
+- Anything else (or if the index could not be created): a ranked, escaped `LIKE` query
+"""
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+import logging
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = "products_fts"
+MYSQL_FULLTEXT_INDEX = "ft_products_name"
+
+# The trigram tokenizer cannot match terms shorter than three characters
+MIN_FULLTEXT_TERM_LENGTH = 3
+
+# Dialect names for which the full-text index has been set up successfully
+_fulltext_dialects: set[str] = set()
+
+_SQLITE_SETUP = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        name, content='products', content_rowid='id', tokenize='trigram'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON products BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name) VALUES (new.id, new.name);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON products BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name) VALUES ('delete', old.id, old.name);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF name ON products BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name) VALUES ('delete', old.id, old.name);
+        INSERT INTO {FTS_TABLE}(rowid, name) VALUES (new.id, new.name);
+    END""",
+    # Index rows that existed before the FTS table was created
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+
+async def setup_search_index(engine: AsyncEngine) -> None:
+    """
+    Create the full-text index for the engine's dialect if it does not exist yet. Safe to run from several
+    processes at once: one that loses the race to create it finds it created by the winner.
+    """
+    dialect = engine.dialect.name
+    if dialect not in ("sqlite", "mysql"):
+        return
+    try:
+        # Own transaction, so a failed setup rolls back cleanly and leaves the LIKE fallback in place
+        async with engine.begin() as conn:
+            if await _index_exists(conn):
+                pass
+            elif dialect == "sqlite":
+                await _setup_sqlite(conn)
+            else:
+                await _setup_mysql(conn)
+    except Exception as e:
+        # E.g. "already exists" or a lock conflict, when another process was creating it at the same time
+        async with engine.connect() as conn:
+            created_meanwhile = await _index_exists(conn)
+        if not created_meanwhile:
+            logger.warning("Full-text search index unavailable on %s, using LIKE fallback: %s", dialect, e)
+            return
+        logger.debug("Full-text search index on %s created by another process: %s", dialect, e)
+    _fulltext_dialects.add(dialect)
+
+
+def fulltext_enabled(dialect: str) -> bool:
+    """Whether searches on this dialect can use the full-text index"""
+    return dialect in _fulltext_dialects
+
+
+async def _index_exists(conn: AsyncConnection) -> bool:
+    if conn.dialect.name == "sqlite":
+        result = await conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {"name": FTS_TABLE},
+        )
+    else:
+        result = await conn.execute(
+            text(
+                "SELECT 1 FROM information_schema.statistics "
+                "WHERE table_schema = DATABASE() AND table_name = 'products' AND index_name = :name"
+            ),
+            {"name": MYSQL_FULLTEXT_INDEX},
+        )
+    return result.first() is not None
+
+
+async def _setup_sqlite(conn: AsyncConnection) -> None:
+    for statement in _SQLITE_SETUP:
+        await conn.execute(text(statement))
+
+
+async def _setup_mysql(conn: AsyncConnection) -> None:
+    # MySQL has no IF NOT EXISTS for indexes: a concurrent creation fails with "Duplicate key name"
+    await conn.execute(text(
+        f"ALTER TABLE products ADD FULLTEXT INDEX {MYSQL_FULLTEXT_INDEX} (name) WITH PARSER ngram"
+    ))
+
+
+def fts5_phrase(term: str) -> str:
+    """Quote a user term as a single FTS5 phrase so operators in it are not interpreted"""
+    return '"' + term.replace('"', '""') + '"'
+
+
+def mysql_boolean_phrase(term: str) -> str:
+    """Quote a user term as a single phrase for MATCH ... AGAINST in boolean mode"""
+    return '"' + term.replace('"', " ") + '"'
+
+
+def like_pattern(term: str) -> str:
+    """Build a `%term%` pattern with LIKE wildcards in the term escaped (escape char: backslash)"""
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
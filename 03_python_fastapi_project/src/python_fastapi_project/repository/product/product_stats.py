@@ -0,0 +1,150 @@
+"""
+Inventory aggregates of the whole catalog: product count, total stock, inventory value (sum of price * stock)
+and low / out of stock counts.
+
+`inventory_totals` computes them with one aggregate query. With PRODUCT_STATS_ENABLED=true, `ProductStats`
+keeps them in memory instead: built by the lifespan at startup, updated by the repository after every committed
+write (and by the stock write-behind flushes) from the values the write read or returned in its transaction, and
+reconciled with the aggregate query every PRODUCT_STATS_RECONCILE_SECONDS, which corrects what was missed
+(writes of other workers, writes racing with a reconciliation).
+"""
+from dataclasses import dataclass, replace
+from decimal import Decimal
+from typing import Optional
+import asyncio
+import contextvars
+import logging
+
+from sqlalchemy import case, func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from .stock_write_behind import StockWriteBehind
+from ...domain.models import Product
+from ...monitoring.metrics import registry
+from ...settings import env_int
+
+logger = logging.getLogger(__name__)
+
+product_stats_reconciliations_total = registry.counter(
+    "product_stats_reconciliations_total", "Reconciliations of the in-memory product stats with the database"
+)
+product_stats_drift_total = registry.counter(
+    "product_stats_drift_total", "Reconciliations that found the in-memory product stats off"
+)
+product_stats_reconcile_errors_total = registry.counter(
+    "product_stats_reconcile_errors_total", "Reconciliations of the product stats that failed"
+)
+
+_CENTS = Decimal("0.01")
+
+
+def low_stock_threshold() -> int:
+    """Products with less stock than this count as low on stock"""
+    return env_int("PRODUCT_STATS_LOW_STOCK_THRESHOLD", 10)
+
+
+@dataclass
+class InventoryTotals:
+    product_count: int = 0
+    total_stock: int = 0
+    inventory_value: Decimal = Decimal("0.00")
+    low_stock_count: int = 0
+    out_of_stock_count: int = 0
+
+
+async def inventory_totals(session: AsyncSession, threshold: int) -> InventoryTotals:
+    """The totals of the whole catalog, in one aggregate query"""
+    def count_where(condition):
+        return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+    result = await session.execute(select(
+        func.count(Product.id),
+        func.coalesce(func.sum(Product.stock), 0),
+        func.coalesce(func.sum(Product.price * Product.stock), 0),
+        count_where(Product.stock < threshold),
+        count_where(Product.stock <= 0),
+    ))
+    count, stock, value, low, out = result.one()
+    # SQLite sums NUMERIC columns as floats
+    return InventoryTotals(int(count), int(stock), Decimal(str(value)).quantize(_CENTS), int(low), int(out))
+
+
+class ProductStats:
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        stock_buffer: Optional[StockWriteBehind] = None,
+        threshold: int = 10,
+        reconcile_interval: float = 60.0,
+    ):
+        self._session_factory = session_factory
+        self._stock_buffer = stock_buffer
+        self.threshold = threshold
+        self._reconcile_interval = reconcile_interval
+        self._totals = InventoryTotals()
+        self._task: Optional[asyncio.Task] = None
+
+    def totals(self) -> InventoryTotals:
+        return replace(self._totals)
+
+    def added(self, price: Decimal, stock: int) -> None:
+        """Count a product created with this price and stock"""
+        self._count(price, stock, 1)
+
+    def removed(self, price: Decimal, stock: int) -> None:
+        """Stop counting a deleted product, which had this price and stock"""
+        self._count(price, stock, -1)
+
+    def changed(self, old_price: Decimal, old_stock: int, price: Decimal, stock: int) -> None:
+        self.removed(old_price, old_stock)
+        self.added(price, stock)
+
+    def stock_changed(self, price: Decimal, old_stock: int, stock: int) -> None:
+        self.changed(price, old_stock, price, stock)
+
+    def _count(self, price: Decimal, stock: int, sign: int) -> None:
+        totals = self._totals
+        totals.product_count += sign
+        totals.total_stock += sign * stock
+        totals.inventory_value += sign * Decimal(price) * stock
+        if stock < self.threshold:
+            totals.low_stock_count += sign
+        if stock <= 0:
+            totals.out_of_stock_count += sign
+
+    async def start(self) -> None:
+        """Build the totals from the database and reconcile them periodically from now on"""
+        await self.reconcile()
+        # Started from an empty context, so the loop does not inherit the caller's context variables
+        self._task = contextvars.Context().run(asyncio.get_running_loop().create_task, self._run())
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self._reconcile_interval)
+            try:
+                await self.reconcile()
+            except Exception:
+                product_stats_reconcile_errors_total.inc()
+                logger.exception("Product stats reconciliation failed, keeping the incremental totals")
+
+    async def reconcile(self) -> None:
+        """Replace the totals with the aggregate of the database"""
+        if self._stock_buffer is not None:
+            # Write the buffered stock changes this process accepted, so that the aggregate sees them too
+            await self._stock_buffer.flush()
+        async with self._session_factory() as session:
+            totals = await inventory_totals(session, self.threshold)
+        product_stats_reconciliations_total.inc()
+        if self._task is not None and totals != self._totals:
+            product_stats_drift_total.inc()
+            logger.info("Product stats corrected from %s to %s", self._totals, totals)
+        self._totals = totals
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,308 @@
+"""
+Write-behind buffer for high-frequency stock changes (opt-in with STOCK_WRITE_BEHIND_ENABLED=true).
+
+Stock adjustments and stock sets are merged per product in memory and written as one multi-row UPDATE
+every STOCK_WRITE_BEHIND_INTERVAL_MS, or as soon as STOCK_WRITE_BEHIND_MAX_PENDING products have pending
+changes, instead of one transaction (and one row lock) per change. The lifespan flushes what is left on
+graceful shutdown; a crash loses at most one interval of changes.
+
+Reads that need the latest stock combine the database value with the pending changes (`pending`) while no
+flush is running (`no_flush`), so they are never more than one flush behind.
+
+Changes are validated against the stock this process sees. Several workers each have their own buffer, so
+together they can accept more units than there are: a flush that would take a product's stock below zero sets it
+to zero and reports the shortfall (warning log and `stock_write_behind_oversold_units_total`).
+"""
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+import asyncio
+import contextvars
+import logging
+import time
+
+from sqlalchemy import case, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from .product_changes import forget_change_seqs, next_change_seq, release_change_seqs
+from ..sqlite import SQLiteWriter
+from ...domain.models import Product
+from ...monitoring.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Products per UPDATE statement; keeps the CASE expressions and bound parameters reasonably small
+FLUSH_CHUNK_SIZE = 500
+FLUSH_SIZE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+stock_write_behind_changes_total = registry.counter(
+    "stock_write_behind_changes_total", "Stock changes accepted into the write-behind buffer"
+)
+stock_write_behind_pending = registry.gauge(
+    "stock_write_behind_pending", "Products with stock changes waiting to be flushed"
+)
+stock_write_behind_flush_size = registry.histogram(
+    "stock_write_behind_flush_size", "Products updated per write-behind flush", (), FLUSH_SIZE_BUCKETS
+)
+stock_write_behind_lag_seconds = registry.histogram(
+    "stock_write_behind_lag_seconds", "Age of the oldest stock change when its flush committed"
+)
+stock_write_behind_flush_errors_total = registry.counter(
+    "stock_write_behind_flush_errors_total", "Write-behind flushes that failed and were retried later"
+)
+stock_write_behind_oversold_units_total = registry.counter(
+    "stock_write_behind_oversold_units_total",
+    "Units buffered stock changes took beyond the stock left when they were written (the stock was set to 0)",
+)
+
+
+@dataclass
+class PendingStock:
+    """Stock changes of one product since the last flush"""
+    level: Optional[int] = None  # stock set since the last flush, if any
+    delta: int = 0  # units added (negative: removed) on top of it
+
+    def apply(self, stock: int) -> int:
+        """The stock after these changes; may be negative when other workers took units in the meantime"""
+        base = stock if self.level is None else self.level
+        return base + self.delta
+
+    def then(self, newer: "PendingStock") -> "PendingStock":
+        """These changes followed by `newer`"""
+        if newer.level is not None:
+            return newer
+        return PendingStock(self.level, self.delta + newer.delta)
+
+
+class StockWriteBehind:
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        write_queue: Optional[SQLiteWriter] = None,
+        interval: float = 0.1,
+        max_pending: int = 1000,
+    ):
+        self._session_factory = session_factory
+        self._write_queue = write_queue
+        self._interval = interval
+        self._max_pending = max_pending
+        self._pending: Dict[int, PendingStock] = {}
+        self._oldest: Optional[float] = None
+        # One flush at a time; readers (`no_flush`) share the state, a flush waits for them and excludes new ones
+        self._flush_lock = asyncio.Lock()
+        self._state = asyncio.Condition()
+        self._readers = 0
+        self._flushing = False
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        # Called with the ids of every committed flush, e.g. to drop cached copies of those products
+        self.after_flush: Optional[Callable[[List[int]], Awaitable[None]]] = None
+        # Called with (price, stock before, stock after) of every product a committed flush wrote, e.g. by the
+        # inventory stats; the old values are read under the flush's own lock
+        self.stock_written: Optional[Callable[[Decimal, int, int], None]] = None
+
+    def add(self, product_id: int, delta: int) -> None:
+        """Add `delta` units (remove, if negative) to the product's stock at the next flush"""
+        self._record(product_id, PendingStock(delta=delta))
+
+    def set(self, product_id: int, level: int) -> None:
+        """Set the product's stock to `level` at the next flush, replacing earlier pending changes"""
+        self._record(product_id, PendingStock(level=level))
+
+    def pending(self, product_id: int) -> Optional[PendingStock]:
+        return self._pending.get(product_id)
+
+    @asynccontextmanager
+    async def no_flush(self) -> AsyncIterator[None]:
+        """
+        Wait for the running flush, if any, and keep the next one from starting during the block: a value read
+        from the database inside the block plus `pending` is then exactly the stock after the next flush.
+        Blocks of concurrent requests run side by side.
+        """
+        async with self._state:
+            await self._state.wait_for(lambda: not self._flushing)
+            self._readers += 1
+        try:
+            yield
+        finally:
+            async with self._state:
+                self._readers -= 1
+                self._state.notify_all()
+
+    def _record(self, product_id: int, change: PendingStock) -> None:
+        current = self._pending.get(product_id)
+        self._pending[product_id] = change if current is None else current.then(change)
+        if self._oldest is None:
+            self._oldest = time.monotonic()
+        stock_write_behind_changes_total.inc()
+        stock_write_behind_pending.set(len(self._pending))
+        if self._task is None or self._task.done():
+            # Started from an empty context, so the flusher does not inherit this request's context variables
+            self._task = contextvars.Context().run(asyncio.get_running_loop().create_task, self._run())
+        if len(self._pending) >= self._max_pending:
+            self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self._interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                stock_write_behind_flush_errors_total.inc()
+                logger.exception("Stock write-behind flush failed, the changes are kept for the next one")
+
+    async def flush(self) -> None:
+        """Write every pending change now, in one transaction"""
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            try:
+                async with self._state:
+                    # New readers wait from here on, so a steady stream of them cannot hold the flush back
+                    self._flushing = True
+                    await self._state.wait_for(lambda: self._readers == 0)
+                batch, self._pending = self._pending, {}
+                oldest, self._oldest = self._oldest, None
+                try:
+                    oversold, before = await self._write(batch)
+                except BaseException:
+                    # Keep the changes, in front of the ones made while flushing
+                    for product_id, newer in self._pending.items():
+                        batch[product_id] = batch[product_id].then(newer) if product_id in batch else newer
+                    self._pending = batch
+                    self._oldest = oldest
+                    raise
+            finally:
+                stock_write_behind_pending.set(len(self._pending))
+                async with self._state:
+                    self._flushing = False
+                    self._state.notify_all()
+            _report_oversold(oversold)
+            if self.stock_written is not None:
+                for product_id, (price, stock) in before.items():
+                    self.stock_written(price, stock, max(batch[product_id].apply(stock), 0))
+            stock_write_behind_flush_size.observe(len(batch))
+            stock_write_behind_lag_seconds.observe(time.monotonic() - oldest)
+            if self.after_flush is not None:
+                try:
+                    await self.after_flush(list(batch))
+                except Exception:
+                    # The changes are written; failing the flush would only write them again
+                    logger.exception("Stock write-behind after-flush hook failed")
+
+    async def _write(
+        self, batch: Dict[int, PendingStock]
+    ) -> Tuple[Dict[int, int], Dict[int, Tuple[Decimal, int]]]:
+        """
+        Write the batch; return the units short by product, for the products whose stock it set to zero, and the
+        (price, stock) it read before writing
+        """
+        async def work(session: AsyncSession) -> Tuple[Dict[int, int], Dict[int, Tuple[Decimal, int]]]:
+            # Only the decreases can take a stock below zero; the stats need the old stock of every product
+            read = batch if self.stock_written is not None else {
+                product_id: change for product_id, change in batch.items() if change.level is None and change.delta < 0
+            }
+            before = await _price_and_stock(session, list(read))
+            oversold = _oversold(batch, before)
+            change_seq = await next_change_seq(session)
+            updated_at = datetime.now()
+            for chunk in _chunks(list(batch.items())):
+                await session.execute(
+                    update(Product)
+                    .where(Product.id.in_([product_id for product_id, _ in chunk]))
+                    .values(
+                        stock=_new_stock(dict(chunk)),
+                        updated_by="system",
+                        updated_at=updated_at,
+                        change_seq=change_seq,
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+            return oversold, before
+
+        if self._write_queue is not None:
+            return await self._write_queue.submit(work)
+        async with self._session_factory() as session:
+            try:
+                written = await work(session)
+                await session.commit()
+            except Exception:
+                await session.rollback()
+                await release_change_seqs(session)
+                raise
+            forget_change_seqs(session)
+        return written
+
+    async def close(self) -> None:
+        """Stop the periodic flushes and write what is still pending"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+async def _price_and_stock(session: AsyncSession, product_ids: List[int]) -> Dict[int, Tuple[Decimal, int]]:
+    """(price, stock) of the products that exist"""
+    values: Dict[int, Tuple[Decimal, int]] = {}
+    for chunk in _chunks(product_ids):
+        # Locked until the UPDATE below commits (MySQL); the SQLite write lock covers it anyway
+        rows = await session.execute(
+            select(Product.id, Product.price, Product.stock).where(Product.id.in_(chunk)).with_for_update()
+        )
+        values.update((row.id, (row.price, row.stock)) for row in rows)
+    return values
+
+
+def _oversold(batch: Dict[int, PendingStock], before: Dict[int, Tuple[Decimal, int]]) -> Dict[int, int]:
+    """Units short by product, for the products the batch would take below zero stock (stock sets need no `before`)"""
+    oversold = {}
+    for product_id, change in batch.items():
+        if change.level is not None:
+            stock = change.apply(0)
+        elif product_id in before:
+            stock = change.apply(before[product_id][1])
+        else:
+            continue
+        if stock < 0:
+            oversold[product_id] = -stock
+    return oversold
+
+
+def _report_oversold(oversold: Dict[int, int]) -> None:
+    for product_id, units in oversold.items():
+        stock_write_behind_oversold_units_total.inc(units)
+        logger.warning(
+            "Buffered stock changes took %d units more than product %d had left; its stock was set to 0",
+            units, product_id,
+        )
+
+
+def _new_stock(changes: Dict[int, PendingStock]):
+    """The new `stock` of every product in `changes`, as one SQL expression; see `_oversold` for the floor at 0"""
+    levels = {product_id: max(change.level + change.delta, 0)
+              for product_id, change in changes.items() if change.level is not None}
+    deltas = {product_id: change.delta
+              for product_id, change in changes.items() if change.level is None and change.delta}
+    stock = Product.stock
+    if deltas:
+        adjusted = Product.stock + case(deltas, value=Product.id, else_=0)
+        # Other workers may have taken units in the meantime: stock never goes below zero (reported by `_oversold`)
+        stock = case((adjusted < 0, 0), else_=adjusted)
+    if levels:
+        stock = case(levels, value=Product.id, else_=stock)
+    return stock
+
+
+def _chunks(items: List, size: int = FLUSH_CHUNK_SIZE) -> Iterator[List]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
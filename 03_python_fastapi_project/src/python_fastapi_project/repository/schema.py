@@ -0,0 +1,90 @@
+"""
+Schema setup at startup, skipped with one query when `schema_version` holds the fingerprint of the models.
+Adds missing tables, columns and indexes; nothing is ever dropped or changed.
+"""
+from typing import Optional
+import hashlib
+import logging
+
+from sqlalchemy import Column, Connection, Integer, MetaData, String, Table, delete, insert, inspect, select, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.schema import CreateColumn
+
+from ..domain import models  # noqa: F401  (registers every table on Base.metadata)
+from ..domain.models.base import Base
+
+logger = logging.getLogger(__name__)
+
+# Bump when the schema changes outside the models (e.g. the full-text index or the change feed setup), or when
+# the setup steps change (2: indexes added to existing tables)
+SCHEMA_REVISION = 2
+
+# Not part of Base.metadata: it describes the schema rather than being part of it
+schema_version = Table(
+    "schema_version",
+    MetaData(),
+    Column("id", Integer, primary_key=True),
+    Column("fingerprint", String(64), nullable=False),
+)
+
+
+def schema_fingerprint() -> str:
+    """Short hash of the tables, columns and indexes of the models"""
+    parts = [f"revision:{SCHEMA_REVISION}"]
+    for table in Base.metadata.sorted_tables:
+        parts.extend(f"{table.name}.{column.name}:{column.type}" for column in table.columns)
+        parts.extend(f"{table.name}#{index.name}" for index in sorted(table.indexes, key=lambda index: index.name))
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()[:8]
+
+
+async def ensure_schema(engine: AsyncEngine) -> bool:
+    """Create the missing tables unless the database was set up for these models; return whether it had to"""
+    fingerprint = schema_fingerprint()
+    if await stored_fingerprint(engine) == fingerprint:
+        return False
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_add_missing_columns)
+        await conn.run_sync(_create_missing_indexes)
+        await conn.run_sync(schema_version.create, checkfirst=True)
+        await conn.execute(delete(schema_version))
+        await conn.execute(insert(schema_version).values(id=1, fingerprint=fingerprint))
+    logger.info("Database schema set up for fingerprint %s", fingerprint)
+    return True
+
+
+async def stored_fingerprint(engine: AsyncEngine) -> Optional[str]:
+    try:
+        async with engine.connect() as conn:
+            return await conn.scalar(select(schema_version.c.fingerprint).where(schema_version.c.id == 1))
+    except DBAPIError:
+        # No schema_version table yet
+        return None
+
+
+def _add_missing_columns(connection: Connection) -> None:
+    """Add the model columns that existing tables lack"""
+    inspector = inspect(connection)
+    preparer = connection.dialect.identifier_preparer
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            if not column.nullable and column.server_default is None:
+                raise RuntimeError(f"Cannot add {table.name}.{column.name} to existing rows: NOT NULL without a server default")
+            column_ddl = CreateColumn(column).compile(dialect=connection.dialect)
+            connection.execute(text(f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {column_ddl}"))
+            logger.info("Added column %s.%s", table.name, column.name)
+
+
+def _create_missing_indexes(connection: Connection) -> None:
+    """Create the model indexes that existing tables lack (on a large table, this takes a while, once)"""
+    inspector = inspect(connection)
+    for table in Base.metadata.sorted_tables:
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            if index.name not in existing:
+                index.create(connection, checkfirst=True)
+                logger.info("Created index %s on %s", index.name, table.name)
@@ -0,0 +1,65 @@
+"""
+Production entrypoint: sets up the schema once, then serves the app with SERVER_WORKERS uvicorn workers.
+
+    python -m src.python_fastapi_project.server
+"""
+import asyncio
+import importlib.util
+import logging
+import os
+
+import uvicorn
+from dotenv import load_dotenv
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.python_fastapi_project.repository.database import get_database_url, setup_schema
+from src.python_fastapi_project.settings import env_flag, env_float, env_int, env_str
+
+logger = logging.getLogger(__name__)
+
+APP = "src.python_fastapi_project.main:app"
+
+
+def _installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def worker_count() -> int:
+    return env_int("SERVER_WORKERS", os.cpu_count() or 1)
+
+
+async def prepare_schema() -> None:
+    """Run the lifespan's schema setup before forking, so the workers find it in place instead of racing"""
+    engine = create_async_engine(get_database_url())
+    try:
+        await setup_schema(engine)
+    finally:
+        await engine.dispose()
+
+
+def main() -> None:
+    load_dotenv("configs/.env")
+    # Inherited by the workers
+    os.environ.setdefault("DATABASE_POOL_PREWARM", "true")
+    workers = worker_count()
+    if workers > 1 and env_flag("PRODUCT_CACHE_ENABLED"):
+        # Each worker would cache in its own memory, where the writes of the other workers never invalidate it
+        logger.warning("PRODUCT_CACHE_ENABLED is ignored with %d workers: the product cache is per process", workers)
+        os.environ["PRODUCT_CACHE_ENABLED"] = "false"
+
+    asyncio.run(prepare_schema())
+
+    uvicorn.run(
+        APP,
+        host=env_str("SERVER_HOST", "0.0.0.0"),
+        port=env_int("SERVER_PORT", 8000),
+        workers=workers,
+        loop="uvloop" if _installed("uvloop") else "asyncio",
+        http="httptools" if _installed("httptools") else "h11",
+        timeout_graceful_shutdown=env_float("SERVER_GRACEFUL_SHUTDOWN_SECONDS", 30.0),
+        access_log=env_flag("SERVER_ACCESS_LOG"),
+    )
+
+
+if __name__ == "__main__":
+    main()
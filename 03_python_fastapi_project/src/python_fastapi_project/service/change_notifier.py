@@ -0,0 +1,36 @@
+"""
+In-process wake-up for change feed streams.
+
+Writes made through this process wake the streams immediately; writes made by other workers are picked up
+by the streams' periodic poll.
+"""
+from typing import Optional
+import asyncio
+
+
+class ChangeNotifier:
+    def __init__(self):
+        self._event: Optional[asyncio.Event] = None
+
+    def waiter(self) -> asyncio.Event:
+        """
+        The event the next write will set. Take it *before* reading the feed, so a write committed between
+        the read and the wait is not missed.
+        """
+        if self._event is None:
+            self._event = asyncio.Event()
+        return self._event
+
+    def notify(self) -> None:
+        """Wake every stream waiting for a change"""
+        if self._event is not None:
+            self._event.set()
+            self._event = None
+
+    @staticmethod
+    async def wait(event: asyncio.Event, timeout: float) -> None:
+        """Wait for the event, but never longer than `timeout` seconds"""
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
@@ -0,0 +1,14 @@
+class InsufficientStockError(Exception):
+    """Raised when a stock reservation asks for more units than a product has"""
+
+    def __init__(self, product_id: int, requested: int, available: int):
+        self.product_id = product_id
+        self.requested = requested
+        self.available = available
+        super().__init__(
+            f"Insufficient stock for product {product_id}: requested {requested}, available {available}"
+        )
+
+
+class InvalidFieldSelectionError(ValueError):
+    """Raised when a client asks for product fields that do not exist"""
@@ -1,74 +1,476 @@
-from typing import List, Optional
+import asyncio
+import csv
+import io
+from collections import Counter
+from dataclasses import asdict
+from decimal import Decimal
+from functools import wraps
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Sequence, Tuple, TypeVar, Union
 
 from src.python_fastapi_project.domain.dtos import (
     ProductCreateDTO,
     ProductUpdateDTO,
     ProductOverviewDTO,
     ProductDetailDTO,
+    ProductPageDTO,
+    ProductSortField,
+    ProductSortOrder,
+    ProductView,
+    ProductExportFormat,
+    ProductBulkUpdateDTO,
+    ProductBulkErrorDTO,
+    ProductBulkResultDTO,
+    ProductBulkDeleteResultDTO,
+    StockReservationItemDTO,
+    StockLevelDTO,
+    StockReservationResultDTO,
+    ProductVersionDTO,
+    CatalogVersionDTO,
+    ProductStatsDTO,
+    ProductChangesDTO,
 )
 from src.python_fastapi_project.domain.assembler.product_assembler import ProductAssembler
+from src.python_fastapi_project.domain.pagination import decode_cursor, encode_cursor
+from src.python_fastapi_project.domain.product_query import ProductQuery
 from src.python_fastapi_project.repository.product.product_repository import ProductRepository
+from src.python_fastapi_project.repository.product.product_stats import ProductStats, low_stock_threshold
+from src.python_fastapi_project.repository.product.stock_write_behind import StockWriteBehind
+from src.python_fastapi_project.service.exceptions import InsufficientStockError, InvalidFieldSelectionError
+from src.python_fastapi_project.service.change_notifier import ChangeNotifier
+from src.python_fastapi_project.service.single_flight import SingleFlight
+
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+DEFAULT_SEARCH_LIMIT = 50
+EXPORT_BATCH_SIZE = 1000
+MAX_BULK_SIZE = 10000
+CHANGES_CURSOR = "changes"
+CHANGES_POLL_INTERVAL = 5.0
+
+T = TypeVar("T")
+
+
+def _writes(method):
+    """
+    Mark a service method as a write: reads in flight when it ends must not be shared any more,
+    and change feed streams should look for new changes
+    """
+    @wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        try:
+            return await method(self, *args, **kwargs)
+        finally:
+            if self._single_flight is not None:
+                self._single_flight.forget_all()
+            if self._change_notifier is not None:
+                self._change_notifier.notify()
+    return wrapper
 
 
 class ProductService:
-    def __init__(self, product_repository: ProductRepository):
+    def __init__(
+        self,
+        product_repository: ProductRepository,
+        single_flight: Optional[SingleFlight] = None,
+        change_notifier: Optional[ChangeNotifier] = None,
+        stock_buffer: Optional[StockWriteBehind] = None,
+        product_stats: Optional[ProductStats] = None,
+    ):
         self._product_repository = product_repository
+        self._single_flight = single_flight
+        self._change_notifier = change_notifier
+        self._stock_buffer = stock_buffer
+        self._product_stats = product_stats
+
+    async def _coalesce(self, key: tuple, call: Callable[[], Awaitable[T]]) -> T:
+        """
+        Share the result of an identical read already in flight, when coalescing is enabled. Reads on the replica
+        and on the primary are never shared: a request that has written must not get a replica result, which
+        may not include its write yet.
+        """
+        if self._single_flight is None:
+            return await call()
+        return await self._single_flight.do((*key, self._product_repository.reads_from_replica()), call)
 
+    @_writes
     async def create_product(self, create_dto: ProductCreateDTO) -> ProductDetailDTO:
         """Create a new product"""
         product = ProductAssembler.from_create_dto(create_dto, "system")
         created_product = await self._product_repository.create(product)
         return ProductAssembler.to_detail_dto(created_product)
 
+    @_writes
+    async def create_products(self, create_dtos: List[ProductCreateDTO]) -> ProductBulkResultDTO:
+        """Create many products in a single transaction"""
+        rows = [ProductAssembler.to_insert_values(dto, "system") for dto in create_dtos]
+        created_products = await self._product_repository.create_many(rows)
+        return ProductBulkResultDTO(items=ProductAssembler.to_detail_dtos(created_products))
+
     async def get_product_by_id(self, product_id: int) -> Optional[ProductDetailDTO]:
         """Get a product by its ID"""
+        return await self._coalesce(("get", product_id), lambda: self._load_product(product_id))
+
+    async def _load_product(self, product_id: int) -> Optional[ProductDetailDTO]:
         product = await self._product_repository.get_by_id(product_id)
         if product is None:
             return None
         return ProductAssembler.to_detail_dto(product)
 
-    async def get_all_products(self) -> List[ProductDetailDTO]:
-        """Get all products as overview DTOs"""
-        products = await self._product_repository.get_all()
+    async def get_products_by_ids(
+        self,
+        product_ids: List[int],
+        view: ProductView = ProductView.DETAIL,
+        fields: Optional[Sequence[str]] = None,
+    ) -> Tuple[List[Union[ProductDetailDTO, ProductOverviewDTO]], List[ProductBulkErrorDTO]]:
+        """Get many products in the order of the given ids, with an error for every id that does not exist"""
+        columns = self._columns_for(view, fields)
+        products = await self._product_repository.get_many(product_ids, columns)
+        # Key by the loaded row: a sparse fieldset may leave `id` out of the DTO
+        dtos = dict(zip((product.id for product in products), self._to_dtos(products, view, fields)))
+        items = [dtos[product_id] for product_id in product_ids if product_id in dtos]
+        return items, self._missing_id_errors(product_ids, set(dtos))
+
+    async def get_product_version(self, product_id: int) -> Optional[ProductVersionDTO]:
+        """Get what identifies the current state of a product, without loading it"""
+        versions = await self._coalesce(
+            ("version", product_id), lambda: self._product_repository.get_versions([product_id])
+        )
+        if product_id not in versions:
+            return None
+        return ProductVersionDTO(id=product_id, updated_at=versions[product_id])
+
+    async def get_catalog_version(self) -> CatalogVersionDTO:
+        """Get a cheap version that changes whenever a product is created, updated or deleted"""
+        change_seq = await self._coalesce(("catalog_version",), self._product_repository.get_catalog_version)
+        return CatalogVersionDTO(change_seq=change_seq)
+
+    async def get_stats(self) -> ProductStatsDTO:
+        """Inventory aggregates of the whole catalog: read from memory when kept there, otherwise one aggregate query"""
+        if self._product_stats is not None:
+            totals, threshold = self._product_stats.totals(), self._product_stats.threshold
+        else:
+            threshold = low_stock_threshold()
+            totals = await self._coalesce(
+                ("stats", threshold), lambda: self._product_repository.get_inventory_totals(threshold)
+            )
+        return ProductStatsDTO(**asdict(totals), low_stock_threshold=threshold)
+
+    async def get_all_products(
+        self,
+        limit: int = DEFAULT_PAGE_SIZE,
+        after: Optional[str] = None,
+        sort: ProductSortField = ProductSortField.ID,
+        view: ProductView = ProductView.DETAIL,
+        fields: Optional[Sequence[str]] = None,
+        order: ProductSortOrder = ProductSortOrder.ASC,
+        min_price: Optional[Decimal] = None,
+        max_price: Optional[Decimal] = None,
+        stock_below: Optional[int] = None,
+    ) -> ProductPageDTO:
+        """Get one page of the products matching the filters, starting after the given cursor"""
+        criteria = ProductQuery(
+            min_price=min_price,
+            max_price=max_price,
+            stock_below=stock_below,
+            sort=ProductSortField(sort).value,
+            descending=ProductSortOrder(order) == ProductSortOrder.DESC,
+        )
+        key = ("list", limit, after, criteria, ProductView(view), tuple(fields or ()))
+        return await self._coalesce(key, lambda: self._load_page(limit, after, criteria, view, fields))
+
+    async def _load_page(
+        self,
+        limit: int,
+        after: Optional[str],
+        criteria: ProductQuery,
+        view: ProductView,
+        fields: Optional[Sequence[str]],
+    ) -> ProductPageDTO:
+        cursor = decode_cursor(after, criteria.cursor_key)
+        columns = self._columns_for(view, fields, criteria.sort)
+        # Fetch one extra row to know whether there is a next page
+        products = await self._product_repository.query(criteria, limit + 1, cursor, columns)
+
+        next_cursor = None
+        if len(products) > limit:
+            products = products[:limit]
+            last = products[-1]
+            next_cursor = encode_cursor(criteria.cursor_key, getattr(last, criteria.sort), last.id)
+
+        return ProductPageDTO(items=self._to_dtos(products, view, fields), next_cursor=next_cursor)
+
+    @staticmethod
+    def _columns_for(view: ProductView, fields: Optional[Sequence[str]], *required: str) -> Optional[List[str]]:
+        """Columns the repository has to load to build the requested view or sparse fieldset"""
+        if fields:
+            unknown = set(fields) - set(ProductDetailDTO.model_fields)
+            if unknown:
+                raise InvalidFieldSelectionError(f"Unknown product fields: {', '.join(sorted(unknown))}")
+            selected = list(fields)
+        elif view == ProductView.OVERVIEW:
+            selected = list(ProductOverviewDTO.model_fields)
+        else:
+            return None
+        return list(dict.fromkeys(["id", *selected, *required]))
+
+    @staticmethod
+    def _to_dtos(products, view: ProductView, fields: Optional[Sequence[str]]) -> List[Union[ProductDetailDTO, ProductOverviewDTO]]:
+        if fields:
+            return [ProductAssembler.to_partial_detail_dto(product, set(fields)) for product in products]
+        if view == ProductView.OVERVIEW:
+            return ProductAssembler.to_overview_dtos(products)
         return ProductAssembler.to_detail_dtos(products)
 
+    async def export_products(
+        self,
+        export_format: ProductExportFormat,
+        batch_size: int = EXPORT_BATCH_SIZE,
+    ) -> AsyncIterator[str]:
+        """Serialize the whole catalog chunk by chunk, one chunk per batch of rows read from the database"""
+        columns = list(ProductDetailDTO.model_fields)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+
+        if export_format == ProductExportFormat.CSV:
+            writer.writerow(columns)
+            yield self._drain(buffer)
+
+        async for products in self._product_repository.stream_all(batch_size):
+            dtos = ProductAssembler.to_detail_dtos(products)
+            if export_format == ProductExportFormat.CSV:
+                rows = (dto.model_dump(mode="json") for dto in dtos)
+                writer.writerows([row[column] for column in columns] for row in rows)
+                yield self._drain(buffer)
+            else:
+                yield "".join(dto.model_dump_json() + "\n" for dto in dtos)
+
+    async def get_changes(self, since: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE) -> ProductChangesDTO:
+        """Get the products written and deleted after the `since` cursor, oldest change first"""
+        cursor = decode_cursor(since, CHANGES_CURSOR)
+        # Fetch one extra change to know whether there are more
+        changes = await self._product_repository.get_changes(cursor, limit + 1)
+        has_more = len(changes) > limit
+        dtos = [ProductAssembler.to_change_dto(change) for change in changes[:limit]]
+        next_cursor = since
+        if dtos:
+            next_cursor = encode_cursor(CHANGES_CURSOR, dtos[-1].change_seq, dtos[-1].id)
+        return ProductChangesDTO(changes=dtos, next_cursor=next_cursor, has_more=has_more)
+
+    async def watch_changes(
+        self,
+        since: Optional[str] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        poll_interval: float = CHANGES_POLL_INTERVAL,
+    ) -> AsyncIterator[ProductChangesDTO]:
+        """
+        Yield batches of changes as they are committed, forever. An empty batch is yielded after every
+        `poll_interval` without changes, so the caller can send keep-alives.
+        """
+        # Validate the cursor before the stream starts
+        decode_cursor(since, CHANGES_CURSOR)
+        while True:
+            waiter = self._change_notifier.waiter() if self._change_notifier is not None else None
+            page = await self.get_changes(since, limit)
+            since = page.next_cursor
+            yield page
+            if page.has_more:
+                continue
+            if waiter is not None:
+                await ChangeNotifier.wait(waiter, poll_interval)
+            else:
+                await asyncio.sleep(poll_interval)
+
+    @staticmethod
+    def _drain(buffer: io.StringIO) -> str:
+        chunk = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return chunk
+
+    @_writes
     async def update_product(self, product_id: int, update_dto: ProductUpdateDTO) -> Optional[ProductDetailDTO]:
-        """Update an existing product"""
-        product = await self._product_repository.get_by_id(product_id)
-        if product is None:
+        """Update an existing product, writing only the fields set on the DTO"""
+        values = ProductAssembler.to_update_values(update_dto, "system")
+        if "stock" in values:
+            await self._flush_stock_changes()
+        updated_product = await self._product_repository.update_fields(product_id, values)
+        if updated_product is None:
             return None
+        return ProductAssembler.to_detail_dto(updated_product)
 
-        updated_product = ProductAssembler.update_from_dto(product, update_dto, "system")
-        saved_product = await self._product_repository.update(updated_product)
-        return ProductAssembler.to_detail_dto(saved_product)
+    @_writes
+    async def update_products(self, update_dtos: List[ProductBulkUpdateDTO]) -> ProductBulkResultDTO:
+        """Update many products in a single transaction, reporting ids that do not exist"""
+        rows = [
+            {"id": dto.id, **ProductAssembler.to_update_values(dto, "system")}
+            for dto in update_dtos
+        ]
+        if any("stock" in row for row in rows):
+            await self._flush_stock_changes()
+        updated_products = await self._product_repository.update_many(rows)
+        updated_ids = {product.id for product in updated_products}
+        return ProductBulkResultDTO(
+            items=ProductAssembler.to_detail_dtos(updated_products),
+            errors=self._missing_id_errors([dto.id for dto in update_dtos], updated_ids),
+        )
 
+    @_writes
     async def delete_product(self, product_id: int) -> bool:
         """Delete a product by its ID"""
         return await self._product_repository.delete(product_id)
 
-    async def get_products_by_name(self, name: str) -> List[ProductOverviewDTO]:
-        """Get products filtered by name (if repository supports it)"""
-        # This would require additional repository method, for now return all and filter
-        all_products = await self._product_repository.get_all()
-        filtered_products = [p for p in all_products if name.lower() in p.name.lower()]
-        return ProductAssembler.to_detail_dtos(filtered_products)
+    @_writes
+    async def delete_products(self, product_ids: List[int]) -> ProductBulkDeleteResultDTO:
+        """Delete many products in a single transaction, reporting ids that do not exist"""
+        deleted_ids = await self._product_repository.delete_many(product_ids)
+        return ProductBulkDeleteResultDTO(
+            deleted_ids=deleted_ids,
+            errors=self._missing_id_errors(product_ids, set(deleted_ids)),
+        )
+
+    @staticmethod
+    def _missing_id_errors(requested_ids: List[int], found_ids: set) -> List[ProductBulkErrorDTO]:
+        return [
+            ProductBulkErrorDTO(index=index, id=product_id, detail=f"Product with ID {product_id} not found")
+            for index, product_id in enumerate(requested_ids)
+            if product_id not in found_ids
+        ]
+
+    async def get_products_by_name(
+        self,
+        name: str,
+        limit: int = DEFAULT_SEARCH_LIMIT,
+        view: ProductView = ProductView.OVERVIEW,
+        fields: Optional[Sequence[str]] = None,
+    ) -> List[Union[ProductDetailDTO, ProductOverviewDTO]]:
+        """Get products whose name contains the given text, best matches first"""
+        columns = self._columns_for(view, fields)
+
+        async def search():
+            products = await self._product_repository.search_by_name(name, limit, columns)
+            return self._to_dtos(products, view, fields)
+
+        return await self._coalesce(("search", name, limit, ProductView(view), tuple(fields or ())), search)
 
     async def check_product_availability(self, product_id: int, required_quantity: int) -> bool:
         """Check if a product has sufficient stock"""
-        product = await self._product_repository.get_by_id(product_id)
-        if product is None:
-            return False
-        return product.stock >= required_quantity
+        levels = await self._product_repository.get_stock_levels([product_id])
+        return levels.get(product_id, 0) >= required_quantity
 
-    async def update_product_stock(self, product_id: int, new_stock: int) -> Optional[ProductDetailDTO]:
-        """Update only the stock of a product"""
-        product = await self._product_repository.get_by_id(product_id)
-        if product is None:
+    async def get_stock_level(self, product_id: int) -> Optional[StockLevelDTO]:
+        """Current stock of a product, including buffered stock changes that are not written yet"""
+        if self._stock_buffer is None:
+            levels = await self._product_repository.get_stock_levels([product_id])
+            if product_id not in levels:
+                return None
+            return StockLevelDTO(product_id=product_id, stock=levels[product_id])
+        async with self._stock_buffer.no_flush():
+            return await self._buffered_stock_level(product_id)
+
+    async def _buffered_stock_level(self, product_id: int) -> Optional[StockLevelDTO]:
+        # Only inside `no_flush`: the database value plus the pending changes is then the current stock
+        levels = await self._product_repository.get_stock_levels([product_id])
+        if product_id not in levels:
             return None
+        pending = self._stock_buffer.pending(product_id)
+        stock = levels[product_id] if pending is None else pending.apply(levels[product_id])
+        return StockLevelDTO(product_id=product_id, stock=stock)
+
+    @_writes
+    async def adjust_stock(self, product_id: int, delta: int) -> Optional[StockLevelDTO]:
+        """
+        Add units to a product's stock, or remove them if `delta` is negative (InsufficientStockError if short).
+        With the stock write-behind buffer, the change is only validated and queued; it is written with the next flush.
+        """
+        if self._stock_buffer is None:
+            if delta < 0:
+                return await self.reserve_stock(product_id, -delta)
+            return await self.release_stock(product_id, delta)
 
-        update_dto = ProductUpdateDTO()
-        update_dto.stock = new_stock
+        async with self._stock_buffer.no_flush():
+            level = await self._buffered_stock_level(product_id)
+            if level is None:
+                return None
+            if level.stock + delta < 0:
+                raise InsufficientStockError(product_id, -delta, level.stock)
+            # No await since the read: no other change of this process can slip in between
+            self._stock_buffer.add(product_id, delta)
+        return StockLevelDTO(product_id=product_id, stock=level.stock + delta)
+
+    async def _flush_stock_changes(self) -> None:
+        """
+        Write buffered stock changes before a stock write that bypasses the buffer: a conditional reservation
+        must see them, and a later flush must not overwrite the write (a buffered stock set) or apply on top of
+        a stock set (a buffered adjustment)
+        """
+        if self._stock_buffer is not None:
+            await self._stock_buffer.flush()
+
+    @_writes
+    async def reserve_stock(self, product_id: int, quantity: int) -> Optional[StockLevelDTO]:
+        """Take units out of stock in one conditional UPDATE; raises InsufficientStockError if short"""
+        await self._flush_stock_changes()
+        levels = await self._product_repository.adjust_stock({product_id: -quantity}, "system")
+        if levels is not None:
+            return StockLevelDTO(product_id=product_id, stock=levels[product_id])
+
+        # The reservation failed: find out why (only this path reads the row)
+        available = (await self._product_repository.get_stock_levels([product_id])).get(product_id)
+        if available is None:
+            return None
+        raise InsufficientStockError(product_id, quantity, available)
+
+    @_writes
+    async def release_stock(self, product_id: int, quantity: int) -> Optional[StockLevelDTO]:
+        """Put units back into stock in one UPDATE"""
+        await self._flush_stock_changes()
+        levels = await self._product_repository.adjust_stock({product_id: quantity}, "system")
+        if levels is None:
+            return None
+        return StockLevelDTO(product_id=product_id, stock=levels[product_id])
+
+    @_writes
+    async def reserve_order(self, items: List[StockReservationItemDTO]) -> StockReservationResultDTO:
+        """Reserve every line of an order in one statement, or nothing if any product is missing or short"""
+        requested = Counter()
+        for item in items:
+            requested[item.product_id] += item.quantity
+
+        await self._flush_stock_changes()
+
+        deltas = {product_id: -quantity for product_id, quantity in requested.items()}
+        levels = await self._product_repository.adjust_stock(deltas, "system")
+        if levels is not None:
+            return StockReservationResultDTO(
+                reserved=True,
+                items=[StockLevelDTO(product_id=product_id, stock=stock) for product_id, stock in levels.items()],
+            )
+
+        available = await self._product_repository.get_stock_levels(list(requested))
+        errors = []
+        for index, item in enumerate(items):
+            if item.product_id not in available:
+                detail = f"Product with ID {item.product_id} not found"
+            elif available[item.product_id] < requested[item.product_id]:
+                detail = str(InsufficientStockError(item.product_id, requested[item.product_id], available[item.product_id]))
+            else:
+                continue
+            errors.append(ProductBulkErrorDTO(index=index, id=item.product_id, detail=detail))
+        return StockReservationResultDTO(reserved=False, errors=errors)
+
+    @_writes
+    async def update_product_stock(self, product_id: int, new_stock: int) -> Optional[ProductDetailDTO]:
+        """
+        Set the stock of a product and return the product. With the write-behind buffer the change is only queued:
+        the product is returned as stored but with the new stock, and its updated_at moves with the next flush
+        """
+        if self._stock_buffer is None:
+            return await self.update_product(product_id, ProductUpdateDTO(stock=new_stock))
 
-        updated_product = ProductAssembler.update_from_dto(product, update_dto, "system")
-        saved_product = await self._product_repository.update(updated_product)
-        return ProductAssembler.to_detail_dto(saved_product)
+        async with self._stock_buffer.no_flush():
+            product = await self._product_repository.get_by_id(product_id)
+            if product is None:
+                return None
+            self._stock_buffer.set(product_id, new_stock)
+        return ProductAssembler.to_detail_dto(product).model_copy(update={"stock": new_stock})
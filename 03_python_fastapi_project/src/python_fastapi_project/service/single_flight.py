@@ -0,0 +1,65 @@
+"""
+Single-flight coalescing of concurrent identical reads.
+
+While a call for a key is in flight, further calls for the same key wait for it and share its result
+(or its exception) instead of sending their own query. Results must therefore be immutable DTOs,
+never ORM objects bound to the leader's session.
+"""
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+import asyncio
+
+from src.python_fastapi_project.monitoring.metrics import registry
+
+T = TypeVar("T")
+
+single_flight_calls_total = registry.counter(
+    "single_flight_calls_total", "Coalescable reads that ran their own query", ("operation",)
+)
+single_flight_coalesced_total = registry.counter(
+    "single_flight_coalesced_total", "Reads that shared an in-flight query instead of running one", ("operation",)
+)
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: tuple, call: Callable[[], Awaitable[T]]) -> T:
+        """Run `call` for `key`, or join the identical call already in flight. `key[0]` names the operation"""
+        operation = str(key[0])
+        while True:
+            future = self._calls.get(key)
+            if future is None:
+                break
+            single_flight_coalesced_total.inc(operation=operation)
+            try:
+                # shield: a follower being cancelled must not cancel the shared call
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # The leader was cancelled (e.g. its client went away): start over, possibly as the new leader
+
+        future = asyncio.get_running_loop().create_future()
+        # Nobody may be waiting; mark the exception as retrieved so asyncio does not log it
+        future.add_done_callback(lambda done: done.cancelled() or done.exception())
+        self._calls[key] = future
+        single_flight_calls_total.inc(operation=operation)
+        try:
+            result = await call()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+
+    def forget_all(self) -> None:
+        """Stop handing out in-flight results, so reads starting after a write never see pre-write data"""
+        self._calls.clear()
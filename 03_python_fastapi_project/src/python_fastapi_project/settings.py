@@ -0,0 +1,28 @@
+"""
+Typed helpers for reading optional settings from the environment (loaded from configs/.env by main.py).
+Values are read when called, not at import time, so they see what load_dotenv put in the environment.
+"""
+import os
+from typing import Optional
+
+
+def env_flag(name: str, default: bool = False) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+def env_str(name: str, default: Optional[str] = None) -> Optional[str]:
+    value = os.getenv(name)
+    return value if value else default
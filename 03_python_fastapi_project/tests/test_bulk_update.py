@@ -0,0 +1,37 @@
+"""PUT /api/products/bulk applies the valid updates and reports every other one by its index"""
+from pathlib import Path
+import asyncio
+
+from benchmarks.run import asgi_client
+
+
+async def update_in_bulk(database_path: Path):
+    async with asgi_client(database_path) as client:
+        response = await client.post("/api/products/bulk", json=[
+            {"name": f"p{i}", "price": 1 + i, "stock": i} for i in range(4)
+        ])
+        ids = [product["id"] for product in response.json()["items"]]
+        response = await client.put("/api/products/bulk", json=[
+            {"id": ids[0], "price": 9.5},
+            {"id": ids[1], "price": -1},
+            {"id": 999, "stock": 3},
+            {"id": ids[2], "stock": 7, "name": "renamed"},
+            {"stock": 1},
+            {"id": ids[0], "stock": 42},
+        ])
+        unchanged = (await client.get(f"/api/products/{ids[1]}")).json()
+    return ids, response, unchanged
+
+
+def test_bulk_update_reports_errors_per_item(tmp_path: Path, monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", "")
+    ids, response, unchanged = asyncio.run(update_in_bulk(tmp_path / "products.db"))
+
+    assert response.status_code == 200
+    items = {item["id"]: item for item in response.json()["items"]}
+    assert set(items) == {ids[0], ids[2]}
+    assert (items[ids[0]]["price"], items[ids[0]]["stock"]) == (9.5, 42)
+    assert (items[ids[2]]["name"], items[ids[2]]["stock"]) == ("renamed", 7)
+    errors = [(error["index"], error["id"]) for error in response.json()["errors"]]
+    assert errors == [(1, ids[1]), (2, 999), (4, None)]
+    assert unchanged["price"] == 2.0
@@ -0,0 +1,43 @@
+"""The in-process cache never stores a value read before an invalidation of its key"""
+import asyncio
+
+from src.python_fastapi_project.repository.cache import InMemoryLRUCache
+
+
+def test_value_read_before_a_delete_is_not_stored():
+    async def scenario():
+        cache = InMemoryLRUCache()
+        generation = await cache.generation()
+        # A write commits and invalidates while the read is still on its way back from the database
+        await cache.delete(1)
+        await cache.set(1, "stale", generation)
+        stale = await cache.get(1)
+        await cache.set(1, "fresh", await cache.generation())
+        return stale, await cache.get(1)
+
+    assert asyncio.run(scenario()) == (None, "fresh")
+
+
+def test_forgotten_deletes_still_refuse_older_values():
+    async def scenario():
+        cache = InMemoryLRUCache(max_size=2)
+        generation = await cache.generation()
+        # More deleted keys than the cache remembers: the delete of key 1 is forgotten first
+        await cache.delete(1, 2, 3)
+        await cache.set(1, "stale", generation)
+        return await cache.get(1)
+
+    assert asyncio.run(scenario()) is None
+
+
+def test_uncounted_lookups_stay_out_of_the_stats():
+    async def scenario():
+        cache = InMemoryLRUCache()
+        await cache.set(1, "value")
+        await cache.get(1, count=False)
+        await cache.get(2, count=False)
+        await cache.get(1)
+        return cache.stats()
+
+    stats = asyncio.run(scenario())
+    assert (stats.hits, stats.misses) == (1, 0)
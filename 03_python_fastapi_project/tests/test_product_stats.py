@@ -0,0 +1,60 @@
+"""The in-memory inventory stats follow every kind of write exactly"""
+from decimal import Decimal
+from pathlib import Path
+import asyncio
+import sqlite3
+
+import pytest
+
+from benchmarks.run import PROFILES, asgi_client
+
+
+def aggregate(database_path: Path, threshold: int = 10) -> dict:
+    with sqlite3.connect(database_path) as conn:
+        count, stock, value, low, out = conn.execute(
+            "SELECT count(*), coalesce(sum(stock), 0), coalesce(sum(price * stock), 0),"
+            " coalesce(sum(stock < ?), 0), coalesce(sum(stock <= 0), 0) FROM products",
+            (threshold,),
+        ).fetchone()
+    return {"product_count": count, "total_stock": stock, "inventory_value": round(value, 2),
+            "low_stock_count": low, "out_of_stock_count": out}
+
+
+async def write_and_read_stats(database_path: Path) -> dict:
+    async with asgi_client(database_path) as client:
+        ids = []
+        for i in range(6):
+            product = {"name": f"p{i}", "price": str(Decimal("1.5") + i), "stock": i * 3}
+            ids.append((await client.post("/api/products/", json=product)).json()["id"])
+        products = [{"name": f"b{i}", "price": "2.25", "stock": 20} for i in range(4)]
+        bulk = [product["id"] for product in (await client.post("/api/products/bulk", json=products)).json()["items"]]
+        await client.put(f"/api/products/{ids[1]}", json={"price": 9.99})
+        await client.put(f"/api/products/{ids[2]}", json={"name": "renamed"})
+        await client.put("/api/products/bulk", json=[{"id": bulk[0], "stock": 1}, {"id": bulk[1], "price": 3.5}])
+        await asyncio.gather(
+            *(client.post(f"/api/products/{ids[5]}/stock/reserve", json={"quantity": 1}) for _ in range(4))
+        )
+        await client.post(f"/api/products/{ids[4]}/stock/release", json={"quantity": 4})
+        await client.post(f"/api/products/{ids[3]}/stock/adjust", json={"delta": -9})
+        await client.put(f"/api/products/{ids[2]}/stock", json={"stock": 2})
+        await client.post("/api/products/stock/reserve", json={"items": [{"product_id": bulk[2], "quantity": 5}]})
+        await client.delete(f"/api/products/{ids[0]}")
+        await client.request("DELETE", "/api/products/bulk", json=[bulk[3]])
+        # Buffered stock changes are counted when they are written
+        await asyncio.sleep(0.3)
+        stats = (await client.get("/api/products/stats")).json()
+    stats.pop("low_stock_threshold")
+    return stats
+
+
+@pytest.mark.parametrize("profile", sorted(PROFILES))
+def test_stats_match_the_aggregate(tmp_path: Path, monkeypatch, profile: str):
+    for name, value in PROFILES[profile].items():
+        monkeypatch.setenv(name, value)
+    monkeypatch.setenv("PRODUCT_STATS_ENABLED", "true")
+    monkeypatch.setenv("DATABASE_URL", "")
+
+    database_path = tmp_path / "products.db"
+    stats = asyncio.run(write_and_read_stats(database_path))
+
+    assert stats == aggregate(database_path)
@@ -0,0 +1,54 @@
+"""Request profiling leaves other profilers alone and profiles one request at a time"""
+import asyncio
+import sys
+
+from src.python_fastapi_project.monitoring.profiling import ProfileStore, ProfilingMiddleware, StackProfiler
+
+
+def test_pause_restores_the_previous_profiler():
+    def installed(frame, event, arg):
+        pass
+
+    sys.setprofile(installed)
+    try:
+        profiler = StackProfiler()
+        profiler.resume()
+        profiler.pause()
+        assert sys.getprofile() is installed
+    finally:
+        sys.setprofile(None)
+
+
+async def two_profiled_requests():
+    """Two requests carrying the profile header at once; returns their status codes and the profiles kept"""
+    release = asyncio.Event()
+
+    async def app(scope, receive, send):
+        await release.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    store = ProfileStore()
+    middleware = ProfilingMiddleware(app, store, token="secret")
+
+    async def request() -> int:
+        scope = {"type": "http", "method": "GET", "path": "/", "headers": [(b"x-profile", b"secret")]}
+        statuses = []
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                statuses.append(message["status"])
+                release.set()
+
+        async def receive():
+            return {"type": "http.request", "body": b""}
+
+        await middleware(scope, receive, send)
+        return statuses[0]
+
+    statuses = await asyncio.gather(request(), request())
+    return sorted(statuses), len(store.list())
+
+
+def test_a_second_profiled_request_is_rejected_while_one_runs():
+    assert asyncio.run(two_profiled_requests()) == ([200, 409], 1)
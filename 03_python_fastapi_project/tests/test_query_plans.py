@@ -0,0 +1,21 @@
+"""The product listing filters and later pages seek through an index instead of scanning `products`"""
+from pathlib import Path
+import asyncio
+
+import pytest
+
+from benchmarks.explain import CASES, plan_problems, query_plans
+from benchmarks.seed import seed_database
+
+
+@pytest.fixture(scope="module")
+def database(tmp_path_factory) -> Path:
+    path = tmp_path_factory.mktemp("plans") / "products.db"
+    asyncio.run(seed_database(path, 1000))
+    return path
+
+
+@pytest.mark.parametrize("name, criteria, cursor", CASES, ids=[name for name, _, _ in CASES])
+def test_listing_plan(database: Path, name, criteria, cursor):
+    plans = asyncio.run(query_plans(database, criteria, cursor))
+    assert plan_problems(criteria, cursor, plans) == []
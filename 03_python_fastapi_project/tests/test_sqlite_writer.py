@@ -0,0 +1,32 @@
+"""A request's reads after a write queued to the SQLite writer see that write"""
+from pathlib import Path
+import asyncio
+
+from benchmarks.run import PROFILES
+
+
+async def read_after_write(database_path: Path):
+    """Read a product, change its stock through the writer, read it again in the same session"""
+    from src.python_fastapi_project.repository import database
+    from src.python_fastapi_project.repository.product.product_repository_impl import ProductRepositoryImpl
+
+    async with database.database_lifespan(None):
+        async with database.get_session_factory()() as session:
+            repository = ProductRepositoryImpl(session, None, database.get_write_queue())
+            [product] = await repository.create_many([{"name": "read your writes", "price": 1, "stock": 5}])
+
+        async with database.get_session_factory()() as session:
+            repository = ProductRepositoryImpl(session, None, database.get_write_queue())
+            # Kept, as a service keeps what it loaded; the session must not hand it back unchanged
+            loaded = await repository.get_by_id(product.id)
+            await repository.update_fields(product.id, {"stock": 7})
+            reloaded = await repository.get_by_id(product.id)
+    return loaded.stock, reloaded.stock
+
+
+def test_reads_see_the_writers_commit(tmp_path: Path, monkeypatch):
+    for name, value in PROFILES["sqlite-production"].items():
+        monkeypatch.setenv(name, value)
+    monkeypatch.setenv("DATABASE_URL", f"sqlite+aiosqlite:///{tmp_path / 'products.db'}")
+
+    assert asyncio.run(read_after_write(tmp_path / "products.db")) == (5, 7)
@@ -0,0 +1,58 @@
+"""Concurrent stock reservations never sell more than there is"""
+from pathlib import Path
+import asyncio
+
+import httpx
+import pytest
+
+from benchmarks.run import PROFILES, asgi_client
+
+STOCK = 100
+QUANTITY = 3
+REQUESTS = 200
+CONCURRENCY = 50
+
+
+async def reserve(client: httpx.AsyncClient, product_id: int, number: int) -> int:
+    """One reservation, alternating the single-product and the order endpoint; returns the status code"""
+    if number % 2:
+        response = await client.post(f"/api/products/{product_id}/stock/reserve", json={"quantity": QUANTITY})
+    else:
+        response = await client.post(
+            "/api/products/stock/reserve", json={"items": [{"product_id": product_id, "quantity": QUANTITY}]}
+        )
+    return response.status_code
+
+
+async def reserve_concurrently(database_path: Path):
+    """Fire the reservations at a new product; returns their status codes and the final stock"""
+    async with asgi_client(database_path) as client:
+        response = await client.post("/api/products/", json={"name": "oversell check", "price": "1", "stock": STOCK})
+        response.raise_for_status()
+        product_id = response.json()["id"]
+
+        semaphore = asyncio.Semaphore(CONCURRENCY)
+
+        async def limited(number: int) -> int:
+            async with semaphore:
+                return await reserve(client, product_id, number)
+
+        statuses = await asyncio.gather(*(limited(number) for number in range(REQUESTS)))
+        final = (await client.get(f"/api/products/{product_id}/stock")).json()["stock"]
+    return statuses, final
+
+
+@pytest.mark.parametrize("profile", ["default", "sqlite-production"])
+def test_reservations_never_oversell(tmp_path: Path, monkeypatch, profile: str):
+    for name, value in PROFILES[profile].items():
+        monkeypatch.setenv(name, value)
+    # Restored after the test; asgi_client points it at the new database
+    monkeypatch.setenv("DATABASE_URL", "")
+
+    statuses, final = asyncio.run(reserve_concurrently(tmp_path / "products.db"))
+
+    reserved = statuses.count(200) * QUANTITY
+    assert reserved <= STOCK
+    assert statuses.count(200) == min(REQUESTS, STOCK // QUANTITY)
+    assert final == STOCK - reserved
+    assert set(statuses) <= {200, 409}